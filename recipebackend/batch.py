@@ -0,0 +1,113 @@
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+import crud
+import facets
+import ingredient_names
+import search as recipe_search
+from cache import recipe_cache
+
+
+# POST /recipes/batch: many creates, updates and deletes in one request and one transaction.
+#
+# Every recipe the batch updates or deletes is read (and locked, on Postgres) with one query up
+# front. Each operation then runs in its own savepoint, so one that fails rolls back alone and
+# the rest still commit. With atomic=True a single failure rolls back the whole batch instead.
+# The work every write does once per transaction (search indexing, facet counts, the catalog
+# version bump, the commit) happens once for the whole batch.
+
+MAX_IDS = 100 # GET /recipes?ids=
+
+
+def _failed(result, status, error):
+  result.update(status=status, error=error)
+  return result
+
+
+def apply_operations(db: Session, operations, atomic=False):
+  # operations: schemas.BatchOperation models. Returns a dict shaped like schemas.BatchResponse.
+  # On SQLite this is also what makes the savepoints below nest: pysqlite doesn't BEGIN before
+  # a SAVEPOINT, so without it each RELEASE would commit one operation on its own
+  crud.begin_write(db)
+
+  current = {}
+  targets = {op.id for op in operations if op.op != "create"}
+  if targets:
+    current = crud.get_recipes_meta(db, targets, for_update=True)
+
+  # Every ingredient name in the batch resolved in one lookup instead of one per recipe
+  canonical_ids = ingredient_names.resolve_ids(
+    db, {ingredient.name for op in operations if op.op != "delete" for ingredient in op.recipe.ingredients}
+  )
+
+  results = []
+  removed, added = [], [] # For facets.apply
+  indexed, unindexed = set(), set()
+  invalidations = [] # (recipe id, (category, difficulty) before and/or after)
+
+  for index, op in enumerate(operations):
+    result = {"index": index, "op": op.op, "id": getattr(op, "id", None), "status": 200}
+    results.append(result)
+
+    previous = None
+    if op.op != "create":
+      previous = current.get(op.id)
+      if previous is None:
+        _failed(result, 404, f"Recipe {op.id} Not Found")
+        continue
+      if op.version is not None and op.version != previous["version"]:
+        _failed(result, 412, f"Recipe {op.id} is at version {previous['version']}, not {op.version}")
+        continue
+
+    try:
+      with db.begin_nested():
+        if op.op == "delete":
+          crud.delete_recipe(db, op.id)
+        else:
+          data = op.recipe.model_dump()
+          ingredients = data.pop("ingredients", [])
+          if op.op == "create":
+            recipe = crud.insert_recipe(db, data, ingredients, canonical_ids=canonical_ids)
+          else:
+            recipe = crud.replace_recipe(db, op.id, data, ingredients, canonical_ids=canonical_ids)
+    except DBAPIError as e:
+      _failed(result, 500, f"Database error: {e.orig}")
+      continue
+
+    if op.op == "delete":
+      del current[op.id]
+      removed.append(previous)
+      indexed.discard(op.id)
+      unindexed.add(op.id)
+      invalidations.append((op.id, [(previous["category"], previous["difficulty"])]))
+      continue
+
+    if previous is not None:
+      removed.append(previous)
+      current[op.id] = recipe # A later operation on the same recipe replaces these values
+    added.append(recipe)
+    indexed.add(recipe["id"])
+    invalidations.append((recipe["id"], [(recipe["category"], recipe["difficulty"])] + (
+      [(previous["category"], previous["difficulty"])] if previous is not None else []
+    )))
+    result.update(id=recipe["id"], version=recipe["version"], recipe=recipe)
+
+  succeeded = [result for result in results if result["status"] == 200]
+  if atomic and len(succeeded) < len(results):
+    db.rollback()
+    for result in succeeded:
+      _failed(result, 424, "Rolled back because another operation in the batch failed")
+      if result["op"] == "create":
+        result["id"] = None # Never existed
+      result.pop("version", None)
+      result.pop("recipe", None)
+    return {"committed": False, "results": results}
+
+  if succeeded:
+    recipe_search.index_recipes(db, sorted(indexed))
+    recipe_search.unindex_recipes(db, sorted(unindexed))
+    facets.apply(db, removed=removed, added=added)
+    crud.touch_catalog(db)
+  db.commit()
+  for recipe_id, rows in invalidations:
+    recipe_cache.invalidate_recipe(recipe_id, *rows)
+  return {"committed": True, "results": results}
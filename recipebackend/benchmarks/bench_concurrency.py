@@ -0,0 +1,95 @@
+"""Concurrency benchmark: throughput vs. number of client connections.
+
+Start the API first (e.g. `uvicorn main:app --workers 1`), then from recipebackend/:
+
+    python -m benchmarks.bench_concurrency --url http://127.0.0.1:8000 --path /recipes/1
+
+If requests were serialized on the event loop, req/s would stay flat as connections go
+up; with DB work offloaded to the threadpool it should climb until the DB pool or CPU
+saturates.
+"""
+import argparse
+import http.client
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+
+def run_level(url, path, connections, total_requests):
+  parsed = urlparse(url)
+  per_connection = max(1, total_requests // connections)
+  latencies = []
+  errors = 0
+  lock = threading.Lock()
+
+  def worker():
+    nonlocal errors
+    # One keep-alive connection per worker, like a browser tab or an upstream proxy
+    conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=30)
+    local = []
+    failed = 0
+    for _ in range(per_connection):
+      start = time.perf_counter()
+      try:
+        conn.request("GET", path)
+        response = conn.getresponse()
+        response.read()
+        if response.status >= 400:
+          failed += 1
+      except (OSError, http.client.HTTPException):
+        failed += 1
+        conn.close()
+        conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=30)
+      local.append(time.perf_counter() - start)
+    conn.close()
+    with lock:
+      latencies.extend(local)
+      errors += failed
+
+  start = time.perf_counter()
+  with ThreadPoolExecutor(max_workers=connections) as pool:
+    for _ in range(connections):
+      pool.submit(worker)
+  elapsed = time.perf_counter() - start
+
+  latencies.sort()
+  return {
+    "connections": connections,
+    "requests": len(latencies),
+    "errors": errors,
+    "seconds": round(elapsed, 3),
+    "req_per_sec": round(len(latencies) / elapsed, 1),
+    "p50_ms": round(statistics.median(latencies) * 1000, 2),
+    "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+  }
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--url", default="http://127.0.0.1:8000")
+  parser.add_argument("--path", default="/recipes")
+  parser.add_argument("--requests", type=int, default=2000, help="requests per concurrency level")
+  parser.add_argument("--levels", default="1,2,4,8,16,32", help="comma-separated connection counts")
+  parser.add_argument("--json", action="store_true", help="print results as JSON")
+  args = parser.parse_args()
+
+  results = [
+    run_level(args.url, args.path, int(level), args.requests)
+    for level in args.levels.split(",")
+  ]
+
+  if args.json:
+    print(json.dumps(results, indent=2))
+    return
+
+  baseline = results[0]["req_per_sec"] or 1
+  print(f"{'conns':>6} {'req/s':>9} {'scale':>6} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+  for r in results:
+    print(f"{r['connections']:>6} {r['req_per_sec']:>9} {r['req_per_sec'] / baseline:>6.2f} {r['p50_ms']:>8} {r['p99_ms']:>8} {r['errors']:>7}")
+
+
+if __name__ == "__main__":
+  main()
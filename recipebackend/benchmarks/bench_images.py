@@ -0,0 +1,88 @@
+"""Throughput of the upload image pipeline (images.process_image), per core and across the pool.
+
+Needs no database or storage; source photos are generated in a temp directory. From recipebackend/:
+
+    python -m benchmarks.bench_images --images 24 --size 4000x3000 --workers 1,2,4
+
+Every source image becomes 3 variants x every available format (AVIF only where Pillow has it).
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from PIL import Image, ImageDraw, ImageFilter
+import images
+
+
+def make_sources(directory, count, width, height):
+  # Gradients plus shapes and a light blur: compresses roughly like a photo, unlike flat colour
+  paths = []
+  for i in range(count):
+    image = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    draw = ImageDraw.Draw(image)
+    for shape in range(40):
+      x, y = (shape * 97 + i * 31) % width, (shape * 53 + i * 17) % height
+      draw.ellipse((x, y, x + width // 6, y + height // 6), fill=((shape * 40) % 256, (i * 60) % 256, (shape * 90) % 256))
+    image = image.filter(ImageFilter.GaussianBlur(2))
+    path = os.path.join(directory, f"source-{i}.jpg")
+    image.save(path, "JPEG", quality=92)
+    paths.append(path)
+  return paths
+
+
+def run(paths, out_dir, workers):
+  started = time.perf_counter()
+  if workers == 1:
+    for i, path in enumerate(paths):
+      images.process_image(path, out_dir, f"w1-{i}")
+  else:
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+      pool.submit(int).result() # Start-up isn't what's being measured
+      started = time.perf_counter()
+      futures = [pool.submit(images.process_image, path, out_dir, f"w{workers}-{i}") for i, path in enumerate(paths)]
+      for future in futures:
+        future.result()
+  return time.perf_counter() - started
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--images", type=int, default=24)
+  parser.add_argument("--size", default="4000x3000", help="Source dimensions, WIDTHxHEIGHT")
+  parser.add_argument("--workers", default=f"1,{os.cpu_count()}", help="Comma-separated pool sizes to try")
+  parser.add_argument("--json", action="store_true", help="Print results as JSON")
+  args = parser.parse_args()
+
+  width, height = (int(part) for part in args.size.lower().split("x"))
+  directory = tempfile.mkdtemp(prefix="bench-images-")
+  try:
+    paths = make_sources(directory, args.images, width, height)
+    out_dir = os.path.join(directory, "out")
+    os.makedirs(out_dir)
+    results = []
+    for workers in sorted({int(w) for w in args.workers.split(",")}):
+      seconds = run(paths, out_dir, workers)
+      results.append({
+        "workers": workers,
+        "images_per_sec": round(args.images / seconds, 2),
+        "images_per_sec_per_core": round(args.images / seconds / workers, 2),
+        "ms_per_image": round(seconds / args.images * 1000, 1),
+      })
+  finally:
+    shutil.rmtree(directory, ignore_errors=True)
+
+  if args.json:
+    print(json.dumps({"size": args.size, "formats": images.available_formats(), "results": results}, indent=2))
+    return
+  print(f"{args.images} images of {args.size} -> {len(images.VARIANTS)} variants x {', '.join(images.available_formats())}")
+  print(f"{'workers':>8} {'img/s':>8} {'img/s/core':>11} {'ms/img':>8}")
+  for row in results:
+    print(f"{row['workers']:>8} {row['images_per_sec']:>8} {row['images_per_sec_per_core']:>11} {row['ms_per_image']:>8}")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,98 @@
+"""Micro-benchmark: cost per recipe of turning a listing into JSON bytes.
+
+Needs no database; recipes are built in memory. From recipebackend/:
+
+    python -m benchmarks.bench_serialization --recipes 2000
+
+  orm+jsonable_encoder  the old path: ORM objects returned from the route, walked by
+                        FastAPI's jsonable_encoder and rendered with json.dumps
+  orm+pydantic          ORM objects validated into schemas.Recipe, then dump_json
+  rows+to_json          the current path: row dicts encoded by serializers.dump_json
+"""
+import argparse
+import json
+import os
+import time
+from datetime import date
+
+os.environ.setdefault("DATABASE_URL", "sqlite://") # database.py is imported but never queried
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy.orm.attributes import set_committed_value
+import database_models
+from schemas import Recipe
+from serializers import dump_json
+
+
+def make_rows(count):
+  rows = []
+  for i in range(count):
+    rows.append({
+      "id": i + 1,
+      "title": f"Recipe {i}",
+      "description": "A perfectly ordinary benchmark recipe with a medium length description.",
+      "instructions": [f"Step {step}: do the thing carefully." for step in range(6)],
+      "prep_time": 15,
+      "cook_time": 30,
+      "servings": 4,
+      "difficulty": "medium",
+      "category": "dinner",
+      "image_url": f"https://res.cloudinary.com/demo/image/upload/recipe_vault/{i}.jpg",
+      "rating": 4,
+      "created_at": date(2024, 1, 15),
+      "updated_at": date(2024, 1, 20),
+      "ingredients": [{"name": f"Ingredient {n}", "quantity": f"{n} cups"} for n in range(8)],
+    })
+  return rows
+
+
+def make_orm(rows):
+  recipes = []
+  for row in rows:
+    data = dict(row)
+    ingredients = data.pop("ingredients")
+    recipe = database_models.Recipe(**data)
+    # As if loaded with joinedload: collection populated, no Ingredient.recipe back-reference
+    set_committed_value(recipe, "ingredients", [
+      database_models.Ingredient(recipe_id=recipe.id, **ing) for ing in ingredients
+    ])
+    recipes.append(recipe)
+  return recipes
+
+
+def timed(fn, repeat):
+  best = float("inf")
+  for _ in range(repeat):
+    start = time.perf_counter()
+    body = fn()
+    best = min(best, time.perf_counter() - start)
+  return best, len(body)
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--recipes", type=int, default=2000)
+  parser.add_argument("--repeat", type=int, default=5)
+  args = parser.parse_args()
+
+  rows = make_rows(args.recipes)
+  orm = make_orm(rows)
+  adapter = TypeAdapter(list[Recipe])
+
+  cases = {
+    "orm+jsonable_encoder": lambda: json.dumps(jsonable_encoder(orm)).encode(),
+    "orm+pydantic": lambda: adapter.dump_json(adapter.validate_python(orm, from_attributes=True)),
+    "rows+to_json": lambda: dump_json(rows),
+  }
+
+  results = {name: timed(fn, args.repeat) for name, fn in cases.items()}
+  baseline = results["orm+jsonable_encoder"][0]
+  print(f"{args.recipes} recipes, best of {args.repeat}")
+  print(f"{'path':<22} {'us/recipe':>10} {'speedup':>8} {'bytes':>10}")
+  for name, (seconds, size) in results.items():
+    print(f"{name:<22} {seconds / args.recipes * 1e6:>10.2f} {baseline / seconds:>7.1f}x {size:>10}")
+
+
+if __name__ == "__main__":
+  main()
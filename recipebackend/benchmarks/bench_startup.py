@@ -0,0 +1,96 @@
+"""Cold-start cost of one API worker: imports, app construction, startup hooks, first requests.
+
+Every run is a fresh interpreter, like a new uvicorn worker. From recipebackend/:
+
+    python -m benchmarks.bench_startup --runs 10
+    DATABASE_URL=postgresql://localhost/recipevault_bench python -m benchmarks.bench_startup
+
+  fresh     a new, empty SQLite database every run, so startup applies every migration and the
+            seed (skipped when DATABASE_URL is given)
+  migrated  a database already at the latest migration: what all but the first worker see
+
+Reports the median and max of each phase in milliseconds (--json for machine-readable output).
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Runs in the child interpreter; prints one JSON line with the phase timings in seconds
+CHILD = r"""
+import json, time
+t0 = time.perf_counter()
+import fastapi, sqlalchemy, pydantic
+t1 = time.perf_counter()
+import main
+t2 = time.perf_counter()
+from fastapi.testclient import TestClient
+client = TestClient(main.app)
+t3 = time.perf_counter()
+client.__enter__() # Runs the startup hooks (migrations, thread pool, upload workers)
+t4 = time.perf_counter()
+assert client.get("/recipes/1").status_code == 200
+t5 = time.perf_counter()
+assert client.get("/recipes", params={"limit": 20, "view": "card"}).status_code == 200
+t6 = time.perf_counter()
+client.__exit__(None, None, None)
+print(json.dumps({
+  "import_dependencies": t1 - t0,
+  "import_app": t2 - t1,
+  "startup_hooks": t4 - t3,
+  "first_detail_request": t5 - t4,
+  "first_list_request": t6 - t5,
+  "total": t6 - t0,
+}))
+"""
+
+
+def run_child(database_url):
+  env = dict(os.environ, DATABASE_URL=database_url)
+  output = subprocess.run([sys.executable, "-c", CHILD], env=env, capture_output=True, text=True, check=True).stdout
+  return json.loads(output.strip().splitlines()[-1])
+
+
+def summarize(runs):
+  return {
+    phase: {
+      "median_ms": round(statistics.median(run[phase] for run in runs) * 1000, 1),
+      "max_ms": round(max(run[phase] for run in runs) * 1000, 1),
+    }
+    for phase in runs[0]
+  }
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--runs", type=int, default=5)
+  parser.add_argument("--json", action="store_true", help="Print results as JSON")
+  args = parser.parse_args()
+
+  directory = tempfile.mkdtemp(prefix="bench-startup-")
+  results = {}
+  given_url = os.getenv("DATABASE_URL")
+  try:
+    if not given_url:
+      results["fresh"] = summarize([run_child(f"sqlite:///{os.path.join(directory, f'fresh-{i}.db')}") for i in range(args.runs)])
+    migrated_url = given_url or f"sqlite:///{os.path.join(directory, 'fresh-0.db')}"
+    run_child(migrated_url) # Make sure it's migrated (and warm the OS file cache)
+    results["migrated"] = summarize([run_child(migrated_url) for _ in range(args.runs)])
+  finally:
+    shutil.rmtree(directory, ignore_errors=True)
+
+  if args.json:
+    print(json.dumps(results, indent=2))
+    return
+  phases = list(next(iter(results.values())))
+  print(f"{'phase':<22}" + "".join(f"{name + ' p50':>16}{'max':>9}" for name in results))
+  for phase in phases:
+    print(f"{phase:<22}" + "".join(f"{results[name][phase]['median_ms']:>16}{results[name][phase]['max_ms']:>9}" for name in results))
+
+
+if __name__ == "__main__":
+  main()
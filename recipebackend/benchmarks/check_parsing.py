@@ -0,0 +1,104 @@
+"""Fails (exit code 1) if quantity parsing, scaling or ingredient-name normalization changes.
+
+Run from recipebackend/, e.g. in CI next to check_query_counts (no database needed):
+
+    python -m benchmarks.check_parsing
+
+Each table pins down inputs the regexes are easy to break on: mixed and unicode fractions,
+ranges, "2 x 400g", a unit followed by a note, single letters that aren't units, and words
+that end in s without being plurals. Add a row when fixing a parsing bug.
+"""
+import sys
+import quantities
+import ingredient_names
+
+
+# quantity -> (amount, unit, base_amount, base_unit); base_amount is compared to 2 decimals
+PARSE = [
+  ("2", (2.0, None, 2.0, "each")),
+  ("1 1/2 cups", (1.5, "cup", 354.88, "ml")),
+  ("1½ cups", (1.5, "cup", 354.88, "ml")),
+  ("½ tsp", (0.5, "tsp", 2.46, "ml")),
+  ("3/4 cup", (0.75, "cup", 177.44, "ml")),
+  ("2.5 kg", (2.5, "kg", 2500.0, "g")),
+  ("400g", (400.0, "g", 400.0, "g")),
+  ("1 Tbsp.", (1.0, "tbsp", 14.79, "ml")),
+  ("2 fl oz", (2.0, "fl oz", 59.15, "ml")),
+  ("2-3 cloves", (3.0, "clove", 3.0, "clove")), # Ranges take the upper bound
+  ("2 to 3 tbsp", (3.0, "tbsp", 44.36, "ml")),
+  ("2 x 400g", (800.0, "g", 800.0, "g")),
+  ("1 can (400g)", (1.0, "can", 1.0, "can")),
+  ("a pinch", (1.0, "pinch", 1.0, "pinch")),
+  ("2 bunches", (2.0, "bunch", 2.0, "bunch")),
+  ("1 c sugar", (1.0, None, 1.0, "each")), # Bare "c" and "t" aren't cup and tsp
+  ("1 t salt", (1.0, None, 1.0, "each")),
+  ("2 leeks", (2.0, None, 2.0, "each")), # Not litres
+  ("to taste", (None, None, None, None)),
+  ("some", (None, None, None, None)),
+  ("3/0 cups", (None, None, None, None)),
+  ("", (None, None, None, None)),
+]
+
+# (quantity, factor) -> scaled quantity
+SCALE = [
+  (("1 cup, chopped", 2), "2 cups, chopped"),
+  (("3 cloves garlic, minced", 2), "6 cloves garlic, minced"),
+  (("2-3 cloves", 2), "4-6 cloves"),
+  (("2 to 3 tbsp butter", 0.5), "1 to 1 1/2 tbsp butter"),
+  (("2 x 400g cans tomatoes", 1.5), "3 x 400g cans tomatoes"),
+  (("1 can (400g) chickpeas", 2), "2 cans (400g) chickpeas"),
+  (("1 1/2 cups flour", 1.5), "2 1/4 cups flour"),
+  (("400g Tomatoes", 2), "800g Tomatoes"),
+  (("a pinch of salt", 2), "2 pinches of salt"),
+  (("2 lbs beef", 0.5), "1 lb beef"),
+  (("2 eggs", 2), "4 eggs"),
+  (("salt to taste", 2), "salt to taste"),
+]
+
+# name -> canonical name
+NORMALIZE = [
+  ("Eggs", "egg"),
+  ("tomatoes", "tomato"),
+  ("Berries", "berry"),
+  ("bay leaves", "bay leaf"),
+  ("peaches", "peach"),
+  ("Black Peppercorns", "black pepper"),
+  ("All-Purpose Flour", "all purpose flour"),
+  ("green onions", "spring onion"),
+  ("Brussels Sprouts", "brussels sprout"),
+  ("molasses", "molasses"),
+  ("Hummus", "hummus"),
+  ("asparagus", "asparagus"),
+  ("couscous", "couscous"),
+  ("Oats", "oats"),
+  ("glass", "glass"),
+  ("", ""),
+]
+
+
+def _parsed(quantity):
+  result = quantities.parse(quantity)
+  base_amount = result["base_amount"]
+  return (result["amount"], result["unit"], round(base_amount, 2) if base_amount is not None else None, result["base_unit"])
+
+
+def main_check():
+  failures = []
+  for label, fn, table in (
+    ("parse", _parsed, PARSE),
+    ("scale_quantity", lambda args: quantities.scale_quantity(*args), SCALE),
+    ("normalize", ingredient_names.normalize, NORMALIZE),
+  ):
+    for given, expected in table:
+      got = fn(given)
+      if got != expected:
+        failures.append(f"{label}({given!r}) = {got!r}, expected {expected!r}")
+    print(f"{label:<16} {len(table):>3} cases")
+
+  if failures:
+    print("\n" + "\n".join(failures))
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+  main_check()
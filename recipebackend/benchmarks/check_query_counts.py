@@ -0,0 +1,95 @@
+"""Fails (exit code 1) if any endpoint issues more SQL statements than its budget.
+
+Run from recipebackend/ against a throwaway database, e.g. in CI:
+
+    DATABASE_URL=postgresql://... python -m benchmarks.check_query_counts
+
+Budgets are fixed numbers, so an N+1 (one query per ingredient or per recipe) blows
+straight through them no matter how small the seed data is. Reads include the one-row
+catalog_state lookup that backs ETags (a hit in the per-worker cache is only that), and
+writes include its version bump and the facet count upsert. On non-Postgres databases, search first checks the catalog version against the
+in-process index's, and writes spend two statements re-reading the recipe into that index after
+they commit. Every write looks up its canonical ingredient names (plus an INSERT and a SELECT
+the first time a name is seen). Updates read the stored ingredient rows and write only the
+ones that changed. On SQLite, updates, deletes and batches start with an explicit BEGIN
+IMMEDIATE (crud.begin_write), which the counter sees. A batch pays the fixed costs once (7
+statements) plus a savepoint and the writes themselves per operation, 4 or more each.
+"""
+import sys
+from fastapi.testclient import TestClient
+from database import engine
+from query_counter import QueryCounter
+from cache import recipe_cache, LocalCache
+import main
+
+
+NEW_RECIPE = {
+  "title": "Query Count Check",
+  "description": "Temporary recipe created by check_query_counts",
+  "ingredients": [{"name": f"Ingredient {i}", "quantity": "1 cup"} for i in range(6)],
+  "instructions": ["Mix.", "Serve."],
+  "prep_time": 5,
+  "cook_time": 5,
+  "servings": 2,
+  "difficulty": "easy",
+  "category": "snack",
+  "rating": 3,
+}
+
+
+def main_check():
+  failures = []
+
+  def check(label, budget, call):
+    with QueryCounter(engine) as counter:
+      response = call()
+    status = "ok" if counter.count <= budget else "OVER BUDGET"
+    print(f"{label:<32} {response.status_code:>4} {counter.count:>3} / {budget:<3} {status}")
+    if response.status_code >= 400:
+      failures.append(f"{label} returned {response.status_code}: {response.text[:200]}")
+    elif counter.count > budget:
+      failures.append(f"{label} issued {counter.count} statements (budget {budget}):\n    " + "\n    ".join(counter.statements))
+    return response
+
+  recipe_cache.backend = None # Measure the database path, not cache hits
+
+  with TestClient(main.app) as client:
+    check("GET /recipes", 3, lambda: client.get("/recipes"))
+    check("GET /recipes?view=card", 2, lambda: client.get("/recipes", params={"view": "card"}))
+    check("GET /recipes?limit=5", 3, lambda: client.get("/recipes", params={"limit": 5}))
+    client.get("/recipes/search", params={"q": "warm"}) # Builds the in-process index on non-Postgres databases
+    check("GET /recipes/search", 2, lambda: client.get("/recipes/search", params={"q": "chick"}))
+    check("GET /recipes/facets", 2, lambda: client.get("/recipes/facets"))
+    check("GET /recipes/pantry", 3, lambda: client.get("/recipes/pantry", params={"ingredients": "rice,garlic,eggs"}))
+
+    created = check("POST /recipes", 9, lambda: client.post("/recipes", json=NEW_RECIPE))
+    recipe = created.json()["recipe"]
+    recipe_id = recipe["id"]
+
+    check("GET /recipes/{id}", 2, lambda: client.get(f"/recipes/{recipe_id}"))
+    check("GET /recipes/{id}?servings=", 2, lambda: client.get(f"/recipes/{recipe_id}", params={"servings": 6}))
+    check("GET /recipes/shopping-list", 2, lambda: client.get("/recipes/shopping-list", params={"recipes": f"1,2:6,{recipe_id}"}))
+    updated = dict(recipe, title="Query Count Check (edited)")
+    check("GET /recipes?ids=", 3, lambda: client.get("/recipes", params={"ids": f"1,2,3,{recipe_id}"}))
+    batch = {"operations": [{"op": "create", "recipe": NEW_RECIPE}] * 3 + [{"op": "update", "id": recipe_id, "recipe": NEW_RECIPE}]}
+    check("POST /recipes/batch", 23, lambda: client.post("/recipes/batch", json=batch))
+    check("PUT /recipes/{id}", 7, lambda: client.put(f"/recipes/{recipe_id}", json=updated))
+    check("PATCH /recipes/{id}", 8, lambda: client.patch(f"/recipes/{recipe_id}", json={"rating": 4, "title": "Query Count Check (patched)"}))
+    ingredients = [dict(ing, quantity="2 cups") if i == 2 else ing for i, ing in enumerate(NEW_RECIPE["ingredients"])]
+    check("PATCH /recipes/{id} ingredients", 9, lambda: client.patch(f"/recipes/{recipe_id}", json={"ingredients": ingredients}))
+    check("DELETE /recipes/{id}", 4, lambda: client.delete(f"/recipes/{recipe_id}"))
+
+    # Hits in the per-worker cache still read the catalog version, to see other workers' writes
+    recipe_cache.backend = LocalCache()
+    client.get("/recipes/1")
+    client.get("/recipes", params={"view": "card"})
+    check("GET /recipes/{id} (local cache)", 1, lambda: client.get("/recipes/1"))
+    check("GET /recipes (local cache)", 1, lambda: client.get("/recipes", params={"view": "card"}))
+
+  if failures:
+    print("\n" + "\n".join(failures))
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+  main_check()
@@ -0,0 +1,420 @@
+"""Load test: drive every recipe endpoint with a weighted mix of requests and report latency.
+
+Start the API against a seeded catalog (see benchmarks.seed_catalog, or let benchmarks.run_suite
+do all of it), then from recipebackend/:
+
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --concurrency 16 --duration 30
+    python -m benchmarks.load_test --mix detail=1 --concurrency 1,8,32 --out results.json
+
+Each worker keeps one keep-alive connection and picks its next request from --mix. Writes only
+touch recipes the test created itself (update, delete and image upload work on those), so the
+seeded catalog stays the same from one run to the next. Image uploads need the server to store
+images somewhere harmless: STORAGE_BACKEND=local.
+
+Reports requests, errors, throughput and p50/p95/p99/max latency per endpoint as JSON.
+"""
+import argparse
+import http.client
+import io
+import json
+import math
+import platform
+import random
+import subprocess
+import threading
+import time
+import uuid
+from collections import defaultdict
+from urllib.parse import urlencode, urlparse
+from benchmarks.seed_catalog import ADJECTIVES, CATEGORIES, DISHES, INGREDIENTS, make_recipe
+
+DEFAULT_MIX = "list=23,filter=10,facets=2,search=12,pantry=3,detail=24,scaled=2,shopping=2,batch_get=2,create=7,update=4,patch=2,delete=4,batch=1,image=2"
+
+DIFFICULTIES = ["easy", "medium", "hard"]
+
+
+def percentile(sorted_values, fraction):
+  # Nearest-rank percentile of an already sorted list
+  if not sorted_values:
+    return None
+  return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+def summarize(latencies, errors, seconds):
+  latencies = sorted(latencies)
+  ms = lambda value: round(value * 1000, 2) if value is not None else None
+  return {
+    "requests": len(latencies),
+    "errors": errors,
+    "req_per_sec": round(len(latencies) / seconds, 1) if seconds else None,
+    "mean_ms": ms(sum(latencies) / len(latencies)) if latencies else None,
+    "p50_ms": ms(percentile(latencies, 0.50)),
+    "p95_ms": ms(percentile(latencies, 0.95)),
+    "p99_ms": ms(percentile(latencies, 0.99)),
+    "max_ms": ms(latencies[-1]) if latencies else None,
+  }
+
+
+def parse_mix(value):
+  mix = {}
+  for part in value.split(","):
+    name, _, weight = part.partition("=")
+    if name.strip() not in SCENARIOS:
+      raise SystemExit(f"Unknown scenario {name!r}; pick from {', '.join(SCENARIOS)}")
+    mix[name.strip()] = float(weight or 1)
+  return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def tiny_jpeg():
+  # A real (small) photo-sized JPEG, so the upload pipeline has actual work to do
+  from PIL import Image, ImageDraw
+  image = Image.linear_gradient("L").resize((1200, 900)).convert("RGB")
+  ImageDraw.Draw(image).ellipse((200, 150, 900, 700), fill=(200, 80, 40))
+  buffer = io.BytesIO()
+  image.save(buffer, "JPEG", quality=85)
+  return buffer.getvalue()
+
+
+def multipart(field, filename, content_type, data):
+  boundary = uuid.uuid4().hex
+  body = (
+    f"--{boundary}\r\nContent-Disposition: form-data; name=\"{field}\"; filename=\"{filename}\"\r\n"
+    f"Content-Type: {content_type}\r\n\r\n"
+  ).encode() + data + f"\r\n--{boundary}--\r\n".encode()
+  return body, f"multipart/form-data; boundary={boundary}"
+
+
+# ---------------- Client ----------------
+
+class Client:
+  # One keep-alive HTTP/1.1 connection; reconnects after an error
+  def __init__(self, url):
+    parsed = urlparse(url)
+    self.host, self.port = parsed.hostname, parsed.port or 80
+    self.conn = None
+
+  def request(self, method, path, body=None, headers=None):
+    if self.conn is None:
+      self.conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+    try:
+      self.conn.request(method, path, body=body, headers=headers or {})
+      response = self.conn.getresponse()
+      return response.status, response.read()
+    except (OSError, http.client.HTTPException):
+      self.conn.close()
+      self.conn = None
+      return None, b""
+
+  def close(self):
+    if self.conn is not None:
+      self.conn.close()
+
+
+def find_max_id(client):
+  # Seeded ids are contiguous from 1: grow until a 404, then binary search the edge
+  high = 1
+  while client.request("GET", f"/recipes/{high}")[0] == 200:
+    high *= 2
+  low = high // 2
+  while low + 1 < high:
+    middle = (low + high) // 2
+    if client.request("GET", f"/recipes/{middle}")[0] == 200:
+      low = middle
+    else:
+      high = middle
+  return low
+
+
+# ---------------- Scenarios ----------------
+# Each takes (client, rng, state) and returns the response status (None for a connection error).
+# A scenario returning a 2xx/3xx counts as a success.
+
+class State:
+  # Shared between workers: the seeded id range and the recipes this run created
+  def __init__(self, max_id):
+    self.max_id = max_id
+    self.created = []
+    self.lock = threading.Lock()
+    self.image = tiny_jpeg()
+
+  def add(self, recipe_id):
+    with self.lock:
+      self.created.append(recipe_id)
+
+  def pick(self, rng, remove=False):
+    with self.lock:
+      if not self.created:
+        return None
+      index = rng.randrange(len(self.created))
+      if remove:
+        self.created[index], self.created[-1] = self.created[-1], self.created[index]
+        return self.created.pop()
+      return self.created[index]
+
+
+def _list(client, rng, state):
+  return client.request("GET", "/recipes?" + urlencode({"limit": 20, "view": "card"}))[0]
+
+
+def _filter(client, rng, state):
+  query = {"limit": 20, "view": "card", "category": rng.choice(CATEGORIES)}
+  if rng.random() < 0.5:
+    query["difficulty"] = rng.choice(DIFFICULTIES)
+  return client.request("GET", "/recipes?" + urlencode(query))[0]
+
+
+def _search(client, rng, state):
+  q = rng.choice(DISHES) if rng.random() < 0.7 else f"{rng.choice(ADJECTIVES)} {rng.choice(DISHES)}"
+  return client.request("GET", "/recipes/search?" + urlencode({"q": q.lower(), "limit": 20}))[0]
+
+
+def _facets(client, rng, state):
+  return client.request("GET", "/recipes/facets")[0]
+
+
+def _pantry(client, rng, state):
+  query = [("ingredients", name) for name in rng.sample(INGREDIENTS, rng.randint(2, 6))] + [("limit", 20)]
+  return client.request("GET", "/recipes/pantry?" + urlencode(query))[0]
+
+
+def _detail(client, rng, state):
+  return client.request("GET", f"/recipes/{rng.randint(1, max(1, state.max_id))}")[0]
+
+
+def _scaled(client, rng, state):
+  query = urlencode({"servings": rng.randint(1, 12)})
+  return client.request("GET", f"/recipes/{rng.randint(1, max(1, state.max_id))}?{query}")[0]
+
+
+def _shopping(client, rng, state):
+  recipes = [f"{rng.randint(1, max(1, state.max_id))}:{rng.randint(1, 8)}" for _ in range(rng.randint(3, 8))]
+  return client.request("GET", "/recipes/shopping-list?" + urlencode({"recipes": ",".join(recipes)}))[0]
+
+
+def _batch_get(client, rng, state):
+  ids = [str(rng.randint(1, max(1, state.max_id))) for _ in range(10)]
+  return client.request("GET", "/recipes?" + urlencode({"ids": ",".join(ids), "view": "card"}))[0]
+
+
+def _new_recipe(rng):
+  data = make_recipe(rng, rng.randrange(10**9))
+  data.pop("created_at")
+  data.pop("updated_at")
+  return data
+
+
+def _create(client, rng, state):
+  status, body = client.request("POST", "/recipes", json.dumps(_new_recipe(rng)), {"Content-Type": "application/json"})
+  if status == 200:
+    state.add(json.loads(body)["recipe"]["id"])
+  return status
+
+
+def _update(client, rng, state):
+  recipe_id = state.pick(rng)
+  if recipe_id is None:
+    return _create(client, rng, state)
+  status, body = client.request("GET", f"/recipes/{recipe_id}")
+  if status != 200:
+    return status # Deleted by another worker in between; counts as an error, which it is for a client
+  recipe = json.loads(body)
+  recipe.update(_new_recipe(rng))
+  return client.request("PUT", f"/recipes/{recipe_id}", json.dumps(recipe), {"Content-Type": "application/json"})[0]
+
+
+def _patch(client, rng, state):
+  # The common small edit: a couple of columns, ingredients untouched
+  recipe_id = state.pick(rng)
+  if recipe_id is None:
+    return _create(client, rng, state)
+  changes = {"rating": rng.randint(1, 5), "cook_time": rng.choice([10, 20, 30, 45])}
+  return client.request("PATCH", f"/recipes/{recipe_id}", json.dumps(changes), {"Content-Type": "application/json"})[0]
+
+
+def _delete(client, rng, state):
+  recipe_id = state.pick(rng, remove=True)
+  if recipe_id is None:
+    return _create(client, rng, state)
+  return client.request("DELETE", f"/recipes/{recipe_id}")[0]
+
+
+def _batch(client, rng, state):
+  # A few creates and one delete of a recipe this run made, in one transaction
+  operations = [{"op": "create", "recipe": _new_recipe(rng)} for _ in range(4)]
+  recipe_id = state.pick(rng, remove=True)
+  if recipe_id is not None:
+    operations.append({"op": "delete", "id": recipe_id})
+  status, body = client.request("POST", "/recipes/batch", json.dumps({"operations": operations}), {"Content-Type": "application/json"})
+  if status == 200:
+    results = json.loads(body)["results"]
+    for result in results:
+      if result["op"] == "create" and result["status"] == 200:
+        state.add(result["id"])
+    return next((result["status"] for result in results if result["status"] != 200), status) # A failed operation counts as an error
+  return status
+
+
+def _image(client, rng, state):
+  recipe_id = state.pick(rng)
+  if recipe_id is None:
+    return _create(client, rng, state)
+  body, content_type = multipart("file", "bench.jpg", "image/jpeg", state.image)
+  return client.request("POST", f"/recipes/{recipe_id}/image", body, {"Content-Type": content_type})[0]
+
+
+def _export(client, rng, state):
+  # The whole catalog; only worth mixing in deliberately (--mix export=1)
+  return client.request("GET", "/recipes/export", headers={"Accept-Encoding": "gzip"})[0]
+
+
+SCENARIOS = {
+  "list": _list,
+  "filter": _filter,
+  "search": _search,
+  "facets": _facets,
+  "pantry": _pantry,
+  "detail": _detail,
+  "scaled": _scaled,
+  "shopping": _shopping,
+  "batch_get": _batch_get,
+  "create": _create,
+  "update": _update,
+  "patch": _patch,
+  "delete": _delete,
+  "batch": _batch,
+  "image": _image,
+  "export": _export,
+}
+
+
+# ---------------- Runner ----------------
+
+def run_level(url, mix, concurrency, duration, warmup, state, seed):
+  names = list(mix)
+  weights = [mix[name] for name in names]
+  latencies = defaultdict(list)
+  errors = defaultdict(int)
+  lock = threading.Lock()
+  started = time.perf_counter()
+  measure_from = started + warmup
+  stop_at = measure_from + duration
+
+  def worker(index):
+    rng = random.Random(seed * 1000 + index)
+    client = Client(url)
+    local_latencies = defaultdict(list)
+    local_errors = defaultdict(int)
+    while True:
+      now = time.perf_counter()
+      if now >= stop_at:
+        break
+      name = rng.choices(names, weights)[0]
+      status = SCENARIOS[name](client, rng, state)
+      finished = time.perf_counter()
+      if now < measure_from:
+        continue
+      local_latencies[name].append(finished - now)
+      if status is None or status >= 400:
+        local_errors[name] += 1
+    client.close()
+    with lock:
+      for name, values in local_latencies.items():
+        latencies[name].extend(values)
+      for name, count in local_errors.items():
+        errors[name] += count
+
+  threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  seconds = time.perf_counter() - measure_from
+
+  all_latencies = [value for values in latencies.values() for value in values]
+  return {
+    "concurrency": concurrency,
+    "seconds": round(seconds, 2),
+    "overall": summarize(all_latencies, sum(errors.values()), seconds),
+    "endpoints": {name: summarize(latencies[name], errors[name], seconds) for name in names},
+  }
+
+
+def git_revision():
+  try:
+    commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True).stdout.strip())
+    return {"commit": commit, "dirty": dirty}
+  except (OSError, subprocess.CalledProcessError):
+    return {"commit": None, "dirty": None}
+
+
+def run(url, mix=DEFAULT_MIX, concurrency=(1, 8, 32), duration=20.0, warmup=2.0, seed=1):
+  # Returns the results document for one server: one entry per concurrency level
+  mix = parse_mix(mix) if isinstance(mix, str) else mix
+  probe = Client(url)
+  max_id = find_max_id(probe)
+  probe.close()
+  state = State(max_id)
+  levels = [run_level(url, mix, level, duration, warmup, state, seed) for level in concurrency]
+
+  # Leave the catalog as it was found
+  cleanup = Client(url)
+  for recipe_id in state.created:
+    cleanup.request("DELETE", f"/recipes/{recipe_id}")
+  cleanup.close()
+
+  return {
+    "url": url,
+    "catalog_max_id": max_id,
+    "mix": mix,
+    "duration": duration,
+    "warmup": warmup,
+    "levels": levels,
+  }
+
+
+def environment():
+  return {
+    "git": git_revision(),
+    "python": platform.python_version(),
+    "platform": platform.platform(),
+    "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+  }
+
+
+def print_table(result):
+  print(f"catalog max id {result['catalog_max_id']}")
+  print(f"{'conc':>5} {'endpoint':<8} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'errors':>7}")
+  for level in result["levels"]:
+    rows = [("all", level["overall"])] + list(level["endpoints"].items())
+    for name, stats in rows:
+      print(f"{level['concurrency']:>5} {name:<8} {stats['req_per_sec']:>9} {stats['p50_ms']!s:>8} {stats['p95_ms']!s:>8} {stats['p99_ms']!s:>8} {stats['max_ms']!s:>8} {stats['errors']:>7}")
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--url", default="http://127.0.0.1:8000")
+  parser.add_argument("--mix", default=DEFAULT_MIX, help=f"scenario=weight,... from: {', '.join(SCENARIOS)}")
+  parser.add_argument("--concurrency", default="1,8,32", help="Comma-separated worker counts, one run each")
+  parser.add_argument("--duration", type=float, default=20, help="Measured seconds per concurrency level")
+  parser.add_argument("--warmup", type=float, default=2, help="Unmeasured seconds before each level")
+  parser.add_argument("--seed", type=int, default=1)
+  parser.add_argument("--out", help="Write the JSON results here as well")
+  parser.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+  args = parser.parse_args()
+
+  result = dict(
+    environment(),
+    **run(args.url, args.mix, [int(c) for c in args.concurrency.split(",")], args.duration, args.warmup, args.seed),
+  )
+  if args.out:
+    with open(args.out, "w") as f:
+      json.dump(result, f, indent=2)
+  if args.json:
+    print(json.dumps(result, indent=2))
+  else:
+    print_table(result)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,112 @@
+"""The whole benchmark suite: for each catalog size, seed a database, start the API on it and
+run the load test at every concurrency level. From recipebackend/:
+
+    python -m benchmarks.run_suite                              # 1k, 100k and 1m recipes
+    python -m benchmarks.run_suite --sizes 1k,100k --concurrency 1,16 --duration 10
+    python -m benchmarks.run_suite --database-url postgresql://localhost/bench_{size}
+
+--database-url may contain {size}; each size gets its own database, and one that already holds
+the right catalog is reused instead of seeded again (the Postgres databases must exist).
+The server runs as `uvicorn main:app` in a subprocess with STORAGE_BACKEND=local, so image
+uploads land in a temp directory instead of Cloudinary.
+
+Results go to benchmarks/results/<time>-<commit>.json; compare two of those to compare commits.
+"""
+import argparse
+import http.client
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks import load_test
+from benchmarks.seed_catalog import parse_size
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def wait_until_up(port, process, timeout=120):
+  deadline = time.monotonic() + timeout
+  while time.monotonic() < deadline:
+    if process.poll() is not None:
+      raise SystemExit(f"The API exited during startup (code {process.returncode})")
+    try:
+      conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+      conn.request("GET", "/")
+      if conn.getresponse().status == 200:
+        return
+    except OSError:
+      pass
+    time.sleep(0.2)
+  raise SystemExit("The API didn't come up in time")
+
+
+def run_size(size_name, args, media_dir):
+  size = parse_size(size_name)
+  database_url = args.database_url.format(size=size_name)
+  env = dict(os.environ, DATABASE_URL=database_url)
+
+  started = time.perf_counter()
+  subprocess.run([sys.executable, "-m", "benchmarks.seed_catalog", "--size", str(size), "--seed", str(args.seed)], env=env, check=True)
+  seed_seconds = time.perf_counter() - started
+
+  env.update(
+    STORAGE_BACKEND="local",
+    LOCAL_STORAGE_DIR=media_dir,
+    LOCAL_STORAGE_URL=f"http://127.0.0.1:{args.port}/media",
+  )
+  server = subprocess.Popen(
+    [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--workers", str(args.workers), "--log-level", "warning"],
+    env=env,
+  )
+  try:
+    wait_until_up(args.port, server)
+    result = load_test.run(
+      f"http://127.0.0.1:{args.port}", args.mix, [int(c) for c in args.concurrency.split(",")],
+      args.duration, args.warmup, args.seed,
+    )
+  finally:
+    server.terminate()
+    server.wait(timeout=30)
+  return dict(size=size, database=database_url.split("://", 1)[0], seed_seconds=round(seed_seconds, 2), **result)
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--sizes", default="1k,100k,1m")
+  parser.add_argument("--database-url", default="sqlite:///" + os.path.join(tempfile.gettempdir(), "recipevault-bench-{size}.db"))
+  parser.add_argument("--concurrency", default="1,8,32")
+  parser.add_argument("--duration", type=float, default=20)
+  parser.add_argument("--warmup", type=float, default=2)
+  parser.add_argument("--mix", default=load_test.DEFAULT_MIX)
+  parser.add_argument("--seed", type=int, default=42, help="Same seed, same catalog and request sequence")
+  parser.add_argument("--port", type=int, default=8765)
+  parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+  parser.add_argument("--out", help="Results file (default: benchmarks/results/<time>-<commit>.json)")
+  args = parser.parse_args()
+
+  environment = load_test.environment()
+  media_dir = tempfile.mkdtemp(prefix="recipevault-bench-media-")
+  try:
+    runs = []
+    for size_name in args.sizes.split(","):
+      print(f"== {size_name} recipes", file=sys.stderr)
+      runs.append(run_size(size_name.strip(), args, media_dir))
+      load_test.print_table(runs[-1])
+  finally:
+    shutil.rmtree(media_dir, ignore_errors=True)
+
+  out = args.out
+  if out is None:
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    commit = (environment["git"]["commit"] or "unknown")[:10] + ("-dirty" if environment["git"]["dirty"] else "")
+    out = os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{commit}.json")
+  with open(out, "w") as f:
+    json.dump(dict(environment, runs=runs), f, indent=2)
+  print(out)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,130 @@
+"""Seed a synthetic recipe catalog of a given size for benchmarking.
+
+Deterministic for a given --size and --seed, so two runs (or two commits) load the same data.
+Uses DATABASE_URL like the app, and goes through bulk_import like POST /recipes/import. From
+recipebackend/:
+
+    DATABASE_URL=postgresql://localhost/recipevault_bench python -m benchmarks.seed_catalog --size 100k
+    python -m benchmarks.seed_catalog --size 1m --reset
+
+Recipes get 3-20 ingredients (about 9 on average), 3-10 steps, and titles built from a small
+vocabulary, so search terms and filters match realistic fractions of the catalog.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+ADJECTIVES = ["Spicy", "Creamy", "Smoky", "Crispy", "Classic", "Quick", "Roasted", "Grilled", "Lemon", "Garlic", "Honey", "Herbed", "Rustic", "Sticky", "Zesty", "Coconut"]
+DISHES = ["Chicken", "Rice", "Pasta", "Salad", "Soup", "Curry", "Stew", "Tacos", "Pancakes", "Noodles", "Salmon", "Beef", "Tofu", "Risotto", "Cake", "Smoothie", "Bread", "Beans", "Omelette", "Dumplings"]
+STYLES = ["Bowl", "Bake", "Skillet", "Stir Fry", "Traybake", "Wraps", "Platter", "Pie", "Skewers", "Casserole"]
+INGREDIENTS = [
+  "Rice", "Tomatoes", "Onions", "Garlic", "Olive Oil", "Butter", "Salt", "Black Pepper", "Chicken Breast", "Eggs",
+  "Milk", "All-Purpose Flour", "Sugar", "Baking Powder", "Lemon Juice", "Thyme", "Paprika", "Cumin", "Chili Flakes",
+  "Coconut Milk", "Soy Sauce", "Ginger", "Spinach", "Carrots", "Bell Pepper", "Potatoes", "Beef Mince", "Salmon Fillet",
+  "Tofu", "Chickpeas", "Parmesan Cheese", "Cream", "Honey", "Vanilla Extract", "Cocoa Powder", "Banana", "Greek Yogurt",
+  "Basil", "Parsley", "Spring Onions", "Mushrooms", "Zucchini", "Chicken Broth", "Tomato Paste", "Spaghetti", "Noodles",
+]
+QUANTITIES = ["1 cup", "2 cups", "1/2 cup", "1 tbsp", "2 tbsp", "1 tsp", "1/2 tsp", "200g", "500g", "1", "2", "3", "4 cloves", "to taste", "1 can"]
+STEPS = ["Prep the vegetables.", "Heat the oil in a large pan.", "Season generously.", "Simmer for 10 minutes.", "Stir in the sauce.", "Bake until golden.", "Rest for 5 minutes.", "Garnish and serve.", "Whisk everything together.", "Bring to a boil."]
+DIFFICULTIES = ["easy"] * 5 + ["medium"] * 4 + ["hard"]
+CATEGORIES = ["breakfast", "lunch", "dinner", "desert", "snack", "beverage"]
+
+START_DATE = date(2022, 1, 1)
+
+
+def parse_size(value):
+  value = value.strip().lower()
+  if value in SIZES:
+    return SIZES[value]
+  return int(value.replace("_", ""))
+
+
+def make_recipe(rng, n):
+  title = f"{rng.choice(ADJECTIVES)} {rng.choice(DISHES)} {rng.choice(STYLES)}"
+  created = START_DATE + timedelta(days=rng.randrange(1000))
+  return {
+    "title": title,
+    "description": f"Recipe {n}: a {title.lower()} for any day of the week",
+    "ingredients": [
+      {"name": name, "quantity": rng.choice(QUANTITIES)}
+      for name in rng.sample(INGREDIENTS, int(rng.triangular(3, 20, 6)))
+    ],
+    "instructions": rng.sample(STEPS, rng.randint(3, len(STEPS))),
+    "prep_time": rng.choice([5, 10, 15, 20, 30, 45]),
+    "cook_time": rng.choice([0, 10, 15, 20, 30, 45, 60, 90]),
+    "servings": rng.randint(1, 8),
+    "difficulty": rng.choice(DIFFICULTIES),
+    "category": rng.choice(CATEGORIES),
+    "rating": rng.randint(1, 5),
+    "created_at": created,
+    "updated_at": created + timedelta(days=rng.randrange(30)),
+  }
+
+
+def generate(count, seed=42):
+  # (row, data, error) records, the shape bulk_import.import_recipes reads
+  rng = random.Random(seed)
+  for n in range(1, count + 1):
+    yield n, make_recipe(rng, n), None
+
+
+def seed_catalog(size, seed=42, reset=False, batch_size=5000, quiet=False):
+  # Returns the number of recipes inserted (0 when the catalog already has the requested size)
+  from sqlalchemy import delete, func, select
+  import database_models
+  import bulk_import
+  import facets
+  import migrations
+  from database import SessionLocal, engine
+
+  migrations.migrate(engine, seed=False)
+  db = SessionLocal()
+  try:
+    existing = db.scalar(select(func.count()).select_from(database_models.Recipe))
+    if existing and not reset:
+      if existing == size:
+        return 0
+      raise SystemExit(f"The database already has {existing} recipes; pass --reset to replace them with {size}")
+    if existing:
+      db.execute(delete(database_models.UploadJob))
+      db.execute(delete(database_models.Ingredient))
+      db.execute(delete(database_models.Recipe))
+      facets.rebuild(db) # Back to zero; the import counts the new recipes
+      db.commit()
+
+    started = time.perf_counter()
+
+    def progress(report):
+      if not quiet:
+        elapsed = time.perf_counter() - started
+        print(f"{report['inserted']}/{size} recipes ({report['inserted'] / elapsed:.0f}/s)", file=sys.stderr)
+
+    report = bulk_import.import_recipes(db, generate(size, seed), batch_size=batch_size, on_batch=progress)
+  finally:
+    db.close()
+  if report["failed"]:
+    raise SystemExit(f"Seeding failed for {report['failed']} recipes: {report['errors'][:3]}")
+  return report["inserted"]
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--size", default="1k", help="1k, 10k, 100k, 1m or a number of recipes")
+  parser.add_argument("--seed", type=int, default=42)
+  parser.add_argument("--reset", action="store_true", help="Delete existing recipes first")
+  parser.add_argument("--batch-size", type=int, default=5000)
+  args = parser.parse_args()
+
+  size = parse_size(args.size)
+  started = time.perf_counter()
+  inserted = seed_catalog(size, seed=args.seed, reset=args.reset, batch_size=args.batch_size)
+  print(json.dumps({"recipes": size, "inserted": inserted, "seconds": round(time.perf_counter() - started, 2)}))
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,251 @@
+import argparse
+import csv
+import io
+import json
+import sys
+import time
+from datetime import date
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+import database_models
+import crud
+import facets
+import ingredient_names
+import quantities
+import search as recipe_search
+from cache import recipe_cache
+from schemas import RecipeImport
+
+
+# Bulk loading for NDJSON / CSV recipe files, shared by POST /recipes/import, the startup
+# seeder and the command line:
+#
+#   python bulk_import.py recipes.ndjson
+#   python bulk_import.py recipes.csv --batch-size 5000
+#   cat recipes.ndjson | python bulk_import.py - --format ndjson
+#
+# Records are validated against schemas.RecipeImport a batch at a time. Each batch is one
+# multi-row INSERT ... RETURNING for the recipes, one lookup of their canonical ingredient
+# names, one INSERT for the ingredients (SQLAlchemy sends up to 1000 rows per statement) and
+# one update of the facet counts, then one commit. A record that fails validation or the
+# INSERT is reported with its row number and the rest of the batch still goes in.
+
+DEFAULT_BATCH_SIZE = 1000
+
+# The report keeps the first errors only, so a completely wrong file doesn't produce a huge response
+MAX_REPORTED_ERRORS = 1000
+
+FORMATS = ("ndjson", "csv")
+
+
+# ---------------- Readers ----------------
+# Both yield (row, data, error): the line number, the parsed record (a dict) and, if the
+# line couldn't be parsed, an error message instead of data.
+
+def read_ndjson(lines):
+  for row, line in enumerate(lines, 1):
+    if not line.strip():
+      continue
+    try:
+      data = json.loads(line)
+    except ValueError as e:
+      yield row, None, f"Invalid JSON: {e}"
+      continue
+    if not isinstance(data, dict):
+      yield row, None, "Expected a JSON object"
+      continue
+    yield row, data, None
+
+
+def _csv_list(value):
+  # ingredients/instructions cells hold JSON; instructions may also be one step per line
+  value = (value or "").strip()
+  if value.startswith("["):
+    return json.loads(value)
+  return [step.strip() for step in value.splitlines() if step.strip()]
+
+
+def read_csv(lines):
+  # One recipe per row with the RecipeCreate field names as headers. ingredients is a JSON
+  # list of {"name", "quantity"} objects.
+  reader = csv.DictReader(lines)
+  for data in reader:
+    row = reader.line_num
+    try:
+      data = {key: value for key, value in data.items() if key and value != ""} # Empty cells count as missing
+      for key in ("ingredients", "instructions"):
+        if key in data:
+          data[key] = _csv_list(data[key])
+    except ValueError as e:
+      yield row, None, f"Invalid JSON in column: {e}"
+      continue
+    yield row, data, None
+
+
+def detect_format(filename=None, content_type=None):
+  name = (filename or "").lower()
+  content_type = (content_type or "").lower()
+  if name.endswith(".csv") or "csv" in content_type:
+    return "csv"
+  if name.endswith((".ndjson", ".jsonl")) or "ndjson" in content_type or "jsonl" in content_type:
+    return "ndjson"
+  return None
+
+
+def read_records(stream, fmt):
+  # stream: a text stream (the CLI) or a binary one (an uploaded file)
+  if not isinstance(stream, io.TextIOBase):
+    stream = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+  if fmt == "csv":
+    return read_csv(stream)
+  if fmt == "ndjson":
+    return read_ndjson(stream)
+  raise ValueError(f"Unknown import format {fmt!r} (expected one of {', '.join(FORMATS)})")
+
+
+# ---------------- Import ----------------
+
+def _validation_message(error: ValidationError):
+  return "; ".join(
+    f"{'.'.join(str(part) for part in e['loc']) or 'record'}: {e['msg']}"
+    for e in error.errors(include_url=False)
+  )
+
+
+def _prepare(data):
+  # Validated record -> (recipe column values, ingredient rows)
+  recipe = RecipeImport.model_validate(data).model_dump()
+  ingredients = recipe.pop("ingredients")
+  values = crud.recipe_values(recipe)
+  # Every row of one executemany needs the same keys, so missing dates are filled in here
+  today = date.today()
+  values["created_at"] = values["created_at"] or today
+  values["updated_at"] = values["updated_at"] or today
+  return values, ingredients
+
+
+def _insert_rows(db: Session, rows):
+  # rows: [(row, values, ingredients)]; returns the new recipe ids in the same order
+  Recipe = database_models.Recipe
+  # One canonical-name lookup for the whole batch
+  canonical_ids = ingredient_names.resolve_ids(db, {ingredient["name"] for _, _, ingredients in rows for ingredient in ingredients})
+  ids = db.execute(
+    insert(Recipe).returning(Recipe.id, sort_by_parameter_order=True),
+    [dict(values, ingredient_count=ingredient_names.distinct_count(canonical_ids, ingredients)) for _, values, ingredients in rows],
+  ).scalars().all()
+  ingredient_rows = [
+    dict(
+      ingredient, recipe_id=recipe_id, position=i * crud.POSITION_GAP, ingredient_id=canonical_ids[ingredient["name"]],
+      **quantities.parse(ingredient["quantity"]),
+    )
+    for recipe_id, (_, _, ingredients) in zip(ids, rows)
+    for i, ingredient in enumerate(ingredients)
+  ]
+  if ingredient_rows:
+    db.execute(insert(database_models.Ingredient), ingredient_rows)
+  facets.apply(db, added=[values for _, values, _ in rows])
+  return ids
+
+
+def _insert_batch(db: Session, rows, report):
+  # The whole batch in one go inside a savepoint; if the database rejects it, redo it record
+  # by record so only the bad ones are lost
+  try:
+    with db.begin_nested():
+      return _insert_rows(db, rows)
+  except DBAPIError:
+    pass
+  ids = []
+  for row in rows:
+    try:
+      with db.begin_nested():
+        ids.extend(_insert_rows(db, [row]))
+    except DBAPIError as e:
+      _report_error(report, row[0], f"Database error: {e.orig}")
+  return ids
+
+
+def _report_error(report, row, message):
+  report["failed"] += 1
+  if len(report["errors"]) < MAX_REPORTED_ERRORS:
+    report["errors"].append({"row": row, "error": message})
+
+
+def _flush_batch(db: Session, rows, report, on_batch=None):
+  ids = _insert_batch(db, rows, report)
+  if ids:
+    recipe_search.index_recipes(db, ids)
+    crud.touch_catalog(db)
+  db.commit()
+  if ids:
+    recipe_cache.invalidate_all() # Imports touch arbitrary buckets, so drop every cached response at once
+  report["inserted"] += len(ids)
+  if on_batch is not None:
+    on_batch(report)
+
+
+def import_recipes(db: Session, records, batch_size=DEFAULT_BATCH_SIZE, on_batch=None):
+  # records: (row, data, error) tuples as yielded by the readers. Commits every batch_size
+  # valid records, so an interrupted import keeps everything before the last commit.
+  # Returns a dict shaped like schemas.ImportReport.
+  report = {"inserted": 0, "failed": 0, "errors": []}
+  batch = []
+  for row, data, error in records:
+    if error is None:
+      try:
+        values, ingredients = _prepare(data)
+      except ValidationError as e:
+        error = _validation_message(e)
+    if error is not None:
+      _report_error(report, row, error)
+      continue
+    batch.append((row, values, ingredients))
+    if len(batch) >= batch_size:
+      _flush_batch(db, batch, report, on_batch)
+      batch = []
+  if batch:
+    _flush_batch(db, batch, report, on_batch)
+  return report
+
+
+# ---------------- CLI ----------------
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Bulk-load recipes from an NDJSON or CSV file")
+  parser.add_argument("path", help="File to import, or - for stdin")
+  parser.add_argument("--format", choices=FORMATS, help="Defaults to the file extension")
+  parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Records per INSERT batch and commit")
+  args = parser.parse_args(argv)
+
+  fmt = args.format or detect_format(args.path)
+  if fmt is None:
+    parser.error("Can't tell the format from the file name; pass --format")
+
+  from database import SessionLocal, engine
+  import migrations
+  migrations.migrate(engine, seed=False) # The file is the catalog; no demo recipes mixed in
+
+  started = time.perf_counter()
+
+  def progress(report):
+    elapsed = time.perf_counter() - started
+    print(f"{report['inserted']} inserted, {report['failed']} failed ({report['inserted'] / elapsed:.0f} recipes/s)", file=sys.stderr)
+
+  stream = sys.stdin if args.path == "-" else open(args.path, encoding="utf-8-sig", newline="")
+  db = SessionLocal()
+  try:
+    with stream:
+      report = import_recipes(db, read_records(stream, fmt), batch_size=args.batch_size, on_batch=progress)
+  finally:
+    db.close()
+
+  for error in report["errors"]:
+    print(f"row {error['row']}: {error['error']}", file=sys.stderr)
+  print(json.dumps({"inserted": report["inserted"], "failed": report["failed"], "seconds": round(time.perf_counter() - started, 2)}))
+  return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,259 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+# ---------------- Backends ----------------
+# A backend stores bytes under string keys and keeps integer counters. LocalCache lives in
+# the worker process; RedisCache is shared by every worker. Anything with the same methods
+# (and a shared flag: do all workers see the same counters?) can be plugged in through
+# make_backend().
+
+class LocalCache:
+  # Bounded LRU with a per-entry TTL, safe to share between threadpool workers
+  shared = False
+
+  def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024, ttl=300):
+    self.max_entries = max_entries
+    self.max_bytes = max_bytes
+    self.ttl = ttl
+    self._data = OrderedDict() # key -> (expires_at, value)
+    self._counters = {}
+    self._bytes = 0
+    self._lock = threading.Lock()
+    self.evictions = 0
+    self.expirations = 0
+
+  def get_many(self, keys):
+    now = time.monotonic()
+    values = []
+    with self._lock:
+      for key in keys:
+        entry = self._data.get(key)
+        if entry is None:
+          values.append(None)
+        elif entry[0] < now:
+          self._drop(key)
+          self.expirations += 1
+          values.append(None)
+        else:
+          self._data.move_to_end(key)
+          values.append(entry[1])
+    return values
+
+  def set(self, key, value, ttl=None):
+    if len(value) > self.max_bytes:
+      return
+    with self._lock:
+      self._drop(key)
+      self._data[key] = (time.monotonic() + (ttl or self.ttl), value)
+      self._bytes += len(value)
+      while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+        oldest = next(iter(self._data))
+        self._drop(oldest)
+        self.evictions += 1
+
+  def delete(self, *keys):
+    with self._lock:
+      for key in keys:
+        self._drop(key)
+
+  def _drop(self, key):
+    entry = self._data.pop(key, None)
+    if entry is not None:
+      self._bytes -= len(entry[1])
+
+  def get_counters(self, names):
+    with self._lock:
+      return [self._counters.get(name, 0) for name in names]
+
+  def incr(self, name):
+    with self._lock:
+      self._counters[name] = self._counters.get(name, 0) + 1
+      return self._counters[name]
+
+  def clear(self):
+    with self._lock:
+      self._data.clear()
+      self._bytes = 0
+
+  def info(self):
+    with self._lock:
+      return {
+        "backend": "local",
+        "entries": len(self._data),
+        "bytes": self._bytes,
+        "evictions": self.evictions,
+        "expirations": self.expirations,
+      }
+
+
+class RedisCache:
+  # Shared across workers and hosts; Redis does the LRU/TTL work (set maxmemory-policy allkeys-lru)
+  shared = True
+
+  def __init__(self, url, ttl=300, prefix="recipevault:"):
+    try:
+      import redis
+    except ImportError:
+      raise RuntimeError("CACHE_BACKEND=redis needs the redis package (pip install redis)")
+    self._redis = redis.Redis.from_url(url)
+    self.ttl = ttl
+    self.prefix = prefix
+
+  def get_many(self, keys):
+    return self._redis.mget([self.prefix + key for key in keys])
+
+  def set(self, key, value, ttl=None):
+    self._redis.set(self.prefix + key, value, ex=ttl or self.ttl)
+
+  def delete(self, *keys):
+    if keys:
+      self._redis.delete(*[self.prefix + key for key in keys])
+
+  def get_counters(self, names):
+    return [int(v or 0) for v in self._redis.mget([self.prefix + "ctr:" + name for name in names])]
+
+  def incr(self, name):
+    return self._redis.incr(self.prefix + "ctr:" + name)
+
+  def clear(self):
+    for key in self._redis.scan_iter(self.prefix + "*"):
+      self._redis.delete(key)
+
+  def info(self):
+    stats = self._redis.info("stats")
+    return {"backend": "redis", "evictions": stats.get("evicted_keys"), "expirations": stats.get("expired_keys")}
+
+
+def make_backend():
+  kind = os.getenv("CACHE_BACKEND", "local").lower()
+  ttl = int(os.getenv("CACHE_TTL_SECONDS", "300"))
+  if kind in ("off", "none", ""):
+    return None
+  if kind == "redis":
+    return RedisCache(os.getenv("REDIS_URL", "redis://localhost:6379/0"), ttl=ttl)
+  if kind == "local":
+    return LocalCache(
+      max_entries=int(os.getenv("CACHE_MAX_ENTRIES", "1024")),
+      max_bytes=int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+      ttl=ttl,
+    )
+  raise RuntimeError(f"Unknown CACHE_BACKEND {kind!r} (expected local, redis or off)")
+
+
+# ---------------- Recipe cache ----------------
+
+def _value(enum_or_str):
+  return getattr(enum_or_str, "value", enum_or_str)
+
+
+class RecipeCache:
+  # Read-through cache of pre-serialized JSON response bodies.
+  #
+  # Every entry is stamped with the versions of the counters it depends on and is only served
+  # while they still match, so invalidating means bumping a counter, which works the same for
+  # a per-process and a shared backend. A detail entry depends on its recipe's counter. A
+  # listing can't be found by recipe id, so it depends on the (category, difficulty) bucket it
+  # was filtered on; a write bumps only the buckets the old and new row fall into. Everything
+  # also depends on a global counter for bulk changes.
+  #
+  # Counters in a per-process backend only see this worker's writes, so there entries are also
+  # stamped with the catalog version (catalog_state, bumped by every write from any worker or
+  # script) and the caller reads it first: one single-row SELECT per hit, and any write anywhere
+  # retires every local entry.
+  def __init__(self, backend):
+    self.backend = backend
+    self.hits = 0
+    self.misses = 0
+    self._lock = threading.Lock()
+
+  @property
+  def enabled(self):
+    return self.backend is not None
+
+  @property
+  def needs_catalog_version(self):
+    # Pass catalog_version to get_recipe/get_list when this is True
+    return self.enabled and not getattr(self.backend, "shared", False)
+
+  @staticmethod
+  def _bucket(category, difficulty):
+    return f"bucket:{_value(category) or '*'}:{_value(difficulty) or '*'}"
+
+  def _token(self, counter, catalog_version):
+    token = b"%d.%d" % tuple(self.backend.get_counters(["global", counter]))
+    if self.needs_catalog_version:
+      token += b".c%d" % catalog_version
+    return token + b"|"
+
+  def _get(self, key, counter, catalog_version):
+    # Returns (hit, token); hit is (body, meta) or None. Pass the token to _set: it was read
+    # before the caller queried the database, so a write landing mid-request leaves the
+    # stored entry stale.
+    if not self.enabled or (catalog_version is None and self.needs_catalog_version):
+      return None, None
+    token = self._token(counter, catalog_version)
+    entry = self.backend.get_many([key])[0]
+    hit = None
+    if entry is not None and entry.startswith(token):
+      meta, _, body = entry[len(token):].partition(b"\0")
+      hit = (body, meta.decode())
+    with self._lock:
+      if hit:
+        self.hits += 1
+      else:
+        self.misses += 1
+    return hit, token
+
+  def _set(self, key, token, body, meta=""):
+    # meta: a short string stored alongside the body (the ETag and Last-Modified)
+    if self.enabled and token is not None:
+      self.backend.set(key, token + meta.encode() + b"\0" + body)
+
+  def get_recipe(self, recipe_id, catalog_version=None):
+    return self._get(f"recipe:{recipe_id}", f"recipe:{recipe_id}", catalog_version)
+
+  def set_recipe(self, recipe_id, token, body, meta=""):
+    self._set(f"recipe:{recipe_id}", token, body, meta)
+
+  def get_list(self, key, category=None, difficulty=None, catalog_version=None):
+    return self._get(f"list:{key}", self._bucket(category, difficulty), catalog_version)
+
+  def set_list(self, key, token, body, meta=""):
+    self._set(f"list:{key}", token, body, meta)
+
+  def invalidate_recipe(self, recipe_id, *rows):
+    # rows: the (category, difficulty) the recipe had before and/or after the write
+    if not self.enabled:
+      return
+    self.backend.incr(f"recipe:{recipe_id}")
+    self.backend.delete(f"recipe:{recipe_id}") # Would never be served again; free the space now
+    buckets = set()
+    for category, difficulty in rows:
+      for c in (category, None):
+        for d in (difficulty, None):
+          buckets.add(self._bucket(c, d))
+    for bucket in buckets:
+      self.backend.incr(bucket)
+
+  def invalidate_all(self):
+    if self.enabled:
+      self.backend.incr("global")
+
+  def stats(self):
+    if not self.enabled:
+      return {"backend": "off"}
+    with self._lock:
+      hits, misses = self.hits, self.misses
+    total = hits + misses
+    return dict(
+      self.backend.info(),
+      hits=hits,
+      misses=misses,
+      hit_ratio=round(hits / total, 4) if total else None,
+    )
+
+
+recipe_cache = RecipeCache(make_backend())
@@ -0,0 +1,594 @@
+import base64
+import bisect
+import json
+from datetime import date
+from sqlalchemy import text, exists, tuple_, select, insert, update, delete, func, case, null, distinct, literal
+from sqlalchemy.orm import Session
+import database_models
+import ingredient_names
+import quantities
+
+
+# Columns behind the "card" view, plus created_at which the page cursor needs
+CARD_COLUMNS = (
+  database_models.Recipe.id,
+  database_models.Recipe.title,
+  database_models.Recipe.description,
+  database_models.Recipe.prep_time,
+  database_models.Recipe.cook_time,
+  database_models.Recipe.servings,
+  database_models.Recipe.difficulty,
+  database_models.Recipe.category,
+  database_models.Recipe.image_url,
+  database_models.Recipe.image_variants,
+  database_models.Recipe.rating,
+  database_models.Recipe.created_at,
+)
+
+
+# Columns behind the full view, in schemas.Recipe order (ingredients are attached separately)
+RECIPE_COLUMNS = (
+  database_models.Recipe.id,
+  database_models.Recipe.title,
+  database_models.Recipe.description,
+  database_models.Recipe.instructions,
+  database_models.Recipe.prep_time,
+  database_models.Recipe.cook_time,
+  database_models.Recipe.servings,
+  database_models.Recipe.difficulty,
+  database_models.Recipe.category,
+  database_models.Recipe.image_url,
+  database_models.Recipe.image_variants,
+  database_models.Recipe.rating,
+  database_models.Recipe.created_at,
+  database_models.Recipe.updated_at,
+)
+
+
+# Gap between consecutive ingredients.position values when a recipe's lines are numbered
+POSITION_GAP = 1024
+
+
+class InvalidCursor(ValueError):
+  pass
+
+
+def encode_cursor(created_at, recipe_id):
+  raw = json.dumps([created_at.isoformat() if created_at else None, recipe_id])
+  return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+  try:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    created_at, recipe_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    return date.fromisoformat(created_at), int(recipe_id)
+  except Exception:
+    raise InvalidCursor(f"Invalid cursor {cursor!r}")
+
+
+def filter_recipes(query, search=None, category=None, difficulty=None):
+  # Push the GET /recipes filters down into SQL so only matching rows leave the database
+  Recipe = database_models.Recipe
+  Ingredient = database_models.Ingredient
+
+  if category is not None:
+    query = query.filter(Recipe.category == getattr(category, "value", category))
+  if difficulty is not None:
+    query = query.filter(Recipe.difficulty == getattr(difficulty, "value", difficulty))
+
+  search = (search or "").strip()
+  if search:
+    # EXISTS keeps one row per recipe, no matter how many of its ingredients match
+    ingredient_match = exists().where(
+      Ingredient.recipe_id == Recipe.id,
+      Ingredient.name.icontains(search, autoescape=True),
+    )
+    query = query.filter(
+      Recipe.title.icontains(search, autoescape=True)
+      | Recipe.description.icontains(search, autoescape=True)
+      | ingredient_match
+    )
+  return query
+
+
+# Reads return plain dicts shaped like schemas.Recipe / schemas.RecipeCard, built straight from
+# row tuples. Nothing goes through ORM objects or Pydantic validation on the way out; the API
+# encodes them with serializers.dump_json.
+
+def _attach_ingredients(db: Session, recipes, recipe_ids):
+  # One query for every recipe's ingredients. recipe_ids can be a list or a SELECT of ids,
+  # so a whole filtered catalog doesn't turn into a giant IN (...) literal.
+  Ingredient = database_models.Ingredient
+  by_id = {}
+  for recipe in recipes:
+    recipe["ingredients"] = []
+    by_id[recipe["id"]] = recipe["ingredients"]
+  if not by_id:
+    return recipes
+  rows = db.execute(
+    select(Ingredient.recipe_id, Ingredient.name, Ingredient.quantity, Ingredient.amount, Ingredient.unit)
+    .where(Ingredient.recipe_id.in_(recipe_ids))
+    .order_by(Ingredient.recipe_id, Ingredient.position, Ingredient.id)
+  )
+  for recipe_id, name, quantity, amount, unit in rows:
+    ingredients = by_id.get(recipe_id)
+    if ingredients is not None:
+      ingredients.append({"name": name, "quantity": quantity, "amount": amount, "unit": unit})
+  return recipes
+
+
+def _card(row):
+  card = row._asdict()
+  card.pop("created_at", None) # Only selected for the page cursor
+  return card
+
+
+def list_recipes(db: Session, search=None, category=None, difficulty=None):
+  Recipe = database_models.Recipe
+  query = filter_recipes(select(*RECIPE_COLUMNS), search=search, category=category, difficulty=difficulty)
+  recipes = [row._asdict() for row in db.execute(query.order_by(Recipe.id))]
+  matching_ids = filter_recipes(select(Recipe.id), search=search, category=category, difficulty=difficulty)
+  return _attach_ingredients(db, recipes, matching_ids)
+
+
+def get_catalog_state(db: Session):
+  # (version, updated_at) of the whole catalog
+  CatalogState = database_models.CatalogState
+  return db.execute(
+    select(CatalogState.version, CatalogState.updated_at).where(CatalogState.id == 1)
+  ).one()
+
+
+def begin_write(db: Session):
+  # Call first thing in a write that reads the values it's about to replace (facet counts,
+  # cache invalidation). Postgres locks those rows with FOR UPDATE, but pysqlite only takes the
+  # write lock at the first INSERT/UPDATE/DELETE, so two writers could both read the same old
+  # values first. BEGIN IMMEDIATE takes the lock up front; the other writer waits for it
+  # (up to SQLITE_BUSY_TIMEOUT_SECONDS) and then reads what this one committed.
+  if db.get_bind().dialect.name == "sqlite":
+    db.execute(text("BEGIN IMMEDIATE"))
+
+
+def touch_catalog(db: Session):
+  # Call in the same transaction as any recipe write; it invalidates every listing ETag.
+  # The new version is left in db.info["catalog_version"] for after-commit hooks (search.py).
+  CatalogState = database_models.CatalogState
+  version = db.execute(
+    update(CatalogState).where(CatalogState.id == 1)
+    .values(version=CatalogState.version + 1, updated_at=func.now())
+    .returning(CatalogState.version)
+  ).scalar_one()
+  db.info["catalog_version"] = version
+  return version
+
+
+def recipe_values(data):
+  # Pydantic dump -> column values: enums to their string values, HttpUrl to str
+  data = dict(data)
+  data.pop("id", None) # The path (or the database) decides the id, never the body
+  data.pop("image_variants", None) # Only the upload pipeline writes these
+  if hasattr(data.get("difficulty"), "value"):
+    data["difficulty"] = data["difficulty"].value
+  if hasattr(data.get("category"), "value"):
+    data["category"] = data["category"].value
+  if data.get("image_url") is not None:
+    data["image_url"] = str(data["image_url"])
+  return data
+
+
+def ingredient_rows(db: Session, ingredients, canonical_ids=None):
+  # IngredientItem dumps -> (ingredients table rows minus recipe_id, recipes.ingredient_count).
+  # The canonical ingredient and the parsed quantity are worked out here, once per write.
+  # canonical_ids: names already resolved with ingredient_names.resolve_ids (batches do that
+  # once for every recipe in them); looked up here otherwise.
+  ids = canonical_ids if canonical_ids is not None else ingredient_names.resolve_ids(db, {ing["name"] for ing in ingredients})
+  rows = [
+    dict(name=ing["name"], quantity=ing["quantity"], ingredient_id=ids[ing["name"]], **quantities.parse(ing["quantity"]))
+    for ing in ingredients
+  ]
+  return rows, ingredient_names.distinct_count(ids, ingredients)
+
+
+def _ingredient_lines(rows):
+  # Ingredient rows -> the schemas.IngredientLine dicts a write responds with
+  return [{"name": row["name"], "quantity": row["quantity"], "amount": row["amount"], "unit": row["unit"]} for row in rows]
+
+
+def _match_ingredients(existing, ingredients):
+  # -> for each new line, the index of the stored row it keeps (or None for a new row).
+  # Same name and quantity first, then same name (the quantity was edited), then whatever is
+  # left over pairs up in order (a line was rewritten). Rows never matched get deleted.
+  match = [None] * len(ingredients)
+  free = set(range(len(existing)))
+  for key in (lambda item: (item["name"], item["quantity"]), lambda item: item["name"]):
+    candidates = {}
+    for j, row in enumerate(existing):
+      if j in free:
+        candidates.setdefault(key(row._mapping), []).append(j)
+    for i, ing in enumerate(ingredients):
+      if match[i] is None and candidates.get(key(ing)):
+        match[i] = candidates[key(ing)].pop(0)
+        free.discard(match[i])
+  leftover = iter(sorted(free))
+  for i in range(len(ingredients)):
+    if match[i] is None:
+      match[i] = next(leftover, None)
+      free.discard(match[i])
+  return match
+
+
+def _ingredient_positions(current):
+  # current: each new line's stored position, or None -> the positions to give them. The longest
+  # run of stored positions that is already in order stays put; everything else is slotted into
+  # the gaps around it, and only when a gap is too small does the whole recipe get renumbered.
+  tails, tail_at, previous = [], [], [None] * len(current) # Longest increasing subsequence
+  for i, position in enumerate(current):
+    if position is None:
+      continue
+    k = bisect.bisect_left(tails, position)
+    previous[i] = tail_at[k - 1] if k else None
+    if k == len(tails):
+      tails.append(position)
+      tail_at.append(i)
+    else:
+      tails[k] = position
+      tail_at[k] = i
+  keep = set()
+  i = tail_at[-1] if tail_at else None
+  while i is not None:
+    keep.add(i)
+    i = previous[i]
+
+  positions = list(current)
+  i = 0
+  while i < len(current):
+    if i in keep:
+      i += 1
+      continue
+    end = i
+    while end < len(current) and end not in keep:
+      end += 1
+    low = positions[i - 1] if i else None
+    high = current[end] if end < len(current) else None
+    count = end - i
+    if low is None and high is None:
+      slots = [n * POSITION_GAP for n in range(count)]
+    elif low is None:
+      slots = [high - (count - n) * POSITION_GAP for n in range(count)]
+    elif high is None:
+      slots = [low + (n + 1) * POSITION_GAP for n in range(count)]
+    else:
+      step = (high - low) // (count + 1)
+      if step < 1:
+        return [n * POSITION_GAP for n in range(len(current))]
+      slots = [low + (n + 1) * step for n in range(count)]
+    positions[i:end] = slots
+    i = end
+  return positions
+
+
+def _diff_ingredients(db: Session, recipe_id, ingredients, canonical_ids=None):
+  # Compares a recipe's new ingredient list with its stored rows (_match_ingredients), so adding,
+  # removing or moving one line only writes that line. Returns (plan for _apply_ingredient_diff,
+  # the new IngredientLine dicts, recipes.ingredient_count). Only edited and added lines are
+  # resolved and parsed; an edit that leaves the ingredients alone costs this one SELECT.
+  Ingredient = database_models.Ingredient
+  existing = db.execute(
+    select(Ingredient.id, Ingredient.name, Ingredient.quantity, Ingredient.ingredient_id, Ingredient.amount, Ingredient.unit, Ingredient.position)
+    .where(Ingredient.recipe_id == recipe_id)
+    .order_by(Ingredient.position, Ingredient.id)
+  ).all()
+  match = _match_ingredients(existing, ingredients)
+  changed = [
+    i for i, ing in enumerate(ingredients)
+    if match[i] is None or (existing[match[i]].name, existing[match[i]].quantity) != (ing["name"], ing["quantity"])
+  ]
+  rows = dict(zip(changed, ingredient_rows(db, [ingredients[i] for i in changed], canonical_ids)[0])) if changed else {}
+  positions = _ingredient_positions([existing[j].position if j is not None else None for j in match])
+
+  lines, canonical = [], set()
+  updates, moves, inserts = [], [], []
+  for i, j in enumerate(match):
+    if i in rows:
+      row = rows[i]
+      if j is None:
+        inserts.append(dict(row, recipe_id=recipe_id, position=positions[i]))
+      else:
+        updates.append(dict(row, id=existing[j].id, position=positions[i]))
+    else:
+      row = existing[j]._asdict()
+      if positions[i] != row["position"]:
+        moves.append({"id": row["id"], "position": positions[i]})
+    lines.append(row)
+    canonical.add(row["ingredient_id"])
+  stale = sorted(set(range(len(existing))) - set(match))
+  plan = (updates, moves, inserts, [existing[j].id for j in stale])
+  return plan, _ingredient_lines(lines), len(canonical - {None})
+
+
+def _apply_ingredient_diff(db: Session, plan):
+  # At most four statements, each skipped when it has nothing to do
+  Ingredient = database_models.Ingredient
+  updates, moves, inserts, stale = plan
+  if updates:
+    db.execute(update(Ingredient), updates) # Bulk UPDATE by primary key, one executemany
+  if moves:
+    db.execute(update(Ingredient), moves) # Lines that only changed places
+  if stale:
+    db.execute(delete(Ingredient).where(Ingredient.id.in_(stale)))
+  if inserts:
+    db.execute(insert(Ingredient), inserts)
+
+
+def insert_recipe(db: Session, data, ingredients, canonical_ids=None):
+  # Three statements however many ingredients there are: INSERT ... RETURNING for the recipe,
+  # the canonical ingredient lookup, then one multi-row INSERT for its ingredients (two more
+  # when some ingredient has never been seen before). Returns the full recipe as a dict.
+  Recipe = database_models.Recipe
+  values = recipe_values(data)
+  rows, ingredient_count = ingredient_rows(db, ingredients, canonical_ids)
+  row = db.execute(
+    insert(Recipe).values(**values, ingredient_count=ingredient_count).returning(Recipe.id, Recipe.created_at, Recipe.updated_at, Recipe.version)
+  ).one()
+  if rows:
+    db.execute(insert(database_models.Ingredient), [dict(ing, recipe_id=row.id, position=i * POSITION_GAP) for i, ing in enumerate(rows)])
+  return dict(values, id=row.id, created_at=row.created_at, updated_at=row.updated_at, version=row.version, ingredients=_ingredient_lines(rows))
+
+
+def replace_recipe(db: Session, recipe_id, data, ingredients, expected_version=None, canonical_ids=None):
+  # PUT: UPDATE ... RETURNING for the recipe's columns, then only the ingredient rows that
+  # changed (_diff_ingredients). Returns the full recipe as a dict, or None if it doesn't exist
+  # (or, with expected_version, if someone else has written it since).
+  Recipe = database_models.Recipe
+  values = recipe_values(data)
+  stmt = update(Recipe).where(Recipe.id == recipe_id)
+  if expected_version is not None:
+    stmt = stmt.where(Recipe.version == expected_version)
+  # The resized variants only stay while they are still of the same image
+  image_variants = case((Recipe.image_url == values.get("image_url"), Recipe.image_variants), else_=null())
+  plan, lines, ingredient_count = _diff_ingredients(db, recipe_id, ingredients, canonical_ids)
+  row = db.execute(
+    stmt.values(**values, image_variants=image_variants, ingredient_count=ingredient_count, version=Recipe.version + 1)
+    .returning(Recipe.created_at, Recipe.updated_at, Recipe.version, Recipe.image_variants)
+  ).one_or_none()
+  if row is None:
+    return None
+  _apply_ingredient_diff(db, plan)
+  return dict(values, id=recipe_id, image_variants=row.image_variants, created_at=row.created_at, updated_at=row.updated_at, version=row.version, ingredients=lines)
+
+
+def patch_recipe(db: Session, recipe_id, fields, ingredients=None, expected_version=None):
+  # PATCH: one UPDATE ... RETURNING that sets only the given columns (plus the version), and the
+  # ingredient diff when ingredients is given. Returns the full recipe as a dict (with its
+  # version), or None like replace_recipe.
+  Recipe = database_models.Recipe
+  values = recipe_values(fields)
+  stmt = update(Recipe).where(Recipe.id == recipe_id)
+  if expected_version is not None:
+    stmt = stmt.where(Recipe.version == expected_version)
+  if "image_url" in values:
+    values["image_variants"] = case((Recipe.image_url == values["image_url"], Recipe.image_variants), else_=null())
+  plan = None
+  if ingredients is not None:
+    plan, lines, values["ingredient_count"] = _diff_ingredients(db, recipe_id, ingredients)
+  row = db.execute(
+    stmt.values(**values, version=Recipe.version + 1).returning(*RECIPE_COLUMNS, Recipe.version)
+  ).one_or_none()
+  if row is None:
+    return None
+  recipe = row._asdict()
+  if plan is None:
+    return _attach_ingredients(db, [recipe], [recipe_id])[0]
+  _apply_ingredient_diff(db, plan)
+  recipe["ingredients"] = lines
+  return recipe
+
+
+def _meta_columns():
+  Recipe = database_models.Recipe
+  return (Recipe.category, Recipe.difficulty, Recipe.version, Recipe.rating, Recipe.prep_time, Recipe.cook_time)
+
+
+def get_recipe_meta(db: Session, recipe_id, for_update=False):
+  # (category, difficulty, version, and the other columns facets.py counts) of a recipe, or
+  # None if it doesn't exist. for_update locks the row until commit, so the values a write
+  # replaces can't change underneath it. That's FOR UPDATE on Postgres; SQLite has no row
+  # locks, so on SQLite the write has to have called begin_write() first.
+  query = select(*_meta_columns()).where(database_models.Recipe.id == recipe_id)
+  if for_update:
+    query = query.with_for_update()
+  return db.execute(query).one_or_none()
+
+
+def get_recipes_meta(db: Session, recipe_ids, for_update=False):
+  # get_recipe_meta for many recipes in one query -> {id: dict}. Rows are locked in id order,
+  # so two batches touching the same recipes can't deadlock.
+  Recipe = database_models.Recipe
+  query = select(Recipe.id, *_meta_columns()).where(Recipe.id.in_(recipe_ids)).order_by(Recipe.id)
+  if for_update:
+    query = query.with_for_update()
+  return {row.id: row._asdict() for row in db.execute(query)}
+
+
+def delete_recipe(db: Session, recipe_id, expected_version=None):
+  # One DELETE ... RETURNING; the ingredients go with it through ON DELETE CASCADE. Returns
+  # the title plus the columns cache invalidation and facets.py need, or None if it doesn't
+  # exist (or, with expected_version, if someone else has written it since).
+  Recipe = database_models.Recipe
+  stmt = delete(Recipe).where(Recipe.id == recipe_id)
+  if expected_version is not None:
+    stmt = stmt.where(Recipe.version == expected_version)
+  return db.execute(
+    stmt.returning(Recipe.title, Recipe.category, Recipe.difficulty, Recipe.rating, Recipe.prep_time, Recipe.cook_time)
+  ).one_or_none()
+
+
+def get_recipe(db: Session, recipe_id):
+  # Recipe and ingredients in one LEFT JOIN; returns the recipe dict plus its "version", or None
+  Recipe = database_models.Recipe
+  Ingredient = database_models.Ingredient
+  rows = db.execute(
+    select(
+      *RECIPE_COLUMNS, Recipe.version,
+      Ingredient.name.label("ingredient_name"), Ingredient.quantity.label("ingredient_quantity"),
+      Ingredient.amount.label("ingredient_amount"), Ingredient.unit.label("ingredient_unit"),
+    )
+    .outerjoin(Ingredient, Ingredient.recipe_id == Recipe.id)
+    .where(Recipe.id == recipe_id)
+    .order_by(Ingredient.position, Ingredient.id)
+  ).all()
+  if not rows:
+    return None
+  recipe = rows[0]._asdict()
+  for key in ("ingredient_name", "ingredient_quantity", "ingredient_amount", "ingredient_unit"):
+    recipe.pop(key)
+  recipe["ingredients"] = [
+    {"name": row.ingredient_name, "quantity": row.ingredient_quantity, "amount": row.ingredient_amount, "unit": row.ingredient_unit}
+    for row in rows if row.ingredient_name is not None
+  ]
+  return recipe
+
+
+def list_recipe_cards(db: Session, search=None, category=None, difficulty=None):
+  query = filter_recipes(select(*CARD_COLUMNS), search=search, category=category, difficulty=difficulty)
+  return [_card(row) for row in db.execute(query.order_by(database_models.Recipe.id))]
+
+
+def list_recipes_page(db: Session, limit, after=None, card=False, search=None, category=None, difficulty=None):
+  # Keyset pagination on (created_at, id), newest first. Each page is an index range scan
+  # of limit + 1 rows, so its cost doesn't grow with how deep into the catalog the client is.
+  Recipe = database_models.Recipe
+
+  # Full pages fetch their ingredients in one extra IN query instead of multiplying the
+  # LIMITed rows with a join
+  query = select(*CARD_COLUMNS) if card else select(*RECIPE_COLUMNS)
+  query = filter_recipes(query, search=search, category=category, difficulty=difficulty)
+
+  if after:
+    created_at, recipe_id = decode_cursor(after)
+    query = query.filter(tuple_(Recipe.created_at, Recipe.id) < tuple_(created_at, recipe_id))
+
+  rows = db.execute(query.order_by(Recipe.created_at.desc(), Recipe.id.desc()).limit(limit + 1)).all()
+
+  next_cursor = None
+  if len(rows) > limit:
+    rows = rows[:limit]
+    last = rows[-1]
+    next_cursor = encode_cursor(last.created_at, last.id)
+
+  if card:
+    return [_card(row) for row in rows], next_cursor
+  recipes = [row._asdict() for row in rows]
+  return _attach_ingredients(db, recipes, [recipe["id"] for recipe in recipes]), next_cursor
+
+
+def get_recipes_by_ids(db: Session, ids, card=False, search=None, category=None, difficulty=None):
+  # GET /recipes?ids=: one IN query for the recipes and one for all their ingredients, in the
+  # order the ids were given. Ids that don't exist (or don't match the filters) are left out.
+  Recipe = database_models.Recipe
+  query = select(*CARD_COLUMNS) if card else select(*RECIPE_COLUMNS)
+  query = filter_recipes(query.where(Recipe.id.in_(ids)), search=search, category=category, difficulty=difficulty)
+  found = {row.id: row for row in db.execute(query)}
+  rows = [found[recipe_id] for recipe_id in dict.fromkeys(ids) if recipe_id in found] # Repeated ids once
+  if card:
+    return [_card(row) for row in rows]
+  recipes = [row._asdict() for row in rows]
+  return _attach_ingredients(db, recipes, [recipe["id"] for recipe in recipes])
+
+
+def pantry_matches(db: Session, names, limit=20, max_missing=None):
+  # Recipes ranked by how many of the given ingredients they use, then by how few others they
+  # need. Matching is a GROUP BY over ix_ingredients_ingredient_id_recipe_id: each pantry item
+  # is one index range of recipe ids, and the count per recipe is the size of the intersection.
+  Recipe = database_models.Recipe
+  Ingredient = database_models.Ingredient
+  pantry_ids = {i for i in ingredient_names.resolve_ids(db, set(names), create=False).values() if i is not None}
+  if not pantry_ids:
+    return []
+
+  matches = (
+    select(Ingredient.recipe_id, func.count(distinct(Ingredient.ingredient_id)).label("matched_count"))
+    .where(Ingredient.ingredient_id.in_(pantry_ids))
+    .group_by(Ingredient.recipe_id)
+    .subquery()
+  )
+  missing_count = Recipe.ingredient_count - matches.c.matched_count
+  query = (
+    select(*[column for column in CARD_COLUMNS if column.key != "created_at"])
+    .join(matches, matches.c.recipe_id == Recipe.id)
+  )
+  if max_missing is not None:
+    query = query.where(missing_count <= max_missing)
+  rows = db.execute(query.order_by(matches.c.matched_count.desc(), missing_count, Recipe.id).limit(limit)).all()
+
+  # Which of each recipe's own ingredient lines the pantry covers, in one more query
+  recipes = {}
+  for row in rows:
+    recipes[row.id] = dict(row._asdict(), matched=[], missing=[])
+  if recipes:
+    lines = db.execute(
+      select(Ingredient.recipe_id, Ingredient.name, Ingredient.ingredient_id)
+      .where(Ingredient.recipe_id.in_(list(recipes)))
+      .order_by(Ingredient.recipe_id, Ingredient.position, Ingredient.id)
+    )
+    for recipe_id, name, ingredient_id in lines:
+      recipes[recipe_id]["matched" if ingredient_id in pantry_ids else "missing"].append(name)
+  return list(recipes.values())
+
+
+# g or ml per unit of Ingredient.unit (NULL for countable units); built once, it's the same every time
+UNIT_FACTOR = case(dict(quantities.MASS, **quantities.VOLUME), value=database_models.Ingredient.unit)
+
+
+def shopping_list(db: Session, entries):
+  # entries: [(recipe_id, servings or None for the recipe's own)], repeats allowed. Returns the
+  # ids that don't exist, and the ingredients scaled and summed per (ingredient, base unit).
+  # Scaling and summing are one GROUP BY in the database over the parsed base_amount column,
+  # however many recipes and ingredient rows there are.
+  Recipe = database_models.Recipe
+  Ingredient = database_models.Ingredient
+  CanonicalIngredient = database_models.CanonicalIngredient
+
+  batches = {} # recipe_id -> how many times it's cooked as written
+  servings = {} # recipe_id -> extra servings asked for explicitly
+  for recipe_id, wanted in entries:
+    if wanted is None:
+      batches[recipe_id] = batches.get(recipe_id, 0) + 1
+    else:
+      servings[recipe_id] = servings.get(recipe_id, 0.0) + float(wanted)
+  recipe_ids = set(batches) | set(servings)
+  missing = recipe_ids - set(db.scalars(select(Recipe.id).where(Recipe.id.in_(recipe_ids))))
+  if missing:
+    return sorted(missing), []
+
+  # factor = batches + servings / recipe servings, per recipe
+  factor = literal(0.0)
+  if batches:
+    factor = factor + case({recipe_id: float(count) for recipe_id, count in batches.items()}, value=Recipe.id, else_=0.0)
+  if servings:
+    factor = factor + case(servings, value=Recipe.id, else_=0.0) / func.nullif(Recipe.servings, 0)
+
+  ingredient = func.coalesce(CanonicalIngredient.name, func.min(func.lower(Ingredient.name))).label("ingredient")
+  rows = db.execute(
+    select(
+      ingredient,
+      Ingredient.base_unit,
+      func.sum(Ingredient.base_amount * factor).label("base_amount"),
+      # When every line used the same unit ("cup"), the total is given in it
+      (func.count(Ingredient.unit) == func.count()).label("all_have_unit"),
+      func.min(Ingredient.unit).label("unit"),
+      func.max(Ingredient.unit).label("max_unit"),
+      func.max(UNIT_FACTOR).label("largest_factor"),
+      func.sum(Ingredient.amount * factor).label("amount"),
+      func.min(Ingredient.quantity).label("quantity"),
+      func.count(distinct(Ingredient.recipe_id)).label("recipes"),
+    )
+    .select_from(Ingredient)
+    .join(Recipe, Recipe.id == Ingredient.recipe_id)
+    .outerjoin(CanonicalIngredient, CanonicalIngredient.id == Ingredient.ingredient_id)
+    .where(Ingredient.recipe_id.in_(recipe_ids))
+    .group_by(Ingredient.ingredient_id, CanonicalIngredient.name, Ingredient.base_unit)
+    .order_by(ingredient, Ingredient.base_unit)
+  )
+  return [], [quantities.shopping_item(row) for row in rows]
@@ -1,22 +1,272 @@
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, exc, make_url
+from sqlalchemy.pool import QueuePool, StaticPool
 from dotenv import load_dotenv
 import os
+import threading
+import time
 
 load_dotenv()
 
 
+# With no DATABASE_URL the app runs on a SQLite file next to it: no Postgres (or anything else) to start.
+# sqlite:///:memory: gives a throwaway database for tests and CI.
+DEFAULT_DATABASE_URL = "sqlite:///recipevault.db"
+
 db_url = os.getenv("DATABASE_URL")
 if not db_url:
-    raise RuntimeError("DATABASE_URL Not Set")
+    db_url = DEFAULT_DATABASE_URL
+    print("DATABASE_URL Not Set, Using", db_url)
 
 # This is a conditional statement to confirm db_url
 if db_url.startswith("postgres://"):
     db_url = db_url.replace("postgres://", "postgresql://", 1)
 
 
+def _env_bool(name, default):
+  return os.getenv(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+
+# ---------------- Pool settings ----------------
+# Size the pool with THREADPOOL_SIZE in mind (main.py): every request running a database route
+# holds a connection, so pool size + overflow below the thread count means requests queue here
+# (for up to DB_POOL_TIMEOUT seconds) instead of in the threadpool.
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Hosted Postgres proxies (Railway included) silently drop idle connections; recycle before they do
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# One cheap round trip per checkout, so a dropped connection is replaced instead of failing the request
+POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)
+# Postgres cancels any statement running longer than this (0 = no limit)
+STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+# Behind a transaction-pooling PgBouncer (or Supabase/Neon poolers): no session state
+# (startup options, server-side prepared statements) survives from one transaction to the next
+PGBOUNCER = _env_bool("DB_PGBOUNCER", False)
+
+# SQLite tuning. WAL lets readers run alongside the (single) writer; synchronous=NORMAL is
+# durable across app crashes in WAL mode and only fsyncs at checkpoints.
+SQLITE_BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT_SECONDS", "5")) # How long a write waits for the lock
+SQLITE_CACHE_MB = int(os.getenv("SQLITE_CACHE_MB", "64")) # Page cache per connection
+SQLITE_MMAP_MB = int(os.getenv("SQLITE_MMAP_MB", "256")) # Reads straight from the OS page cache
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL").upper()
+
+
+# ---------------- Pool metrics ----------------
+
+class PoolMetrics:
+  # Cumulative counters and histograms for the connection pool, shown at GET /stats/pool.
+  # Bucket bounds are upper limits in seconds, Prometheus style.
+  CHECKOUT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+  LIFETIME_BUCKETS = (1, 10, 60, 300, 900, 1800, 3600)
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self.checkouts = 0
+    self.waits = 0 # Checkouts that found no idle connection and no overflow room, so had to queue
+    self.timeouts = 0 # Gave up after DB_POOL_TIMEOUT
+    self.connects = 0
+    self.closes = 0
+    self.invalidations = 0 # Dropped because the connection was found dead (pre-ping, disconnect errors)
+    self.checkout_seconds = self._histogram(self.CHECKOUT_BUCKETS)
+    self.held_seconds = self._histogram(self.CHECKOUT_BUCKETS)
+    self.lifetime_seconds = self._histogram(self.LIFETIME_BUCKETS)
+
+  @staticmethod
+  def _histogram(buckets):
+    return {"buckets": buckets, "counts": [0] * (len(buckets) + 1), "sum": 0.0, "count": 0, "max": 0.0}
+
+  def _observe(self, histogram, value):
+    # Caller holds the lock
+    histogram["count"] += 1
+    histogram["sum"] += value
+    histogram["max"] = max(histogram["max"], value)
+    for i, bound in enumerate(histogram["buckets"]):
+      if value <= bound:
+        histogram["counts"][i] += 1
+        return
+    histogram["counts"][-1] += 1
+
+  def observe_checkout(self, seconds, waited):
+    with self._lock:
+      self.checkouts += 1
+      self.waits += waited
+      self._observe(self.checkout_seconds, seconds)
+
+  def observe_timeout(self):
+    with self._lock:
+      self.timeouts += 1
+      self.waits += 1
+
+  def observe_held(self, seconds):
+    with self._lock:
+      self._observe(self.held_seconds, seconds)
+
+  def observe_connect(self):
+    with self._lock:
+      self.connects += 1
+
+  def observe_close(self, lifetime):
+    with self._lock:
+      self.closes += 1
+      if lifetime is not None:
+        self._observe(self.lifetime_seconds, lifetime)
+
+  def observe_invalidate(self):
+    with self._lock:
+      self.invalidations += 1
+
+  @staticmethod
+  def _summary(histogram):
+    count = histogram["count"]
+    return {
+      "count": count,
+      "avg_ms": round(histogram["sum"] / count * 1000, 3) if count else None,
+      "max_ms": round(histogram["max"] * 1000, 3),
+      "buckets": dict(zip([str(b) for b in histogram["buckets"]] + ["+Inf"], histogram["counts"])),
+    }
+
+  def export(self):
+    # Raw counters and histogram copies, for GET /metrics
+    with self._lock:
+      counters = {name: getattr(self, name) for name in ("checkouts", "waits", "timeouts", "connects", "closes", "invalidations")}
+      histograms = {
+        name: dict(getattr(self, name), counts=list(getattr(self, name)["counts"]))
+        for name in ("checkout_seconds", "held_seconds", "lifetime_seconds")
+      }
+    return counters, histograms
+
+  def snapshot(self, pool):
+    with self._lock:
+      stats = {
+        "checkouts": self.checkouts,
+        "waits": self.waits,
+        "timeouts": self.timeouts,
+        "connects": self.connects,
+        "closes": self.closes,
+        "invalidations": self.invalidations,
+        "checkout_latency": self._summary(self.checkout_seconds),
+        "held_time": self._summary(self.held_seconds),
+        "connection_lifetime": {
+          "count": self.lifetime_seconds["count"],
+          "avg_s": round(self.lifetime_seconds["sum"] / self.lifetime_seconds["count"], 1) if self.lifetime_seconds["count"] else None,
+          "max_s": round(self.lifetime_seconds["max"], 1),
+          "buckets": dict(zip([str(b) for b in self.LIFETIME_BUCKETS] + ["+Inf"], self.lifetime_seconds["counts"])),
+        },
+      }
+    if isinstance(pool, QueuePool):
+      stats.update(size=pool.size(), checked_in=pool.checkedin(), checked_out=pool.checkedout(), overflow=pool.overflow(), max_overflow=pool._max_overflow)
+    return stats
+
+
+class InstrumentedQueuePool(QueuePool):
+  # QueuePool that times every checkout (queueing + connecting + pre-ping) into its metrics
+  metrics = None
+
+  def connect(self):
+    waited = self._max_overflow > -1 and self.checkedin() == 0 and self.overflow() >= self._max_overflow
+    started = time.perf_counter()
+    try:
+      connection = super().connect()
+    except exc.TimeoutError:
+      self.metrics.observe_timeout()
+      raise
+    self.metrics.observe_checkout(time.perf_counter() - started, waited)
+    return connection
+
+
+def instrument_pool(engine, metrics):
+  # Connection lifetimes and hold times come from pool events, so they work with any pool class
+  @event.listens_for(engine, "connect")
+  def _on_connect(dbapi_connection, record):
+    record.info["connected_at"] = time.monotonic()
+    metrics.observe_connect()
+
+  @event.listens_for(engine, "checkout")
+  def _on_checkout(dbapi_connection, record, proxy):
+    record.info["checked_out_at"] = time.monotonic()
+
+  @event.listens_for(engine, "checkin")
+  def _on_checkin(dbapi_connection, record):
+    checked_out_at = record.info.pop("checked_out_at", None) if record is not None else None
+    if checked_out_at is not None:
+      metrics.observe_held(time.monotonic() - checked_out_at)
+
+  @event.listens_for(engine, "close")
+  def _on_close(dbapi_connection, record):
+    connected_at = record.info.get("connected_at")
+    metrics.observe_close(time.monotonic() - connected_at if connected_at is not None else None)
+
+  @event.listens_for(engine, "invalidate")
+  def _on_invalidate(dbapi_connection, record, exception):
+    metrics.observe_invalidate()
+
+
+# ---------------- Engine ----------------
+
+def make_engine(url):
+  url = make_url(url)
+  backend = url.get_backend_name()
+  kwargs = {"pool_pre_ping": POOL_PRE_PING}
+  connect_args = {}
+
+  metrics = PoolMetrics()
+  in_memory = backend == "sqlite" and url.database in (None, "", ":memory:")
+  if in_memory:
+    # One connection shared by every thread: each new connection would be a separate, empty database
+    kwargs["poolclass"] = StaticPool
+    connect_args["check_same_thread"] = False
+  else:
+    kwargs.update(
+      # A subclass per engine, so the metrics survive the pool being recreated by dispose()
+      poolclass=type("InstrumentedQueuePool", (InstrumentedQueuePool,), {"metrics": metrics}),
+      pool_size=POOL_SIZE,
+      max_overflow=MAX_OVERFLOW,
+      pool_timeout=POOL_TIMEOUT,
+      pool_recycle=POOL_RECYCLE,
+    )
+
+  if backend == "postgresql":
+    if PGBOUNCER:
+      if url.get_driver_name() == "psycopg":
+        connect_args["prepare_threshold"] = None # psycopg 3 prepares repeated statements server-side; PgBouncer can't route those
+      # psycopg2 never uses server-side prepared statements, so nothing to turn off there
+    elif STATEMENT_TIMEOUT_MS:
+      connect_args["options"] = f"-c statement_timeout={STATEMENT_TIMEOUT_MS}"
+
+  if backend == "sqlite":
+    connect_args["timeout"] = SQLITE_BUSY_TIMEOUT
+
+  engine = create_engine(url, connect_args=connect_args, **kwargs)
+  engine.pool_metrics = metrics
+  instrument_pool(engine, metrics)
+
+  if backend == "postgresql" and PGBOUNCER and STATEMENT_TIMEOUT_MS:
+    # PgBouncer rejects the startup option above and SET wouldn't stick to a server connection,
+    # so the timeout is re-applied at the start of every transaction instead
+    @event.listens_for(engine, "begin")
+    def _set_statement_timeout(conn):
+      conn.exec_driver_sql(f"SET LOCAL statement_timeout = {STATEMENT_TIMEOUT_MS}")
+
+  if backend == "sqlite":
+    @event.listens_for(engine, "connect")
+    def _sqlite_pragmas(dbapi_connection, connection_record):
+      # SQLite ignores foreign keys (and so ON DELETE CASCADE) unless asked per connection
+      dbapi_connection.execute("PRAGMA foreign_keys=ON")
+      if not in_memory:
+        dbapi_connection.execute("PRAGMA journal_mode=WAL") # Stored in the file; a no-op after the first time
+        dbapi_connection.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        dbapi_connection.execute(f"PRAGMA mmap_size={SQLITE_MMAP_MB * 1024 * 1024}")
+      dbapi_connection.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_MB * 1024}") # Negative = KiB
+      dbapi_connection.execute("PRAGMA temp_store=MEMORY")
+
+  return engine
+
+
+engine = make_engine(db_url) # This is used to create a connection to the database using the URL provided in the environment variable. make_engine wraps SQLAlchemy's create_engine with the pool settings above and returns an Engine object that can be used to interact with the database.
 
-engine = create_engine(db_url) # This is used to create a connection to the database using the URL provided in the environment variable. The create_engine function is from SQLAlchemy and it takes the database URL as an argument. It returns an Engine object that can be used to interact with the database.
-          
 SessionLocal = sessionmaker(autoflush=False, autocommit=False, bind=engine)
 
+
+def pool_stats():
+  return engine.pool_metrics.snapshot(engine.pool)
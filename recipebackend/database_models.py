@@ -1,39 +1,167 @@
-from sqlalchemy.orm import declarative_base, relationship
-from sqlalchemy import Column, Integer, String, Date, ForeignKey
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import declarative_base, relationship, deferred
+from sqlalchemy import Table, Column, Integer, BigInteger, Float, String, Text, Date, DateTime, ForeignKey, Index, JSON, MetaData, select, insert, update
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from sqlalchemy.sql import func
 
 Base = declarative_base()
 
+# JSONB on Postgres, plain JSON (a TEXT column with JSON functions) everywhere else, so the same
+# models run on SQLite for tests, benchmarks and small deployments
+JSONDocument = JSON().with_variant(JSONB(), "postgresql")
+
 # This uses the base class model.
 class Recipe(Base):
   __tablename__ = "recipes"
   id = Column(Integer, primary_key=True, index=True, autoincrement=True)
   title = Column(String)
   description = Column(String)
-  instructions = Column(JSONB, nullable=False)
+  instructions = Column(JSONDocument, nullable=False)
   prep_time = Column(Integer)
   cook_time = Column(Integer)
   servings = Column(Integer)
   difficulty = Column(String) 
   category = Column(String)
   image_url = Column(String)
+  # Resized copies of image_url written by the upload pipeline, e.g.
+  # {"thumb": {"width": 320, "height": 240, "avif": url, "webp": url, "jpeg": url}, "card": {...}, "detail": {...}}
+  image_variants = Column(JSONDocument, nullable=True)
   rating = Column(Integer)
   created_at = Column(Date, server_default=func.current_date())
   updated_at = Column(Date, server_default=func.current_date(), onupdate=func.current_date())
+  # Distinct canonical ingredients, kept in step with the ingredient rows on every write, so
+  # GET /recipes/pantry gets "how many more would I need" without counting them per candidate
+  ingredient_count = Column(Integer, nullable=False, server_default="0")
+  # Bumped on every write; GET /recipes/{id} derives its ETag from it and PUT/DELETE check it for If-Match
+  version = Column(Integer, nullable=False, server_default="1")
+  # Weighted title/description/ingredient vector kept up to date by search.index_recipes (Postgres only).
+  # Deferred so normal reads never load it.
+  search_vector = deferred(Column(Text().with_variant(TSVECTOR(), "postgresql"), nullable=True))
 
   ingredients = relationship(
     "Ingredient", 
     back_populates="recipe",
-    cascade="all, delete-orphan"
+    cascade="all, delete-orphan",
+    passive_deletes=True # Deleting a recipe leaves its ingredients to ON DELETE CASCADE instead of loading and deleting them one by one
+  )
+
+  # Fetch created_at/updated_at with INSERT/UPDATE ... RETURNING so writes never need a refresh()
+  __mapper_args__ = {"eager_defaults": True}
+
+  __table_args__ = (
+    # GET /recipes filters by category and/or difficulty, so both orders get an index
+    Index("ix_recipes_category_difficulty", "category", "difficulty"),
+    Index("ix_recipes_difficulty_category", "difficulty", "category"),
+    # Keyset pagination walks (created_at, id) newest first
+    Index("ix_recipes_created_at_id", "created_at", "id"),
+    # Trigram indexes let ILIKE '%term%' searches use an index instead of a table scan (Postgres only)
+    Index("ix_recipes_title_trgm", "title", postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+    Index("ix_recipes_description_trgm", "description", postgresql_using="gin", postgresql_ops={"description": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+    # Full-text search matches with one GIN index scan
+    Index("ix_recipes_search_vector", "search_vector", postgresql_using="gin").ddl_if(dialect="postgresql"),
   )
 
 class Ingredient(Base):
   __tablename__ = "ingredients"
   
   id = Column(Integer, primary_key=True, index=True) # Every ingredient has it's own PK
-  recipe_id = Column(Integer, ForeignKey("recipes.id", ondelete="CASCADE")) # The Link with the "recipes" table, to Link the Id to the recipes.id. CASCADE to delete with all fields
+  recipe_id = Column(Integer, ForeignKey("recipes.id", ondelete="CASCADE"), index=True) # The Link with the "recipes" table, to Link the Id to the recipes.id. CASCADE to delete with all fields
   name = Column(String, nullable=False)
   quantity = Column(String, nullable=False)
+  # What name resolves to (ingredient_names.py); written with the row, so "Eggs" and "egg" share one id
+  ingredient_id = Column(Integer, ForeignKey("canonical_ingredients.id"), nullable=True)
+  # quantity parsed once on write (quantities.py): "1/2 cup" -> 0.5 "cup", and 118.3 "ml" so
+  # different units add up. All NULL for "to taste" and anything else without a number.
+  amount = Column(Float, nullable=True)
+  unit = Column(String, nullable=True)
+  base_amount = Column(Float, nullable=True)
+  base_unit = Column(String, nullable=True)
+  # Order within the recipe, ascending (ties go by id). Written crud.POSITION_GAP apart, so an
+  # edit can put a line between two others without renumbering the rest.
+  position = Column(Integer, nullable=False, server_default="0")
+
+  recipe = relationship("Recipe", back_populates="ingredients")
+
+  __table_args__ = (
+    Index("ix_ingredients_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+    # The inverted index: ingredient -> recipes, read without touching the table (GET /recipes/pantry)
+    Index("ix_ingredients_ingredient_id_recipe_id", "ingredient_id", "recipe_id"),
+    # A recipe's lines in order
+    Index("ix_ingredients_recipe_id_position", "recipe_id", "position"),
+  )
+
+
+# One row per distinct ingredient after normalization and aliases, e.g. "black pepper"
+class CanonicalIngredient(Base):
+  __tablename__ = "canonical_ingredients"
+
+  id = Column(Integer, primary_key=True)
+  name = Column(String, nullable=False, unique=True)
+
+
+# Recipe counts per filter value (facets.py), e.g. ("category", "dinner", 412), adjusted in the
+# same transaction as every recipe write so GET /recipes/facets never counts the recipes table
+class RecipeFacet(Base):
+  __tablename__ = "recipe_facets"
 
-  recipe = relationship("Recipe", back_populates="ingredients")
\ No newline at end of file
+  facet = Column(String, primary_key=True) # category, difficulty, rating, total_time or total
+  value = Column(String, primary_key=True)
+  count = Column(Integer, nullable=False, server_default="0")
+
+
+# Single-row table (id = 1) bumped in the same transaction as every recipe write.
+# Listing ETags and Last-Modified headers come from it.
+class CatalogState(Base):
+  __tablename__ = "catalog_state"
+
+  id = Column(Integer, primary_key=True)
+  version = Column(BigInteger, nullable=False, server_default="1")
+  updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+# One POST /recipes/{id}/image upload, pushed to storage in the background by uploads.py.
+# status: queued -> processing -> uploading -> done | failed
+class UploadJob(Base):
+  __tablename__ = "upload_jobs"
+
+  id = Column(String(32), primary_key=True) # uuid4 hex, handed to the client to poll
+  recipe_id = Column(Integer, ForeignKey("recipes.id", ondelete="CASCADE"), nullable=False, index=True)
+  status = Column(String, nullable=False, server_default="queued")
+  attempts = Column(Integer, nullable=False, server_default="0")
+  spool_path = Column(String, nullable=False) # Local copy of the upload until it reaches storage
+  image_url = Column(String)
+  error = Column(String)
+  # The worker holding the job ("host:pid:random") and until when; another worker may claim it
+  # once the lease has run out
+  owner = Column(String)
+  lease_until = Column(DateTime(timezone=True))
+  created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+  updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+
+  __table_args__ = (
+    # Workers look for unfinished jobs with an expired lease every few seconds
+    Index("ix_upload_jobs_status_lease_until", "status", "lease_until"),
+  )
+
+
+def update_from_lookup(conn, table, key, rows, where=None):
+  # For backfills: sets columns of every row of table from rows ([{key: ..., column: value}]),
+  # matched on key, with one set-based UPDATE through a temporary lookup table instead of one
+  # statement per row. Returns the number of rows updated.
+  columns = [name for name in rows[0] if name != key]
+  lookup = Table(
+    f"{table.name}_lookup", MetaData(),
+    Column(key, table.c[key].type, primary_key=True),
+    *[Column(name, table.c[name].type) for name in columns],
+    prefixes=["TEMPORARY"],
+  )
+  lookup.create(conn)
+  conn.execute(insert(lookup), rows)
+  stmt = update(table).values(**{
+    name: select(lookup.c[name]).where(lookup.c[key] == table.c[key]).scalar_subquery()
+    for name in columns
+  })
+  if where is not None:
+    stmt = stmt.where(where)
+  updated = conn.execute(stmt).rowcount
+  lookup.drop(conn)
+  return updated
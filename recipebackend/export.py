@@ -0,0 +1,113 @@
+import zlib
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+import database_models
+import crud
+from serializers import dump_json
+
+
+# Streaming catalog export for GET /recipes/export. Recipes and ingredients are read through
+# two server-side cursors walking in id order and merged as they arrive, each recipe is
+# encoded on its own, and bytes go out in CHUNK_BYTES pieces. Memory stays flat however big
+# the catalog is. Records have the GET /recipes/{id} shape, which bulk_import reads back.
+
+# Rows fetched per round trip by each cursor
+FETCH_ROWS = 1000
+
+# Encoded output is handed to the response in pieces of about this size
+CHUNK_BYTES = 64 * 1024
+
+FORMATS = ("ndjson", "json")
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "json": "application/json"}
+
+
+def check_snapshot(db: Session):
+  # Sessions for an export come from replicas.read_session(snapshot=True). Raises instead of
+  # exporting from one that can't promise both cursors see the same data.
+  dialect = db.get_bind().dialect.name
+  connection = db.connection()
+  if dialect == "postgresql":
+    level = connection.get_isolation_level()
+    if level not in ("REPEATABLE READ", "SERIALIZABLE"):
+      raise RuntimeError(f"Export session is {level}, not REPEATABLE READ")
+  elif dialect == "sqlite":
+    if not connection.connection.driver_connection.in_transaction:
+      raise RuntimeError("Export session isn't inside a read transaction")
+
+
+def iter_recipes(db: Session, since=None):
+  # Yields recipe dicts (ingredients attached) ordered by id; since keeps recipes updated on or after that date
+  Recipe = database_models.Recipe
+  Ingredient = database_models.Ingredient
+
+  recipes = select(*crud.RECIPE_COLUMNS).order_by(Recipe.id)
+  ingredients = (
+    select(Ingredient.recipe_id, Ingredient.name, Ingredient.quantity)
+    .order_by(Ingredient.recipe_id, Ingredient.position, Ingredient.id)
+  )
+  if since is not None:
+    recipes = recipes.where(Recipe.updated_at >= since)
+    ingredients = ingredients.where(Ingredient.recipe_id.in_(select(Recipe.id).where(Recipe.updated_at >= since)))
+
+  # Both cursors must see the same snapshot, or a write between them could pair a recipe with the wrong ingredients
+  check_snapshot(db)
+
+  recipe_rows = db.execute(recipes.execution_options(yield_per=FETCH_ROWS))
+  ingredient_rows = iter(db.execute(ingredients.execution_options(yield_per=FETCH_ROWS)))
+
+  pending = next(ingredient_rows, None)
+  for row in recipe_rows:
+    recipe = row._asdict()
+    recipe_id = recipe["id"]
+    items = []
+    while pending is not None and pending.recipe_id <= recipe_id:
+      if pending.recipe_id == recipe_id:
+        items.append({"name": pending.name, "quantity": pending.quantity})
+      pending = next(ingredient_rows, None)
+    recipe["ingredients"] = items
+    yield recipe
+
+
+def encode(recipes, fmt):
+  # ndjson: one recipe per line. json: a single array, written incrementally.
+  buffer = bytearray(b"[" if fmt == "json" else b"")
+  first = True
+  for recipe in recipes:
+    if fmt == "json":
+      if not first:
+        buffer += b","
+      buffer += dump_json(recipe)
+    else:
+      buffer += dump_json(recipe)
+      buffer += b"\n"
+    first = False
+    if len(buffer) >= CHUNK_BYTES:
+      yield bytes(buffer)
+      buffer.clear()
+  if fmt == "json":
+    buffer += b"]"
+  if buffer:
+    yield bytes(buffer)
+
+
+def gzip_chunks(chunks):
+  compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS) # 16+ -> gzip container
+  for chunk in chunks:
+    compressed = compressor.compress(chunk)
+    if compressed:
+      yield compressed
+  yield compressor.flush()
+
+
+def stream_export(session_factory, fmt="ndjson", since=None, compress=False):
+  # Opens its own session: the body is produced after the route has returned (and its
+  # request session has been closed). session_factory has to give a snapshot session (see
+  # check_snapshot). Closing the generator early, e.g. when the client
+  # disconnects, closes the session and its cursors too.
+  db = session_factory()
+  try:
+    chunks = encode(iter_recipes(db, since=since), fmt)
+    yield from gzip_chunks(chunks) if compress else chunks
+  finally:
+    db.close()
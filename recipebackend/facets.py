@@ -0,0 +1,130 @@
+from collections import Counter
+from sqlalchemy import select, delete, insert, update, func, bindparam
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+import database_models
+from schemas import Category, Difficulty
+
+
+# How many recipes match each filter value, for the filter UI: category, difficulty, rating
+# (whole stars, 0-5) and total time (prep_time + cook_time) in buckets. Counts live in
+# recipe_facets and every write adjusts them in its own transaction, so reading them is one
+# small SELECT however big the catalog is.
+#
+# Writes call apply() with the recipes' column values before and/or after the change:
+#
+#   facets.apply(db, added=[new_values])                          # create, import
+#   facets.apply(db, removed=[old_values], added=[new_values])    # update
+#   facets.apply(db, removed=[old_values])                        # delete
+#
+# Anything that changes recipes without going through those (raw SQL, a restored dump) should
+# finish with rebuild(db), which recounts everything with one GROUP BY.
+
+# (upper bound in minutes, exclusive) -> bucket; anything longer is "120+"
+TIME_BUCKETS = [(15, "under-15"), (30, "15-30"), (60, "30-60"), (120, "60-120")]
+LONGEST_BUCKET = "120+"
+
+MAX_RATING = 5
+
+
+def total_time_bucket(minutes):
+  for bound, bucket in TIME_BUCKETS:
+    if minutes < bound:
+      return bucket
+  return LONGEST_BUCKET
+
+
+def facet_values(recipe):
+  # Recipe column values (a dict or row._mapping) -> the (facet, value) pairs it's counted under.
+  # A NULL column (the table allows them) just isn't counted under that facet.
+  pairs = [("total", "all")]
+  for facet in ("category", "difficulty"):
+    value = recipe.get(facet)
+    if value is not None:
+      pairs.append((facet, getattr(value, "value", value))) # Enums from a Pydantic dump
+  if recipe.get("rating") is not None:
+    pairs.append(("rating", str(min(max(recipe["rating"], 0), MAX_RATING))))
+  if recipe.get("prep_time") is not None and recipe.get("cook_time") is not None:
+    pairs.append(("total_time", total_time_bucket(recipe["prep_time"] + recipe["cook_time"])))
+  return pairs
+
+
+def apply(db: Session, removed=(), added=()):
+  # One statement for any number of recipes; an update that doesn't move a recipe between
+  # values (most edits) doesn't write at all
+  deltas = Counter()
+  for recipe in removed:
+    deltas.subtract(facet_values(recipe))
+  for recipe in added:
+    deltas.update(facet_values(recipe))
+  # Same order everywhere, so two writers can't deadlock on the counter rows
+  rows = [{"facet": facet, "value": value, "count": delta} for (facet, value), delta in sorted(deltas.items()) if delta]
+  if not rows:
+    return
+
+  RecipeFacet = database_models.RecipeFacet
+  dialect = db.get_bind().dialect.name
+  if dialect in ("postgresql", "sqlite"):
+    stmt = (postgresql if dialect == "postgresql" else sqlite).insert(RecipeFacet)
+    stmt = stmt.on_conflict_do_update(
+      index_elements=["facet", "value"], set_={"count": RecipeFacet.count + stmt.excluded["count"]}
+    )
+    db.execute(stmt, rows)
+  else:
+    # rebuild() creates a row for every value a recipe can get through the API
+    db.execute(
+      update(RecipeFacet)
+      .where(RecipeFacet.facet == bindparam("b_facet"), RecipeFacet.value == bindparam("b_value"))
+      .values(count=RecipeFacet.count + bindparam("b_count")),
+      [{"b_facet": row["facet"], "b_value": row["value"], "b_count": row["count"]} for row in rows],
+    )
+
+
+def _empty():
+  # Every value the API can write, at 0, so clients always get the same keys
+  return {
+    "total": 0,
+    "category": dict.fromkeys((category.value for category in Category), 0),
+    "difficulty": dict.fromkeys((difficulty.value for difficulty in Difficulty), 0),
+    "rating": dict.fromkeys((str(stars) for stars in range(MAX_RATING + 1)), 0),
+    "total_time": dict.fromkeys([bucket for _, bucket in TIME_BUCKETS] + [LONGEST_BUCKET], 0),
+  }
+
+
+def counts(db: Session):
+  # -> a dict shaped like schemas.RecipeFacets
+  RecipeFacet = database_models.RecipeFacet
+  result = _empty()
+  for facet, value, count in db.execute(select(RecipeFacet.facet, RecipeFacet.value, RecipeFacet.count)):
+    if facet == "total":
+      result["total"] = count
+    elif facet in result:
+      result[facet][value] = count
+  return result
+
+
+def rebuild(db: Session):
+  # Recounts every facet from the recipes table. The GROUP BY returns one row per distinct
+  # combination (a few thousand), which are bucketed here.
+  Recipe = database_models.Recipe
+  RecipeFacet = database_models.RecipeFacet
+  totals = Counter({("total", "all"): 0})
+  for facet, values in _empty().items():
+    if facet != "total":
+      totals.update({(facet, value): 0 for value in values})
+
+  minutes = (Recipe.prep_time + Recipe.cook_time).label("minutes")
+  groups = db.execute(
+    select(Recipe.category, Recipe.difficulty, Recipe.rating, minutes, func.count().label("recipes"))
+    .group_by(Recipe.category, Recipe.difficulty, Recipe.rating, minutes)
+  )
+  for group in groups:
+    # Only the sum matters for the time bucket
+    for pair in facet_values(dict(group._mapping, prep_time=group.minutes, cook_time=0)):
+      totals[pair] += group.recipes
+
+  db.execute(delete(RecipeFacet))
+  db.execute(insert(RecipeFacet), [
+    {"facet": facet, "value": value, "count": count} for (facet, value), count in sorted(totals.items())
+  ])
+  return totals[("total", "all")]
@@ -0,0 +1,109 @@
+import hashlib
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import HTTPException, Request, Response
+
+
+# Browsers revalidate every time (max-age=0, cheap thanks to the ETag); CDNs/proxies may serve
+# a copy for s-maxage seconds and keep serving it while they revalidate in the background.
+CACHE_CONTROL = os.getenv(
+  "HTTP_CACHE_CONTROL", "public, max-age=0, s-maxage=30, stale-while-revalidate=60"
+)
+
+
+def recipe_etag(recipe_id, version, servings=None):
+  # A recipe's representation changes exactly when its version counter does; scaled copies
+  # (?servings=) are separate representations
+  if servings is not None:
+    return f'"r{recipe_id}-v{version}-s{servings}"'
+  return f'"r{recipe_id}-v{version}"'
+
+
+def list_etag(catalog_version, query_key):
+  # A listing can change whenever anything in the catalog does, so it's keyed on the
+  # catalog-wide version plus the query that produced it
+  digest = hashlib.sha1(query_key.encode()).hexdigest()[:16]
+  return f'"c{catalog_version}-{digest}"'
+
+
+def as_utc(moment):
+  if moment is None:
+    return None
+  if isinstance(moment, str): # SQLite hands DateTime server defaults back as text
+    moment = datetime.fromisoformat(moment)
+  if moment.tzinfo is None:
+    moment = moment.replace(tzinfo=timezone.utc)
+  return moment.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def http_date(moment):
+  return format_datetime(as_utc(moment), usegmt=True)
+
+
+def _etags(header):
+  return {tag.strip() for tag in header.split(",") if tag.strip()}
+
+
+def _strip_weak(tag):
+  return tag[2:] if tag.startswith("W/") else tag
+
+
+def is_not_modified(request: Request, etag, last_modified=None):
+  # If-None-Match wins over If-Modified-Since when both are sent (RFC 9110 13.2.2)
+  if_none_match = request.headers.get("if-none-match")
+  if if_none_match is not None:
+    tags = {_strip_weak(tag) for tag in _etags(if_none_match)}
+    return "*" in tags or etag in tags
+
+  if_modified_since = request.headers.get("if-modified-since")
+  if if_modified_since and last_modified is not None:
+    try:
+      since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+      return False
+    if since.tzinfo is None:
+      since = since.replace(tzinfo=timezone.utc)
+    return as_utc(last_modified) <= since
+  return False
+
+
+def validator_headers(etag, last_modified=None):
+  headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+  if last_modified is not None:
+    headers["Last-Modified"] = http_date(last_modified)
+  return headers
+
+
+def conditional_response(request: Request, body, etag, last_modified=None):
+  # 304 with just the validators if the client's copy is current, otherwise the JSON body
+  headers = validator_headers(etag, last_modified)
+  if is_not_modified(request, etag, last_modified):
+    return Response(status_code=304, headers=headers)
+  return Response(content=body, media_type="application/json", headers=headers)
+
+
+def check_if_match(request: Request, etag):
+  # Optimistic concurrency for PUT/DELETE: refuse to overwrite a version the client hasn't seen.
+  # If-Match uses strong comparison, so weak tags never match.
+  if_match = request.headers.get("if-match")
+  if if_match is None:
+    return
+  tags = _etags(if_match)
+  if "*" in tags or etag in tags:
+    return
+  raise HTTPException(
+    status_code=412,
+    detail="Recipe was modified since you fetched it (If-Match failed); reload and try again",
+    headers={"ETag": etag},
+  )
+
+
+def pack_validators(etag, last_modified):
+  # Stored next to a cached body so a cache hit can answer conditional requests too
+  return f"{etag} {as_utc(last_modified).isoformat()}"
+
+
+def unpack_validators(meta):
+  etag, _, last_modified = meta.partition(" ")
+  return etag, datetime.fromisoformat(last_modified)
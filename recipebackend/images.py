@@ -0,0 +1,107 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageOps
+
+
+# Image processing for uploads: decode once, then write every responsive variant in every
+# output format. Variants are capped to a bounding box, so the card grid never downloads a
+# full-resolution photo. EXIF (GPS and all), XMP and ICC metadata are dropped because nothing
+# is passed to save(). Encoding is CPU-bound, so it runs in a process pool; the GIL would
+# serialize it on threads.
+
+# name -> longest side in pixels. thumb: small lists, card: RecipeCard.tsx, detail: the recipe dialog.
+VARIANTS = {"thumb": 320, "card": 640, "detail": 1600}
+
+# Output formats, best compression first. jpeg is the universal fallback and always written.
+QUALITY = {"avif": 55, "webp": 80, "jpeg": 82}
+
+# Refuse anything bigger before decoding it (decompression bombs); Pillow raises on these
+MAX_IMAGE_PIXELS = int(os.getenv("MAX_IMAGE_PIXELS", str(50_000_000)))
+Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+
+EXTENSIONS = {"avif": "avif", "webp": "webp", "jpeg": "jpg"}
+
+
+class UnsupportedImage(ValueError):
+  pass
+
+
+def available_formats():
+  # AVIF needs a Pillow build with libavif; skip it rather than fail where it's missing
+  Image.init()
+  return [fmt for fmt in QUALITY if fmt.upper() in Image.SAVE]
+
+
+def _save(image, path, fmt):
+  if fmt == "jpeg":
+    image.save(path, "JPEG", quality=QUALITY["jpeg"], optimize=True, progressive=True)
+  elif fmt == "webp":
+    image.save(path, "WEBP", quality=QUALITY["webp"], method=4)
+  elif fmt == "avif":
+    image.save(path, "AVIF", quality=QUALITY["avif"], speed=8)
+
+
+def process_image(source_path, out_dir, key, formats=None):
+  # Writes <key>-<variant>.<ext> into out_dir for every variant and format.
+  # Returns {variant: {"width", "height", <format>: filename, ...}}. Runs in a worker process.
+  formats = formats or available_formats()
+  try:
+    with Image.open(source_path) as image:
+      # For JPEGs, let the decoder downscale by a power of two on the way in when the source
+      # is far bigger than the largest variant: much faster decode, same output quality
+      largest = max(VARIANTS.values())
+      image.draft("RGB", (largest, largest))
+      image = ImageOps.exif_transpose(image) # Bake in the camera rotation before EXIF is dropped
+      image.load()
+  except (OSError, SyntaxError, Image.DecompressionBombError) as e:
+    raise UnsupportedImage("Not a supported image file") from e
+
+  if image.mode not in ("RGB", "RGBA"):
+    image = image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "PA") else "RGB")
+
+  results = {}
+  # Largest first, each variant resized from the previous one instead of the full-size image
+  current = image
+  for name, size in sorted(VARIANTS.items(), key=lambda item: -item[1]):
+    current = current.copy()
+    current.thumbnail((size, size), Image.Resampling.LANCZOS, reducing_gap=3.0) # Never upscales
+    opaque = current.convert("RGB") if current.mode == "RGBA" else current # JPEG has no alpha
+    variant = {"width": current.width, "height": current.height}
+    for fmt in formats:
+      filename = f"{key}-{name}.{EXTENSIONS[fmt]}"
+      _save(opaque if fmt == "jpeg" else current, os.path.join(out_dir, filename), fmt)
+      variant[fmt] = filename
+    results[name] = variant
+  return results
+
+
+_pool = None
+_pool_lock = threading.Lock() # Upload worker threads can ask for the pool at the same time
+
+
+def get_pool():
+  global _pool
+  if _pool is None:
+    with _pool_lock:
+      if _pool is None: # Another thread may have created it while this one waited
+        # spawn: forking a server process that already runs threads can deadlock the child
+        _pool = ProcessPoolExecutor(
+          max_workers=int(os.getenv("IMAGE_WORKERS", "0")) or None, # Default: one per core
+          mp_context=multiprocessing.get_context("spawn"),
+        )
+  return _pool
+
+
+def shutdown_pool():
+  global _pool
+  with _pool_lock:
+    pool, _pool = _pool, None
+  if pool is not None:
+    pool.shutdown(wait=True, cancel_futures=True)
+
+
+def process_in_pool(source_path, out_dir, key):
+  # Blocks the calling (background) thread only; the encoding happens in another process
+  return get_pool().submit(process_image, source_path, out_dir, key).result()
@@ -0,0 +1,158 @@
+import re
+from sqlalchemy import select, insert, distinct, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+import database_models
+
+
+# Free-text ingredient names -> rows of canonical_ingredients, so "Eggs" and "egg" (or "pepper"
+# and "Black Pepper") end up as the same ingredient_id and "what can I cook with X" is an index
+# lookup instead of string matching.
+#
+# A name is normalized (lowercased, punctuation dropped, last word singularized) and then looked
+# up in ALIASES. Whatever comes out is the canonical name. New canonical names are created on
+# write; reads only ever look them up.
+#
+# ALIASES is applied when rows are written, so adding one only affects new and edited recipes.
+# To re-point existing rows, add a migration that calls backfill(db, everything=True).
+
+# alias -> canonical name, both in normalized form
+ALIASES = {
+  "pepper": "black pepper",
+  "ground pepper": "black pepper",
+  "ground black pepper": "black pepper",
+  "black peppercorn": "black pepper",
+  "flour": "all purpose flour",
+  "plain flour": "all purpose flour",
+  "ap flour": "all purpose flour",
+  "caster sugar": "sugar",
+  "granulated sugar": "sugar",
+  "white sugar": "sugar",
+  "extra virgin olive oil": "olive oil",
+  "evoo": "olive oil",
+  "scallion": "spring onion",
+  "green onion": "spring onion",
+  "coriander leaf": "cilantro",
+  "fresh coriander": "cilantro",
+  "chicken stock": "chicken broth",
+  "beef stock": "beef broth",
+  "vegetable stock": "vegetable broth",
+  "garbanzo bean": "chickpea",
+  "courgette": "zucchini",
+  "aubergine": "eggplant",
+  "parmesan": "parmesan cheese",
+  "parmigiano reggiano": "parmesan cheese",
+  "kosher salt": "salt",
+  "sea salt": "salt",
+  "table salt": "salt",
+  "unsalted butter": "butter",
+  "salted butter": "butter",
+  "whole milk": "milk",
+  "large egg": "egg",
+  "minced beef": "beef mince",
+  "ground beef": "beef mince",
+}
+
+# Plural -> singular where the suffix rules below get it wrong
+IRREGULAR = {"leaves": "leaf", "loaves": "loaf", "halves": "half", "knives": "knife", "cookies": "cookie"}
+
+# Words that end in s but aren't plurals
+NOT_PLURAL = {"hummus", "couscous", "asparagus", "molasses", "swiss", "brussels", "harissa", "citrus", "oats", "grits", "greens"}
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def _singular(word):
+  if word in IRREGULAR:
+    return IRREGULAR[word]
+  if word in NOT_PLURAL or len(word) <= 3 or word.endswith(("ss", "us", "is")):
+    return word
+  if word.endswith("ies"):
+    return word[:-3] + "y" # berries
+  if word.endswith(("oes", "ches", "shes", "xes")):
+    return word[:-2] # tomatoes, peaches, radishes, boxes
+  if word.endswith("s"):
+    return word[:-1]
+  return word
+
+
+def normalize(name):
+  # "Black Peppercorns" -> "black pepper", "All-Purpose Flour" -> "all purpose flour", "" for
+  # names with no letters or digits at all
+  words = WORD_RE.findall((name or "").lower())
+  if not words:
+    return ""
+  if " ".join(words) not in NOT_PLURAL:
+    words[-1] = _singular(words[-1]) # Only the head noun: "brussels sprouts" -> "brussels sprout"
+  key = " ".join(words)
+  return ALIASES.get(key, key)
+
+
+def _insert_missing(db: Session, names):
+  # Another transaction may be creating the same names right now; the loser's rows are skipped
+  # instead of failing its whole write (Postgres waits for the winner to commit first)
+  CanonicalIngredient = database_models.CanonicalIngredient
+  rows = [{"name": name} for name in sorted(names)] # Same order everywhere, so two writers can't deadlock
+  dialect = db.get_bind().dialect.name
+  if dialect == "postgresql":
+    stmt = postgresql.insert(CanonicalIngredient).on_conflict_do_nothing(index_elements=["name"])
+  elif dialect == "sqlite":
+    stmt = sqlite.insert(CanonicalIngredient).on_conflict_do_nothing(index_elements=["name"])
+  else:
+    stmt = insert(CanonicalIngredient)
+  db.execute(stmt, rows)
+
+
+def resolve_ids(db: Session, names, create=True):
+  # {name: canonical ingredient id} for a batch of free-text names, in one SELECT (plus one
+  # INSERT and SELECT when some are new). With create=False unknown names map to None.
+  CanonicalIngredient = database_models.CanonicalIngredient
+  keys = {name: normalize(name) for name in names}
+  wanted = set(keys.values()) - {""}
+  if not wanted:
+    return dict.fromkeys(keys)
+
+  found = dict(db.execute(
+    select(CanonicalIngredient.name, CanonicalIngredient.id).where(CanonicalIngredient.name.in_(wanted))
+  ).all())
+  missing = wanted - found.keys()
+  if missing and create:
+    _insert_missing(db, missing)
+    found.update(db.execute(
+      select(CanonicalIngredient.name, CanonicalIngredient.id).where(CanonicalIngredient.name.in_(missing))
+    ).all())
+  return {name: found.get(key) for name, key in keys.items()}
+
+
+def distinct_count(ids, ingredients):
+  # recipes.ingredient_count: "Eggs" twice (or "Eggs" and "egg") is one ingredient
+  return len({ids[ing["name"]] for ing in ingredients} - {None})
+
+
+def backfill(db: Session, everything=False, batch_size=5000):
+  # Sets ingredient_id on rows written before it existed (or, with everything=True, on every
+  # row, after ALIASES changed), then recounts recipes.ingredient_count. Distinct names are
+  # resolved in batches, then the table is rewritten with one set-based UPDATE.
+  Ingredient = database_models.Ingredient
+  query = select(distinct(Ingredient.name))
+  if not everything:
+    query = query.where(Ingredient.ingredient_id.is_(None))
+  names = db.scalars(query).all()
+  if not names:
+    return 0
+
+  lookup = []
+  for i in range(0, len(names), batch_size):
+    ids = resolve_ids(db, names[i:i + batch_size])
+    lookup += [{"name": name, "ingredient_id": ingredient_id} for name, ingredient_id in ids.items()]
+  table = Ingredient.__table__
+  updated = database_models.update_from_lookup(
+    db.connection(), table, "name", lookup, where=None if everything else table.c.ingredient_id.is_(None)
+  )
+
+  # Ids changed, so the distinct counts may have too
+  db.execute(text(
+    "UPDATE recipes SET ingredient_count = "
+    "(SELECT COUNT(DISTINCT ingredient_id) FROM ingredients WHERE ingredients.recipe_id = recipes.id)"
+  ))
+  return updated
@@ -1,17 +1,39 @@
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File
-from schemas import Recipe, IngredientItem, Difficulty, Category, RecipeCreate
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Query, Request, Response, Header
+from schemas import Recipe, Difficulty, Category, RecipeCreate, RecipeUpdate, RecipeCard, RecipePage, RecipeSearchResult, PantryMatch, ShoppingListItem, RecipeFacets, RecipeWriteResponse, BatchRequest, BatchResponse, MessageResponse, ImportReport, UploadJobStatus
 from datetime import date
-from sqlalchemy.orm import Session, joinedload
+from typing import Optional, Literal, Union
+from sqlalchemy.orm import Session
 import database_models
-from database import SessionLocal, engine
+import crud
+import search as recipe_search
+import bulk_import
+import batch
+import migrations
+import quantities
+import facets
+import export as recipe_export
+import uploads as upload_jobs
+from uploads import uploader, UploadQueueFull
+from storage import LocalStorage, LOCAL_MEDIA_PATH
+from cache import recipe_cache
+from serializers import FastJSONResponse, dump_json, dump_recipe
+from http_caching import recipe_etag, list_etag, conditional_response, check_if_match, pack_validators, unpack_validators
+from database import SessionLocal, engine, pool_stats
+from replicas import replica_set, read_session, is_current, wants_primary, StickyPrimaryMiddleware
+import metrics
+from metrics import MetricsMiddleware
+import profiling
+from profiling import ProfiledRoute, ProfilingMiddleware
 from fastapi.middleware.cors import CORSMiddleware
-import cloudinary.uploader
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from fastapi.staticfiles import StaticFiles
 
 
 
 
 
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse)
+app.router.route_class = ProfiledRoute # Lets the profiler find the thread a sync route runs on
 
 # origins = [
 #   "http://localhost:8080"
@@ -24,354 +46,18 @@ app.add_middleware(
   allow_origins = ["https://recipe-vault-pearl.vercel.app", "http://localhost:8080"],
   allow_headers = ["*"],
   allow_credentials = True,
-  allow_methods = ["*"]
+  allow_methods = ["*"],
+  expose_headers = ["ETag", "Last-Modified"] # So the frontend can read the ETag to send back as If-Match
 )
 
+app.add_middleware(StickyPrimaryMiddleware) # After a write, that client's reads skip the replicas for a few seconds
+
+app.add_middleware(ProfilingMiddleware) # Opt-in, see profiling.py
+
+app.add_middleware(MetricsMiddleware, router=app.router) # Added last so it's outermost and times everything below it
+
 
 
-RECIPES = [
-  Recipe(
-    id=1,
-    title="Jollof Rice",
-    description="Nigerian Jollof, the Best in Africa",
-    ingredients=[
-      IngredientItem(name="Rice", quantity="2 cups"),
-      IngredientItem(name="Tomatoes", quantity="4"),
-      IngredientItem(name="Onions", quantity="2"),
-      IngredientItem(name="Red Bell Pepper", quantity="2"),
-      IngredientItem(name="Tomato Paste", quantity="3 tbsp"),
-      IngredientItem(name="Chicken Broth", quantity="4 cups"),
-      IngredientItem(name="Butter", quantity="4 tbsp"),
-    ],
-    instructions=[
-      "Heat butter and sauté onions.",
-      "Add tomato paste and cook for 2 mins.",
-      "Add blended tomatoes and peppers, simmer for 10 mins.",
-      "Add rice and broth, bring to boil.",
-      "Reduce heat and cook covered for 20 mins until rice is tender and liquid is absorbed."
-    ],
-    prep_time=15,
-    cook_time=30,
-    servings=4,
-    difficulty=Difficulty.MEDIUM,
-    category=Category.LUNCH,
-    image_url="https://res.cloudinary.com/dfzpvawqz/image/upload/v1769474548/recipe_vault/jzbji0eyw0gribm0mcpk.jpg",
-    rating=5,
-    created_at=date(2024, 1, 15),
-    updated_at=date(2024, 1, 20),
-  ),
-  Recipe(
-    id=2,
-    title="Pancakes",
-    description="Fluffy breakfast pancakes",
-    ingredients=[
-      IngredientItem(name="All-Purpose Flour", quantity="2 cups"),
-      IngredientItem(name="Eggs", quantity="2"),
-      IngredientItem(name="Milk", quantity="1.5 cups"),
-      IngredientItem(name="Baking Powder", quantity="2 tsp"),
-      IngredientItem(name="Salt", quantity="1/2 tsp"),
-      IngredientItem(name="Sugar", quantity="2 tbsp"),
-      IngredientItem(name="Butter", quantity="3 tbsp"),
-    ],
-    instructions=[
-      "Mix flour, baking powder, salt, and sugar.",
-      "Beat eggs and mix with milk and melted butter.",
-      "Combine wet and dry ingredients until just blended.",
-      "Pour 1/4 cup batter per pancake onto greased griddle.",
-      "Cook 2-3 mins per side until golden."
-    ],
-    prep_time=10,
-    cook_time=15,
-    servings=3,
-    difficulty=Difficulty.EASY,
-    category=Category.BREAKFAST,
-    image_url="https://res.cloudinary.com/dfzpvawqz/image/upload/v1769474549/recipe_vault/mfijkaw2afjloqkro93i.jpg",
-    rating=4,
-    created_at=date(2024, 1, 10),
-    updated_at=date(2024, 1, 18),
-  ),
-  Recipe(
-    id=3,
-    title="Grilled Chicken",
-    description="Seasoned grilled chicken breast",
-    ingredients=[
-      IngredientItem(name="Chicken Breast", quantity="500g"),
-      IngredientItem(name="Garlic", quantity="4 cloves"),
-      IngredientItem(name="Olive Oil", quantity="3 tbsp"),
-      IngredientItem(name="Lemon Juice", quantity="2 tbsp"),
-      IngredientItem(name="Salt", quantity="to taste"),
-      IngredientItem(name="Black Pepper", quantity="to taste"),
-      IngredientItem(name="Thyme", quantity="1 tsp"),
-    ],
-    instructions=[
-      "Mix olive oil, minced garlic, lemon juice, and herbs.",
-      "Coat chicken breasts with marinade and let sit 30 mins.",
-      "Preheat grill to medium-high.",
-      "Grill for 6-7 mins per side until internal temperature reaches 165°F."
-    ],
-    prep_time=35,
-    cook_time=15,
-    servings=2,
-    difficulty=Difficulty.EASY,
-    category=Category.DINNER,
-    image_url="https://res.cloudinary.com/dfzpvawqz/image/upload/v1769474547/recipe_vault/jh2x413fo4rcjfebwg75.jpg",
-    rating=4,
-    created_at=date(2024, 1, 12),
-    updated_at=date(2024, 1, 19),
-  ),
-  Recipe(
-    id=4,
-    title="Chocolate Cake",
-    description="Rich chocolate dessert",
-    ingredients=[
-      IngredientItem(name="All-Purpose Flour", quantity="2 cups"),
-      IngredientItem(name="Cocoa Powder", quantity="3/4 cup"),
-      IngredientItem(name="Sugar", quantity="2 cups"),
-      IngredientItem(name="Eggs", quantity="2"),
-      IngredientItem(name="Butter", quantity="1/2 cup"),
-      IngredientItem(name="Milk", quantity="1 cup"),
-      IngredientItem(name="Baking Powder", quantity="1.5 tsp"),
-      IngredientItem(name="Vanilla Extract", quantity="1 tsp"),
-    ],
-    instructions=[
-      "Cream butter and sugar.",
-      "Add eggs one at a time.",
-      "Mix flour, cocoa, and baking powder.",
-      "Alternate adding dry ingredients and milk.",
-      "Stir in vanilla.",
-      "Pour into greased 9-inch pan.",
-      "Bake at 350°F for 35-40 minutes until toothpick comes out clean."
-    ],
-    prep_time=20,
-    cook_time=40,
-    servings=8,
-    difficulty=Difficulty.MEDIUM,
-    category=Category.DESERT,
-    image_url="https://res.cloudinary.com/dfzpvawqz/image/upload/v1769474546/recipe_vault/tyddy7bpmaoy7grzezss.jpg",
-    rating=5,
-    created_at=date(2024, 1, 5),
-    updated_at=date(2024, 1, 17),
-  ),
-  Recipe(
-    id=5,
-    title="Vegetable Stir Fry",
-    description="Quick Asian-inspired vegetables",
-    ingredients=[
-      IngredientItem(name="Broccoli", quantity="2 cups"),
-      IngredientItem(name="Bell Peppers", quantity="2"),
-      IngredientItem(name="Carrots", quantity="2"),
-      IngredientItem(name="Soy Sauce", quantity="3 tbsp"),
-      IngredientItem(name="Garlic", quantity="3 cloves"),
-      IngredientItem(name="Ginger", quantity="1 tbsp"),
-      IngredientItem(name="Vegetable Oil", quantity="2 tbsp"),
-      IngredientItem(name="Sesame Oil", quantity="1 tsp"),
-    ],
-    instructions=[
-      "Heat oil in wok over high heat.",
-      "Add garlic and ginger, cook 30 seconds.",
-      "Add broccoli and carrots, stir fry 4-5 mins.",
-      "Add peppers and soy sauce, cook 3 more minutes until vegetables are tender-crisp.",
-      "Drizzle with sesame oil and serve."
-    ],
-    prep_time=15,
-    cook_time=10,
-    servings=3,
-    difficulty=Difficulty.EASY,
-    category=Category.LUNCH,
-    image_url="https://res.cloudinary.com/dfzpvawqz/image/upload/v1769474552/recipe_vault/aq9nfrgmjev3mt2ecmgp.jpg",
-    rating=4,
-    created_at=date(2024, 1, 14),
-    updated_at=date(2024, 1, 19),
-  ),
-  Recipe(
-    id=6,
-    title="Smoothie Bowl",
-    description="Nutritious breakfast bowl",
-    ingredients=[
-      IngredientItem(name="Greek Yogurt", quantity="1 cup"),
-      IngredientItem(name="Frozen Berries", quantity="1.5 cups"),
-      IngredientItem(name="Banana", quantity="1"),
-      IngredientItem(name="Honey", quantity="1 tbsp"),
-      IngredientItem(name="Granola", quantity="1/2 cup"),
-      IngredientItem(name="Coconut Flakes", quantity="2 tbsp"),
-      IngredientItem(name="Almond Butter", quantity="1 tbsp"),
-    ],
-    instructions=[
-      "Blend yogurt, frozen berries, banana, and honey until smooth.",
-      "Pour into bowl.",
-      "Top with granola, coconut flakes, and almond butter.",
-      "Serve immediately."
-    ],
-    prep_time=5,
-    cook_time=0,
-    servings=1,
-    difficulty=Difficulty.EASY,
-    category=Category.BREAKFAST,
-    image_url="https://res.cloudinary.com/dfzpvawqz/image/upload/v1769474551/recipe_vault/jthfpd1zieyvanlqpzbv.jpg",
-    rating=4,
-    created_at=date(2024, 1, 8),
-    updated_at=date(2024, 1, 18),
-  ),
-  Recipe(
-    id=7,
-    title="Pasta Carbonara",
-    description="Classic Italian pasta",
-    ingredients=[
-      IngredientItem(name="Spaghetti", quantity="400g"),
-      IngredientItem(name="Bacon", quantity="200g"),
-      IngredientItem(name="Eggs", quantity="3"),
-      IngredientItem(name="Parmesan Cheese", quantity="1 cup"),
-      IngredientItem(name="Black Pepper", quantity="1 tsp"),
-      IngredientItem(name="Salt", quantity="to taste"),
-    ],
-    instructions=[
-      "Cook pasta in salted boiling water.",
-      "Fry bacon until crispy, set aside.",
-      "Whisk eggs with grated Parmesan and black pepper.",
-      "Drain pasta, reserving 1 cup pasta water.",
-      "Toss hot pasta with bacon.",
-      "Remove from heat and add egg mixture, stirring quickly.",
-      "Add pasta water as needed for creamy sauce.",
-      "Serve immediately."
-    ],
-    prep_time=10,
-    cook_time=12,
-    servings=4,
-    difficulty=Difficulty.MEDIUM,
-    category=Category.DINNER,
-    image_url="https://res.cloudinary.com/dfzpvawqz/image/upload/v1769474545/recipe_vault/kinjrjgo6n87mnrhzr1b.jpg",
-    rating=5,
-    created_at=date(2024, 1, 11),
-    updated_at=date(2024, 1, 19),
-  ),
-  Recipe(
-    id=8,
-    title="Lemonade",
-    description="Refreshing homemade lemonade",
-    ingredients=[
-      IngredientItem(name="Fresh Lemons", quantity="5"),
-      IngredientItem(name="Sugar", quantity="1 cup"),
-      IngredientItem(name="Water", quantity="6 cups"),
-      IngredientItem(name="Ice", quantity="as needed"),
-      IngredientItem(name="Salt", quantity="pinch"),
-    ],
-    instructions=[
-      "Squeeze lemons to get 1 cup juice.",
-      "In a pitcher, combine sugar and 1 cup hot water, stir until dissolved.",
-      "Add lemon juice, remaining cold water, and a pinch of salt.",
-      "Stir well.",
-      "Serve over ice with lemon slices."
-    ],
-    prep_time=10,
-    cook_time=0,
-    servings=4,
-    difficulty=Difficulty.EASY,
-    category=Category.BEVERAGE,
-    image_url="https://res.cloudinary.com/dfzpvawqz/image/upload/v1769474548/recipe_vault/rtw1nrymucu739c1xvma.jpg",
-    rating=4,
-    created_at=date(2024, 1, 13),
-    updated_at=date(2024, 1, 19),
-  ),
-  Recipe(
-    id=9,
-    title="Brownies",
-    description="Fudgy chocolate brownies",
-    ingredients=[
-      IngredientItem(name="All-Purpose Flour", quantity="1 cup"),
-      IngredientItem(name="Cocoa Powder", quantity="3/4 cup"),
-      IngredientItem(name="Dark Chocolate", quantity="150g"),
-      IngredientItem(name="Butter", quantity="100g"),
-      IngredientItem(name="Sugar", quantity="1.5 cups"),
-      IngredientItem(name="Eggs", quantity="2"),
-      IngredientItem(name="Vanilla Extract", quantity="1 tsp"),
-      IngredientItem(name="Baking Powder", quantity="1/2 tsp"),
-    ],
-    instructions=[
-      "Melt chocolate and butter together.",
-      "Beat eggs with sugar until creamy.",
-      "Stir in melted chocolate and vanilla.",
-      "Mix flour, cocoa, and baking powder.",
-      "Fold into egg mixture.",
-      "Pour into greased 8x8 pan.",
-      "Bake at 350°F for 25 minutes.",
-      "Cool before cutting into squares."
-    ],
-    prep_time=15,
-    cook_time=25,
-    servings=12,
-    difficulty=Difficulty.EASY,
-    category=Category.DESERT,
-    image_url="https://res.cloudinary.com/dfzpvawqz/image/upload/v1769474544/recipe_vault/i2rfjfx2gsaixpupjgpq.jpg",
-    rating=5,
-    created_at=date(2024, 1, 9),
-    updated_at=date(2024, 1, 19),
-  ),
-  Recipe(
-    id=10,
-    title="Caesar Salad",
-    description="Crispy lettuce with Caesar dressing",
-    ingredients=[
-      IngredientItem(name="Romaine Lettuce", quantity="1 head"),
-      IngredientItem(name="Parmesan Cheese", quantity="1/2 cup"),
-      IngredientItem(name="Croutons", quantity="1 cup"),
-      IngredientItem(name="Anchovies", quantity="3 fillets"),
-      IngredientItem(name="Garlic", quantity="2 cloves"),
-      IngredientItem(name="Lemon Juice", quantity="3 tbsp"),
-      IngredientItem(name="Olive Oil", quantity="1/2 cup"),
-      IngredientItem(name="Worcestershire Sauce", quantity="1 tsp"),
-    ],
-    instructions=[
-      "Whisk minced garlic, anchovies, lemon juice, and Worcestershire sauce.",
-      "Slowly whisk in olive oil.",
-      "Tear lettuce into bite-sized pieces.",
-      "Toss with dressing, croutons, and shaved Parmesan.",
-      "Serve immediately."
-    ],
-    prep_time=15,
-    cook_time=0,
-    servings=2,
-    difficulty=Difficulty.EASY,
-    category=Category.LUNCH,
-    image_url="https://res.cloudinary.com/dfzpvawqz/image/upload/v1769474545/recipe_vault/tta9d4c6ixagz7tpsnx2.jpg",
-    rating=4,
-    created_at=date(2024, 1, 16),
-    updated_at=date(2024, 1, 19),
-  ),
-  Recipe(
-    id=11,
-    title="Puff Puff",
-    description="Soft Puffy Delicious Puffs",
-    ingredients=[
-      IngredientItem(name="All-Purpose Flour", quantity="2 cups"),
-      IngredientItem(name="Warm Milk", quantity="3/4 cup"),
-      IngredientItem(name="Sugar", quantity="1/4 cup"),
-      IngredientItem(name="Instant Yeast", quantity="1.5 tsp"),
-      IngredientItem(name="Eggs", quantity="1"),
-      IngredientItem(name="Salt", quantity="1/2 tsp"),
-      IngredientItem(name="Vanilla Extract", quantity="1/2 tsp"),
-      IngredientItem(name="Vegetable Oil", quantity="for frying"),
-    ],
-    instructions=[
-      "Mix yeast with warm milk and 1 tbsp sugar, let sit 5 mins.",
-      "Add flour, egg, salt, and vanilla.",
-      "Beat until smooth, about 5 mins.",
-      "Cover and let rise 30 mins.",
-      "Heat oil to 350°F.",
-      "Drop spoonfuls of batter into hot oil, fry until golden (2-3 mins per side).",
-      "Drain on paper towels.",
-      "Dust with sugar and serve warm."
-    ],
-    prep_time=40,
-    cook_time=15,
-    servings=8,
-    difficulty=Difficulty.EASY,
-    category=Category.SNACK,
-    image_url="https://res.cloudinary.com/dfzpvawqz/image/upload/v1769474550/recipe_vault/z7bvbfdekfb7ac21ooit.jpg",
-    rating=5,
-    created_at=date(2024, 1, 23),
-    updated_at=date(2024, 1, 24),
-  )
-]
 
 
 
@@ -379,9 +65,22 @@ RECIPES = [
 
 
 
-async def get_db_session():
+# Plain (sync) generator + plain def routes: FastAPI runs both in its threadpool, so a
+# blocking SQLAlchemy call only ties up one worker thread instead of the whole event loop.
+# Don't make routes that take a db session `async def`.
+def get_db_session():
+  db = SessionLocal()
+  try:
+    yield db
+  finally:
+    db.close()
+
+
+# Read-only routes: a replica when DATABASE_REPLICA_URLS is set (falling back to the primary),
+# or the primary right after this client wrote something
+def get_read_db_session(request: Request):
+  db = read_session(prefer_primary=wants_primary(request))
   try:
-    db = SessionLocal()
     yield db
   finally:
     db.close()
@@ -391,58 +90,43 @@ async def get_db_session():
 
 
 import json
+import os
+from anyio import to_thread
 
 @app.on_event("startup")
-def init_db():
-    # DEV ONLY: wipe tables so you see updates
-    # database_models.Base.metadata.drop_all(bind=engine) # This wipes the table
-    database_models.Base.metadata.create_all(bind=engine)
+async def configure_threadpool():
+    # Sync routes run on anyio's threadpool (40 threads by default); this caps how many
+    # requests can be inside the database at once, so size it alongside the DB pool.
+    to_thread.current_default_thread_limiter().total_tokens = int(os.getenv("THREADPOOL_SIZE", "40"))
 
-    db = SessionLocal()
-    try:
-        if db.query(database_models.Recipe).first():
-           return # Data already exists
-        
 
-        for recipe in RECIPES:
-            data = recipe.model_dump()
+@app.on_event("startup")
+def init_db():
+    # Schema changes and the demo seed are versioned migrations (migrations.py). On a current
+    # database this is one SELECT. With several workers, run `python migrations.py` before
+    # starting them and set AUTO_MIGRATE=false.
+    if migrations.AUTO_MIGRATE:
+        migrations.migrate(engine)
+    elif migrations.current_version(engine) < migrations.LATEST:
+        print("Database Schema Out Of Date: run `python migrations.py`")
 
-            # relationship list
-            ingredients_data = data.pop("ingredients", [])
 
-            # ---- FIX TYPES FOR DB INSERT ----
-            # enums -> string values
-            if hasattr(data.get("difficulty"), "value"):
-                data["difficulty"] = data["difficulty"].value
-            if hasattr(data.get("category"), "value"):
-                data["category"] = data["category"].value
 
-            # HttpUrl -> string
-            if data.get("image_url") is not None:
-                data["image_url"] = str(data["image_url"])
 
-            # instructions must be a real list, not a JSON string
-            # If it's accidentally a string like '["step1","step2"]', convert it back.
-            if isinstance(data.get("instructions"), str):
-                try:
-                    data["instructions"] = json.loads(data["instructions"])
-                except Exception:
-                    # fallback: treat as single step
-                    data["instructions"] = [data["instructions"]]
+@app.on_event("startup")
+def start_uploads():
+    # Runs after init_db (handlers run in order), so the upload_jobs table exists
+    uploader.start(SessionLocal)
 
-            # create recipe row
-            db_recipe = database_models.Recipe(**data)
 
-            # attach ingredient ORM objects
-            db_recipe.ingredients = [
-                database_models.Ingredient(**ing) for ing in ingredients_data
-            ]
+@app.on_event("shutdown")
+def stop_uploads():
+    uploader.shutdown()
 
-            db.add(db_recipe)
 
-        db.commit()
-    finally:
-        db.close()
+if isinstance(uploader.storage, LocalStorage):
+  # Stand-in for Cloudinary's CDN when images are stored on local disk
+  app.mount(LOCAL_MEDIA_PATH, StaticFiles(directory=uploader.storage.root), name="media")
 
 
 
@@ -452,6 +136,100 @@ def welcome():
   return {"Hello": "Welcome to RecipeVault Backend 😁"}
 
 
+@app.get("/stats/cache")
+def cache_stats():
+  return recipe_cache.stats()
+
+
+@app.get("/stats/pool")
+def database_pool_stats():
+  stats = pool_stats()
+  if replica_set:
+    stats["replicas"] = replica_set.stats()
+  return stats
+
+
+@app.get("/stats/uploads")
+def upload_stats():
+  return uploader.stats()
+
+
+# ---------------- Metrics ----------------
+# Request and database metrics are recorded by MetricsMiddleware; these read the rest at scrape time
+
+@metrics.registry.collector
+def cache_metrics():
+  stats = recipe_cache.stats()
+  if stats.get("backend") == "off":
+    return []
+  labels = {"backend": stats["backend"]}
+  lines = []
+  for name in ("hits", "misses", "evictions", "expirations"):
+    lines += metrics.gauge_lines(f"recipevault_cache_{name}_total", f"Response cache {name}", [(labels, stats.get(name))], "counter")
+  for name in ("entries", "bytes"):
+    lines += metrics.gauge_lines(f"recipevault_cache_{name}", f"Response cache {name} held in this process", [(labels, stats.get(name))])
+  return lines
+
+
+@metrics.registry.collector
+def database_metrics():
+  engines = [("primary", engine)] + [(f"replica-{i}", replica) for i, replica in enumerate(replica_set.engines)]
+  lines = metrics.pool_lines(engines)
+  if replica_set:
+    healthy = [({"replica": f"replica-{i}"}, int(replica["healthy"])) for i, replica in enumerate(replica_set.stats())]
+    lines += metrics.gauge_lines("recipevault_db_replica_healthy", "1 if the replica is in rotation, 0 while it's cooling down after a failure", healthy)
+  return lines
+
+
+@metrics.registry.collector
+def upload_metrics():
+  stats = uploader.stats()
+  labels = {"backend": stats["backend"]}
+  lines = []
+  lines += metrics.gauge_lines("recipevault_uploads_pending", "Image upload jobs queued or running", [(labels, stats["pending"])])
+  lines += metrics.gauge_lines("recipevault_upload_workers", "Image upload worker threads", [(labels, stats["workers"])])
+  for name in ("succeeded", "failed", "retries"):
+    lines += metrics.gauge_lines(f"recipevault_uploads_{name}_total", f"Image upload jobs {name}", [(labels, stats[name])], "counter")
+  return lines
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+  return PlainTextResponse(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
+# ---------------- Profiling ----------------
+
+def require_admin(authorization: Optional[str] = Header(None)):
+  if not profiling.ADMIN_TOKEN:
+    raise HTTPException(status_code=404, detail="Not Found") # No ADMIN_TOKEN, no admin endpoints
+  scheme, _, token = (authorization or "").partition(" ")
+  if scheme.lower() != "bearer" or not profiling.check_token(token):
+    raise HTTPException(status_code=401, detail="Admin Token Required", headers={"WWW-Authenticate": "Bearer"})
+
+
+@app.get("/admin/traces", dependencies=[Depends(require_admin)])
+def list_traces():
+  # Newest first
+  return [trace.summary() for trace in reversed(profiling.traces)]
+
+
+@app.get("/admin/traces/{trace_id}", dependencies=[Depends(require_admin)])
+def get_trace(trace_id: str, format: Literal["json", "collapsed"] = "json"):
+  trace = profiling.get_trace(trace_id)
+  if trace is None:
+    raise HTTPException(status_code=404, detail=f"Trace {trace_id} Not Found")
+  if format == "collapsed":
+    # flamegraph.pl / speedscope / inferno input
+    return PlainTextResponse(trace.collapsed())
+  return trace.detail()
+
+
+@app.get("/admin/slow-queries", dependencies=[Depends(require_admin)])
+def list_slow_queries():
+  return list(reversed(profiling.slow_queries))
+
+
 
 
 
@@ -467,13 +245,176 @@ def welcome():
 
  # DATABASE GET RECIPES ENDPOINT
 
-@app.get("/recipes")
-async def get_recipes(db: Session = Depends(get_db_session)):
-  recipes = (db.query(database_models.Recipe).options(joinedload(database_models.Recipe.ingredients)).all())
+@app.get("/recipes", response_model=Union[list[Recipe], list[RecipeCard], RecipePage])
+def get_recipes(
+    request: Request,
+    search: Optional[str] = None,
+    category: Optional[Category] = None,
+    difficulty: Optional[Difficulty] = None,
+    limit: Optional[int] = Query(None, ge=1, le=100), # Setting limit (or after) switches to paginated mode
+    after: Optional[str] = None, # Opaque cursor from the previous page's next_cursor
+    view: Literal["full", "card"] = "full", # "card" skips ingredients and instructions
+    ids: Optional[list[str]] = Query(None), # ?ids=3,17,42 (or repeated): just those recipes, in that order
+    db: Session = Depends(get_read_db_session)
+):
+  card = view == "card"
+  search = (search or "").strip()
+
+  recipe_ids = None
+  if ids is not None:
+    try:
+      recipe_ids = [int(value) for entry in ids for value in entry.split(",") if value.strip()]
+    except ValueError:
+      raise HTTPException(status_code=400, detail="ids must be recipe ids, e.g. ?ids=3,17,42")
+    if not recipe_ids or len(recipe_ids) > batch.MAX_IDS:
+      raise HTTPException(status_code=400, detail=f"Pass between 1 and {batch.MAX_IDS} ids")
+    if limit is not None or after is not None:
+      raise HTTPException(status_code=400, detail="ids can't be combined with limit or after")
+
+  # Served straight from the cache as already-serialized JSON when nothing it depends on changed
+  # (a per-worker cache checks the catalog version for that, so it's read first)
+  cache_key = json.dumps([view, search.lower(), category, difficulty, limit, after, recipe_ids])
+  catalog = crud.get_catalog_state(db) if recipe_cache.needs_catalog_version else None
+  hit, cache_token = recipe_cache.get_list(cache_key, category, difficulty, catalog_version=catalog and catalog.version)
+  if hit is not None:
+    body, validators = hit
+    return conditional_response(request, body, *unpack_validators(validators))
+
+  # The catalog version alone decides the ETag, so a client that's up to date gets a 304
+  # without the listing query running at all
+  catalog = catalog or crud.get_catalog_state(db)
+  etag = list_etag(catalog.version, cache_key)
+  not_modified = conditional_response(request, b"", etag, catalog.updated_at)
+  if not_modified.status_code == 304:
+    return not_modified
+
+  if recipe_ids is not None:
+    # Two queries however many ids: the recipes, then all their ingredients. Unknown ids are left out.
+    recipes = crud.get_recipes_by_ids(db, recipe_ids, card=card, search=search, category=category, difficulty=difficulty)
+    body = dump_json(recipes)
+  elif limit is not None or after is not None:
+    try:
+      items, next_cursor = crud.list_recipes_page(
+        db, limit or 20, after=after, card=card,
+        search=search, category=category, difficulty=difficulty
+      )
+    except crud.InvalidCursor as e:
+      raise HTTPException(status_code=400, detail=str(e))
+    body = dump_json({"items": items, "next_cursor": next_cursor})
+  else:
+    if card:
+      recipes = crud.list_recipe_cards(db, search=search, category=category, difficulty=difficulty)
+    else:
+      recipes = crud.list_recipes(db, search=search, category=category, difficulty=difficulty)
+
+    filtered = bool(search) or category is not None or difficulty is not None
+    if not recipes and not filtered: # A filter with no matches is an empty list, not an error
+      raise HTTPException(status_code=404, detail="No Recipes Found")
+    body = dump_json(recipes) # Rows are already shaped like the schema, so no per-recipe model validation
+
+  if is_current(db, catalog.version): # Never cache what a lagging replica returned
+    recipe_cache.set_list(cache_key, cache_token, body, pack_validators(etag, catalog.updated_at))
+  return conditional_response(request, body, etag, catalog.updated_at)
+
+
+
+
+
+ # FULL-TEXT SEARCH ENDPOINT (declared before /recipes/{recipe_id} so "search" isn't parsed as an id)
+
+@app.get("/recipes/search", response_model=list[RecipeSearchResult])
+def search_recipes(
+    q: str = Query(..., min_length=1), # Every word must match; words are prefixes, so "choc ca" finds "Chocolate Cake"
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_read_db_session)
+):
+  return recipe_search.search_recipes(db, q, limit=limit)
+
 
-  if not recipes:
-    raise HTTPException(status_code=404, detail="No Recipes Found")
-  return  recipes
+
+
+
+ # "WHAT CAN I COOK" ENDPOINT (also before /recipes/{recipe_id})
+
+@app.get("/recipes/pantry", response_model=list[PantryMatch])
+def pantry_recipes(
+    ingredients: list[str] = Query(..., min_length=1), # ?ingredients=garlic&ingredients=lemon or ?ingredients=garlic,lemon
+    max_missing: Optional[int] = Query(None, ge=0), # Only recipes needing at most this many other ingredients
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_read_db_session)
+):
+  names = [name.strip() for value in ingredients for name in value.split(",") if name.strip()]
+  if not names:
+    raise HTTPException(status_code=400, detail="Pass at least one ingredient")
+  return crud.pantry_matches(db, names, limit=limit, max_missing=max_missing)
+
+
+
+
+
+ # SHOPPING LIST ENDPOINT (also before /recipes/{recipe_id})
+
+@app.get("/recipes/shopping-list", response_model=list[ShoppingListItem])
+def shopping_list(
+    recipes: list[str] = Query(..., min_length=1, max_length=100), # ?recipes=12&recipes=31:6 -> recipe 12 as written, recipe 31 for 6 servings
+    db: Session = Depends(get_read_db_session)
+):
+  entries = []
+  for value in recipes:
+    for entry in value.split(","):
+      recipe_id, _, wanted = entry.strip().partition(":")
+      try:
+        entries.append((int(recipe_id), int(wanted) if wanted else None))
+      except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid recipe {entry!r}, expected id or id:servings")
+      if wanted and int(wanted) < 1:
+        raise HTTPException(status_code=400, detail=f"Invalid servings in {entry!r}")
+  missing, items = crud.shopping_list(db, entries)
+  if missing:
+    raise HTTPException(status_code=404, detail=f"Recipes Not Found: {', '.join(map(str, missing))}")
+  return items
+
+
+
+
+
+ # FACET COUNTS ENDPOINT (also before /recipes/{recipe_id})
+
+@app.get("/recipes/facets", response_model=RecipeFacets)
+def recipe_facets(request: Request, db: Session = Depends(get_read_db_session)):
+  # Read from the recipe_facets counters, so it costs the same for 100 recipes or 10 million
+  catalog = crud.get_catalog_state(db)
+  etag = list_etag(catalog.version, "facets")
+  not_modified = conditional_response(request, b"", etag, catalog.updated_at)
+  if not_modified.status_code == 304:
+    return not_modified
+  return conditional_response(request, dump_json(facets.counts(db)), etag, catalog.updated_at)
+
+
+
+
+
+ # STREAMING EXPORT ENDPOINT (also before /recipes/{recipe_id})
+
+@app.get("/recipes/export")
+def export_recipes(
+    request: Request,
+    format: Literal["ndjson", "json"] = "ndjson", # "json" streams one big array instead of one recipe per line
+    since: Optional[date] = None, # Only recipes updated on or after this date, for incremental syncs
+):
+  # Gzipped on the fly for clients that accept it
+  compress = "gzip" in request.headers.get("accept-encoding", "").lower()
+  headers = {
+    "Content-Disposition": f'attachment; filename="recipes-{date.today().isoformat()}.{format}"',
+    "Vary": "Accept-Encoding",
+  }
+  if compress:
+    headers["Content-Encoding"] = "gzip"
+  return StreamingResponse(
+    recipe_export.stream_export(lambda: read_session(prefer_primary=wants_primary(request), snapshot=True), fmt=format, since=since, compress=compress),
+    media_type=recipe_export.MEDIA_TYPES[format],
+    headers=headers,
+  )
 
 
 
@@ -492,12 +433,45 @@ async def get_recipes(db: Session = Depends(get_db_session)):
 
  # DATABASE GET RECIPES BY ID ENDPOINT
 
-@app.get("/recipes/{recipe_id}")
-async def get_recipe_by_id(recipe_id: int, db: Session = Depends(get_db_session)):
-  db_recipe = db.query(database_models.Recipe).filter(database_models.Recipe.id == recipe_id).first()
+@app.get("/recipes/{recipe_id}", response_model=Recipe)
+def get_recipe_by_id(
+    recipe_id: int,
+    request: Request,
+    servings: Optional[int] = Query(None, ge=1, le=1000), # Scale every quantity that has a number to this many servings
+    db: Session = Depends(get_read_db_session)
+):
+  # Last-Modified is the catalog's: recipes.updated_at only has day precision, and if nothing
+  # in the catalog changed since then, this recipe didn't either. Read before the cache when
+  # that's per-worker, which checks entries against the catalog version.
+  catalog = crud.get_catalog_state(db) if recipe_cache.needs_catalog_version else None
+  if servings is None: # Scaled copies aren't cached, they're cheap to make from the parsed amounts
+    hit, cache_token = recipe_cache.get_recipe(recipe_id, catalog_version=catalog and catalog.version)
+    if hit is not None:
+      body, validators = hit
+      return conditional_response(request, body, *unpack_validators(validators))
+
+  catalog = catalog or crud.get_catalog_state(db)
+
+  if "if-none-match" in request.headers:
+    # Revalidation: check the version before loading the whole recipe
+    meta = crud.get_recipe_meta(db, recipe_id)
+    if meta is not None:
+      not_modified = conditional_response(request, b"", recipe_etag(recipe_id, meta.version, servings), catalog.updated_at)
+      if not_modified.status_code == 304:
+        return not_modified
+
+  db_recipe = crud.get_recipe(db, recipe_id)
   if not db_recipe:
       raise HTTPException(status_code=404, detail=f"Recipe {recipe_id} Not Found")
-  return db_recipe
+  if servings is not None:
+    if not db_recipe["servings"]:
+      raise HTTPException(status_code=400, detail=f"Recipe {recipe_id} has no servings to scale from")
+    quantities.scale_recipe(db_recipe, servings)
+  etag = recipe_etag(recipe_id, db_recipe["version"], servings)
+  body = dump_recipe(db_recipe)
+  if servings is None and is_current(db, catalog.version):
+    recipe_cache.set_recipe(recipe_id, cache_token, body, pack_validators(etag, catalog.updated_at))
+  return conditional_response(request, body, etag, catalog.updated_at)
 
 
 
@@ -529,37 +503,55 @@ async def get_recipe_by_id(recipe_id: int, db: Session = Depends(get_db_session)
 
  # DATABASE POST RECIPES ENDPOINT
 
-@app.post("/recipes")
-def create_recipe(recipe: RecipeCreate, db: Session = Depends(get_db_session)):
+@app.post("/recipes", response_model=RecipeWriteResponse)
+def create_recipe(recipe: RecipeCreate, response: Response, db: Session = Depends(get_db_session)):
   try:
     data = recipe.model_dump()
     ingredient_data = data.pop("ingredients", [])
-    data.pop("id", None)  # Remove id if present to allow auto-generation
-    
-    # ✅ convert enums to their string values
-    if hasattr(data.get("difficulty"), "value"):
-        data["difficulty"] = data["difficulty"].value
-    if hasattr(data.get("category"), "value"):
-        data["category"] = data["category"].value
-
-    # ✅ convert HttpUrl to string
-    if data.get("image_url") is not None:
-        data["image_url"] = str(data["image_url"])
-
-    new_recipe = database_models.Recipe(**data)
-    new_recipe.ingredients = [
-      database_models.Ingredient(**ing) for ing in ingredient_data
-    ]
-    db.add(new_recipe)
+
+    # INSERT ... RETURNING gives back the id and server defaults, so there's no refresh() round trip
+    new_recipe = crud.insert_recipe(db, data, ingredient_data)
+    recipe_search.index_recipes(db, [new_recipe["id"]])
+    facets.apply(db, added=[new_recipe])
+    crud.touch_catalog(db)
     db.commit()
-    db.refresh(new_recipe)
-    return {"message": f"{new_recipe.title} added successfully", "recipe": new_recipe}
+    recipe_cache.invalidate_recipe(new_recipe["id"], (new_recipe["category"], new_recipe["difficulty"]))
+    response.headers["ETag"] = recipe_etag(new_recipe["id"], new_recipe["version"])
+    return {"message": f"{new_recipe['title']} added successfully", "recipe": new_recipe}
   except Exception as e:
      print("Create Recipe Error:", repr(e))
      print("Insert Data: ", data)
      raise HTTPException(status_code=500, detail=str(e))
 
-    
+
+
+
+ # DATABASE BATCH WRITE ENDPOINT
+
+@app.post("/recipes/batch", response_model=BatchResponse)
+def batch_recipes(body: BatchRequest, db: Session = Depends(get_db_session)):
+  # Per-operation results in request order; one transaction and one commit for all of them
+  return batch.apply_operations(db, body.operations, atomic=body.atomic)
+
+
+
+
+ # DATABASE BULK IMPORT ENDPOINT (same loader as `python bulk_import.py`)
+
+@app.post("/recipes/import", response_model=ImportReport)
+def import_recipes(
+    file: UploadFile = File(...), # NDJSON (one recipe per line) or CSV with RecipeCreate columns
+    format: Optional[Literal["ndjson", "csv"]] = None, # Defaults to the file name / content type
+    batch_size: int = Query(bulk_import.DEFAULT_BATCH_SIZE, ge=1, le=10000),
+    db: Session = Depends(get_db_session)
+):
+  fmt = format or bulk_import.detect_format(file.filename, file.content_type)
+  if fmt is None:
+    raise HTTPException(status_code=400, detail="Can't tell the file format, pass ?format=ndjson or ?format=csv")
+  # Bad records are listed in the report; everything else is committed batch by batch
+  return bulk_import.import_recipes(db, bulk_import.read_records(file.file, fmt), batch_size=batch_size)
+
+
 
 
 # PYTHON LIST UPDATE ENDPOINT
@@ -581,24 +573,66 @@ def create_recipe(recipe: RecipeCreate, db: Session = Depends(get_db_session)):
 
  # DATABASE UPDATE RECIPES - ENDPOINT
 
-@app.put("/recipes/{recipe_id}")
-def updated_recipes(recipe_id: int, recipe:Recipe, db: Session = Depends(get_db_session)):
-  db_recipe_exists = db.query(database_models.Recipe).filter(database_models.Recipe.id == recipe_id).first()
-  if not db_recipe_exists: # Treating None value pairs first
-    raise HTTPException(status_code=404, detail=f"Recipe {recipe_id} Not Found, Update Failed!")
+@app.put("/recipes/{recipe_id}", response_model=RecipeWriteResponse)
+def updated_recipes(recipe_id: int, recipe:RecipeCreate, request: Request, response: Response, db: Session = Depends(get_db_session)):
+  # RecipeCreate, not Recipe: id, created_at and updated_at are the server's, and if a client sends them they're ignored
   data = recipe.model_dump() # First dump the recipe in an object for easier manipulation
   ingredients_data = data.pop("ingredients", []) # Pop out the ORM Table value that is related(connected) to the Pydantic Model we dumped --> Recipe
 
-  for key, value in data.items():
-    setattr(db_recipe_exists, key, value) # Update the values of the parameter(recipe) assigned to "db_recipe_exists)"
+  crud.begin_write(db) # Write lock before reading what's replaced (SQLite has no FOR UPDATE)
+  previous = crud.get_recipe_meta(db, recipe_id, for_update=True) # Old (category, difficulty), so cached listings it used to be in get dropped (and facet counts move)
+  if previous is None: # Treating None value pairs first
+    raise HTTPException(status_code=404, detail=f"Recipe {recipe_id} Not Found, Update Failed!")
+  check_if_match(request, recipe_etag(recipe_id, previous.version))
 
-  db_recipe_exists.ingredients = [
-    database_models.Ingredient(**b) for b in ingredients_data # And then take the table value of "ingredients_data" and assign it to it's actual table
-  ]
+  # With If-Match the UPDATE is also conditional on the version, so a write that sneaks in between is caught too
+  expected_version = previous.version if "if-match" in request.headers else None
+  updated = crud.replace_recipe(db, recipe_id, data, ingredients_data, expected_version=expected_version) # UPDATE ... RETURNING, then only the ingredient rows that changed
+  if updated is None:
+    raise HTTPException(status_code=412, detail=f"Recipe {recipe_id} was modified concurrently, Update Failed!")
 
+  recipe_search.index_recipes(db, [recipe_id])
+  facets.apply(db, removed=[previous._mapping], added=[updated])
+  crud.touch_catalog(db)
   db.commit()
-  db.refresh(db_recipe_exists)
-  return {"message": f"{db_recipe_exists.title} Updated Successfully"}
+  recipe_cache.invalidate_recipe(recipe_id, (previous.category, previous.difficulty), (updated["category"], updated["difficulty"]))
+  response.headers["ETag"] = recipe_etag(recipe_id, updated["version"])
+  return {"message": f"{updated['title']} Updated Successfully", "recipe": updated}
+
+
+
+
+ # DATABASE PARTIAL UPDATE - ENDPOINT
+
+@app.patch("/recipes/{recipe_id}", response_model=RecipeWriteResponse)
+def patch_recipe(recipe_id: int, recipe: RecipeUpdate, request: Request, response: Response, db: Session = Depends(get_db_session)):
+  fields = recipe.model_dump(exclude_unset=True) # Only what the client sent
+  if not fields:
+    raise HTTPException(status_code=400, detail="Nothing to update")
+  nulls = [name for name, value in fields.items() if value is None and name != "image_url"] # Only the image can be removed
+  if nulls:
+    raise HTTPException(status_code=422, detail=f"Can't be null: {', '.join(nulls)}")
+  ingredients_data = fields.pop("ingredients", None)
+
+  crud.begin_write(db)
+  previous = crud.get_recipe_meta(db, recipe_id, for_update=True)
+  if previous is None:
+    raise HTTPException(status_code=404, detail=f"Recipe {recipe_id} Not Found, Update Failed!")
+  check_if_match(request, recipe_etag(recipe_id, previous.version))
+
+  expected_version = previous.version if "if-match" in request.headers else None
+  updated = crud.patch_recipe(db, recipe_id, fields, ingredients_data, expected_version=expected_version) # One UPDATE for the columns, plus the ingredient rows that changed
+  if updated is None:
+    raise HTTPException(status_code=412, detail=f"Recipe {recipe_id} was modified concurrently, Update Failed!")
+
+  if ingredients_data is not None or "title" in fields or "description" in fields: # Nothing else is searchable
+    recipe_search.index_recipes(db, [recipe_id])
+  facets.apply(db, removed=[previous._mapping], added=[updated])
+  crud.touch_catalog(db)
+  db.commit()
+  recipe_cache.invalidate_recipe(recipe_id, (previous.category, previous.difficulty), (updated["category"], updated["difficulty"]))
+  response.headers["ETag"] = recipe_etag(recipe_id, updated["version"])
+  return {"message": f"{updated['title']} Updated Successfully", "recipe": updated}
 
 
 
@@ -617,35 +651,63 @@ def updated_recipes(recipe_id: int, recipe:Recipe, db: Session = Depends(get_db_
 
  # DATABASE DELETE RECIPES - ENDPOINTS
 
-@app.delete("/recipes/{recipe_id}")
-def delete_recipe(recipe_id: int, db: Session = Depends(get_db_session)):
-  recipe_exists = db.query(database_models.Recipe).filter(database_models.Recipe.id == recipe_id).first()
-  if not recipe_exists:
+@app.delete("/recipes/{recipe_id}", response_model=MessageResponse)
+def delete_recipe(recipe_id: int, request: Request, db: Session = Depends(get_db_session)):
+  crud.begin_write(db)
+  expected_version = None
+  if "if-match" in request.headers:
+    current = crud.get_recipe_meta(db, recipe_id)
+    if current is None:
+      raise HTTPException(status_code=404, detail=f"Recipe {recipe_id} Not Found, Delete Failed!")
+    check_if_match(request, recipe_etag(recipe_id, current.version))
+    expected_version = current.version
+
+  # One DELETE ... RETURNING; the ingredients go with it through ON DELETE CASCADE
+  deleted = crud.delete_recipe(db, recipe_id, expected_version=expected_version)
+  if deleted is None:
+    if "if-match" in request.headers:
+      raise HTTPException(status_code=412, detail=f"Recipe {recipe_id} was modified concurrently, Delete Failed!")
     raise HTTPException(status_code=404, detail=f"Recipe {recipe_id} Not Found, Delete Failed!")
-  db.delete(recipe_exists)
+  recipe_search.unindex_recipes(db, [recipe_id])
+  facets.apply(db, removed=[deleted._mapping])
+  crud.touch_catalog(db)
   db.commit()
-  return {"message": f"{recipe_exists.title} Deleted Successfully"}
+  recipe_cache.invalidate_recipe(recipe_id, (deleted.category, deleted.difficulty))
+  return {"message": f"{deleted.title} Deleted Successfully"}
 
 
 
 
 
 
-# CLOUDINARY IMAGE ENDPOINT
-@app.post("/recipes/{recipe_id}/image")
+# IMAGE UPLOAD ENDPOINT
+# Only spools the file and queues it; uploads.py pushes it to storage (Cloudinary, or a local
+# directory with STORAGE_BACKEND=local) in the background and then sets image_url.
+# Poll the returned job at GET /uploads/{job_id}.
+@app.post("/recipes/{recipe_id}/image", status_code=202, response_model=UploadJobStatus)
 def upload_recipe_image(
     recipe_id: int,
+    response: Response,
     file: UploadFile = File(...),
     db: Session = Depends(get_db_session)
 ):
   
-  db_recipe = db.query(database_models.Recipe).filter(database_models.Recipe.id == recipe_id).first() # Check if the recipe exists in the database using the provided recipe_id. If it doesn't exist, raise a 404 error.
-
-  if not db_recipe:
+  if crud.get_recipe_meta(db, recipe_id) is None: # Check if the recipe exists in the database using the provided recipe_id. If it doesn't exist, raise a 404 error.
     raise HTTPException(status_code=404, detail="Recipe not found")
-  result = cloudinary.uploader.upload(file.file, folder="recipe_vault")
-  db_recipe.image_url = result["secure_url"]
+  if file.content_type and not file.content_type.startswith("image/"):
+    raise HTTPException(status_code=400, detail="Please upload an image file")
 
-  db.commit()
-  db.refresh(db_recipe)
-  return {"image_url": db_recipe.image_url}
\ No newline at end of file
+  try:
+    job_id = uploader.enqueue(db, recipe_id, file.file, file.filename)
+  except UploadQueueFull:
+    raise HTTPException(status_code=503, detail="Too many uploads in progress, try again shortly", headers={"Retry-After": "5"})
+  response.headers["Location"] = f"/uploads/{job_id}"
+  return get_upload_job(job_id, db)
+
+
+@app.get("/uploads/{job_id}", response_model=UploadJobStatus)
+def get_upload_job(job_id: str, db: Session = Depends(get_db_session)):
+  job = upload_jobs.get_job(db, job_id)
+  if job is None:
+    raise HTTPException(status_code=404, detail=f"Upload {job_id} Not Found")
+  return job._asdict()
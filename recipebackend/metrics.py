@@ -0,0 +1,291 @@
+import contextvars
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.routing import Match
+
+
+# Prometheus-style metrics, served as text at GET /metrics. No client library: a handful of
+# counters, gauges and histograms behind one lock is all this app needs.
+#
+# - MetricsMiddleware records every request by route template ("/recipes/{recipe_id}", never the
+#   raw path, so the label set stays small): count, latency, in-flight, response size.
+# - SQLAlchemy cursor events count every statement and its time against the request that ran
+#   it (a contextvar, which anyio copies into the threadpool along with the request), so
+#   db_queries_total / db_query_seconds_total by route show where database time actually goes.
+#   Statements outside any request (the upload workers, startup) count under "<background>".
+# - Cache, pool, upload and replica numbers are read from their own stats when scraped.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+  return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+  pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+  return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+  if value == float("inf"):
+    return "+Inf"
+  return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+  kind = None
+
+  def __init__(self, registry, name, help, labels=()):
+    self.name = name
+    self.help = help
+    self.labelnames = tuple(labels)
+    self._lock = registry.lock
+    self._values = {} # label values tuple -> value
+    registry.metrics.append(self)
+
+  def render(self):
+    lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+    with self._lock:
+      for labels, value in sorted(self._values.items()):
+        lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+    return lines
+
+
+class Counter(Metric):
+  kind = "counter"
+
+  def inc(self, *labels, amount=1):
+    with self._lock:
+      self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+  kind = "gauge"
+
+  def inc(self, *labels, amount=1):
+    with self._lock:
+      self._values[labels] = self._values.get(labels, 0) + amount
+
+  def dec(self, *labels, amount=1):
+    self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+  kind = "histogram"
+
+  def __init__(self, registry, name, help, labels=(), buckets=LATENCY_BUCKETS):
+    super().__init__(registry, name, help, labels)
+    self.buckets = tuple(buckets)
+
+  def observe(self, *labels, value):
+    with self._lock:
+      entry = self._values.get(labels)
+      if entry is None:
+        entry = self._values[labels] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0, "count": 0}
+      entry["count"] += 1
+      entry["sum"] += value
+      for i, bound in enumerate(self.buckets):
+        if value <= bound:
+          entry["counts"][i] += 1
+          break
+      else:
+        entry["counts"][-1] += 1
+
+  def render(self):
+    lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+    with self._lock:
+      for labels, entry in sorted(self._values.items()):
+        lines += histogram_lines(self.name, self.labelnames, labels, self.buckets, entry["counts"], entry["sum"], entry["count"])
+    return lines
+
+
+def histogram_lines(name, labelnames, labels, buckets, counts, total, count):
+  # counts are per bucket (last one is +Inf); Prometheus wants them cumulative
+  lines = []
+  running = 0
+  for bound, bucket_count in zip(list(buckets) + [float("inf")], counts):
+    running += bucket_count
+    lines.append(f"{name}_bucket{_labels(labelnames, labels, [('le', _number(bound))])} {running}")
+  lines.append(f"{name}_sum{_labels(labelnames, labels)} {_number(total)}")
+  lines.append(f"{name}_count{_labels(labelnames, labels)} {count}")
+  return lines
+
+
+class Registry:
+  def __init__(self):
+    self.lock = threading.Lock()
+    self.metrics = []
+    self.collectors = [] # Called on every scrape; each returns a list of exposition lines
+
+  def collector(self, fn):
+    self.collectors.append(fn)
+    return fn
+
+  def render(self):
+    lines = []
+    for metric in self.metrics:
+      lines += metric.render()
+    for collect in self.collectors:
+      try:
+        lines += collect()
+      except Exception as e: # One broken source (say, Redis down) mustn't take the whole scrape with it
+        print("Metrics Collector Error:", collect.__name__, repr(e))
+    return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUESTS = Counter(registry, "recipevault_http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+LATENCY = Histogram(registry, "recipevault_http_request_duration_seconds", "Time from request start to last body byte sent", ("method", "route"))
+IN_FLIGHT = Gauge(registry, "recipevault_http_requests_in_flight", "Requests currently being served", ("method", "route"))
+RESPONSE_SIZE = Histogram(registry, "recipevault_http_response_size_bytes", "Response body size (after compression, if any)", ("method", "route"), SIZE_BUCKETS)
+DB_QUERIES = Counter(registry, "recipevault_db_queries_total", "SQL statements sent, by the route that sent them", ("route",))
+DB_SECONDS = Counter(registry, "recipevault_db_query_seconds_total", "Time spent in SQL statements, by the route that sent them", ("route",))
+DB_QUERIES_PER_REQUEST = Histogram(registry, "recipevault_db_queries_per_request", "SQL statements per request", ("method", "route"), QUERY_COUNT_BUCKETS)
+DB_SECONDS_PER_REQUEST = Histogram(registry, "recipevault_db_query_seconds_per_request", "Time in SQL statements per request", ("method", "route"))
+
+
+# ---------------- Database ----------------
+
+class _RequestDB:
+  __slots__ = ("route", "queries", "seconds")
+
+  def __init__(self, route):
+    self.route = route
+    self.queries = 0
+    self.seconds = 0.0
+
+
+_current = contextvars.ContextVar("metrics_request_db", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+  conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+  started = conn.info["metrics_started"].pop()
+  _record_query(time.perf_counter() - started)
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+  # A failed statement never reaches after_cursor_execute; still count it
+  started = context.connection.info.get("metrics_started") if context.connection is not None else None
+  if started:
+    _record_query(time.perf_counter() - started.pop())
+
+
+def _record_query(seconds):
+  request = _current.get()
+  if request is None:
+    DB_QUERIES.inc("<background>")
+    DB_SECONDS.inc("<background>", amount=seconds)
+    return
+  request.queries += 1
+  request.seconds += seconds
+
+
+# ---------------- Middleware ----------------
+
+class MetricsMiddleware:
+  # Pure ASGI, outermost, so the numbers include every other middleware and streamed bodies
+  def __init__(self, app, router):
+    self.app = app
+    self.router = router
+
+  def route_of(self, scope):
+    # The route template, matched the same way the router will; "<unmatched>" for 404s
+    partial = None
+    for route in self.router.routes:
+      match, _ = route.matches(scope)
+      if match == Match.FULL:
+        return route.path
+      if match == Match.PARTIAL and partial is None:
+        partial = route.path # Right path, wrong method: the router answers 405 from it
+    return partial or "<unmatched>"
+
+  async def __call__(self, scope, receive, send):
+    if scope["type"] != "http":
+      await self.app(scope, receive, send)
+      return
+
+    method = scope["method"]
+    route = self.route_of(scope)
+    db = _RequestDB(route)
+    token = _current.set(db)
+    status = 500 # What the client gets if the app raises before starting a response
+    size = 0
+    started = time.perf_counter()
+    IN_FLIGHT.inc(method, route)
+
+    async def send_and_measure(message):
+      nonlocal status, size
+      if message["type"] == "http.response.start":
+        status = message["status"]
+      elif message["type"] == "http.response.body":
+        size += len(message.get("body", b""))
+      await send(message)
+
+    try:
+      await self.app(scope, receive, send_and_measure)
+    finally:
+      seconds = time.perf_counter() - started
+      _current.reset(token)
+      IN_FLIGHT.dec(method, route)
+      REQUESTS.inc(method, route, str(status))
+      LATENCY.observe(method, route, value=seconds)
+      RESPONSE_SIZE.observe(method, route, value=size)
+      DB_QUERIES_PER_REQUEST.observe(method, route, value=db.queries)
+      DB_SECONDS_PER_REQUEST.observe(method, route, value=db.seconds)
+      if db.queries:
+        DB_QUERIES.inc(route, amount=db.queries)
+        DB_SECONDS.inc(route, amount=db.seconds)
+
+
+# ---------------- Other subsystems ----------------
+
+def gauge_lines(name, help, samples, kind="gauge"):
+  # samples: [(labels dict, value)]; None values are skipped
+  lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+  for labels, value in samples:
+    if value is not None:
+      lines.append(f"{name}{_labels(labels.keys(), labels.values())} {_number(value)}")
+  return lines
+
+
+def pool_lines(engines):
+  # engines: [(label, engine)], the primary and any replicas
+  lines = []
+  counters = {}
+  histograms = {}
+  for label, engine in engines:
+    engine_counters, engine_histograms = engine.pool_metrics.export()
+    for name, value in engine_counters.items():
+      counters.setdefault(name, []).append(({"engine": label}, value))
+    for name, histogram in engine_histograms.items():
+      histograms.setdefault(name, []).append((label, histogram))
+    pool = engine.pool
+    if hasattr(pool, "checkedout"):
+      counters.setdefault("checked_out", []).append(({"engine": label}, pool.checkedout()))
+      counters.setdefault("checked_in", []).append(({"engine": label}, pool.checkedin()))
+
+  for name, samples in counters.items():
+    kind = "gauge" if name in ("checked_out", "checked_in") else "counter"
+    suffix = "" if kind == "gauge" else "_total"
+    lines += gauge_lines(f"recipevault_db_pool_{name}{suffix}", f"Connection pool {name.replace('_', ' ')}", samples, kind)
+  for name, samples in histograms.items():
+    metric = f"recipevault_db_pool_{name}"
+    lines += [f"# HELP {metric} Connection pool {name.replace('_', ' ')}", f"# TYPE {metric} histogram"]
+    for label, histogram in samples:
+      lines += histogram_lines(metric, ("engine",), (label,), histogram["buckets"], histogram["counts"], histogram["sum"], histogram["count"])
+  return lines
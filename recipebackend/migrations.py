@@ -0,0 +1,450 @@
+import argparse
+import os
+import sys
+import time
+from sqlalchemy import Table, Column, Integer, BigInteger, Float, String, Text, Date, DateTime, ForeignKey, Index, MetaData, select, insert, update, func, exc, inspect, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import Session
+import database_models
+import search as recipe_search
+
+
+# Versioned schema and data migrations. Each one runs once per database, and schema_migrations
+# records which ones have.
+#
+#   python migrations.py              # apply pending migrations (do this before starting workers)
+#   python migrations.py status       # list applied and pending migrations
+#
+# All pending migrations run in one transaction behind a lock: pg_advisory_xact_lock on
+# Postgres, the write lock (BEGIN IMMEDIATE) on SQLite. Workers that start at the same time
+# queue up behind the first one, then find nothing left to do. Startup (AUTO_MIGRATE, on by
+# default) only does one SELECT when the database is already current.
+#
+# To add one, append a function decorated with @migration(next number, "what it does"). It gets
+# the Connection and must not commit. Schema changes go in a MetaData of their own next to the
+# others below (not database_models, which keeps changing) and are applied with _apply_schema.
+
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "true").strip().lower() in ("1", "true", "yes", "on")
+
+LOCK_KEY = 7_263_511_906 # Arbitrary, shared by every process that runs migrations against this database
+
+SQLITE_LOCK_TIMEOUT = 120 # Seconds to keep retrying BEGIN IMMEDIATE while another process migrates
+
+metadata = MetaData()
+
+schema_migrations = Table(
+  "schema_migrations", metadata,
+  Column("version", Integer, primary_key=True),
+  Column("name", String, nullable=False),
+  Column("applied_at", DateTime(timezone=True), nullable=False, server_default=func.now()),
+)
+
+MIGRATIONS = [] # (version, name, fn, is_seed), in order
+
+
+def migration(version, name, seed=False):
+  def register(fn):
+    if MIGRATIONS and version <= MIGRATIONS[-1][0]:
+      raise RuntimeError(f"Migration {version} is out of order")
+    MIGRATIONS.append((version, name, fn, seed))
+    return fn
+  return register
+
+
+# ---------------- Schema ----------------
+
+# Each migration declares the tables, columns and indexes it adds as they were when it was
+# written, in a MetaData of its own; database_models only describes the latest schema. Tables
+# that already exist are listed with just the new columns (and any an index needs), so
+# _apply_schema adds those and skips the rest.
+
+def _apply_schema(conn, schema):
+  # Creates what schema has and the database doesn't: whole tables, then columns with their
+  # default, NOT NULL and foreign key, then indexes
+  schema.create_all(conn) # Only the missing tables
+
+  inspector = inspect(conn)
+  ddl_compiler = conn.dialect.ddl_compiler(conn.dialect, None)
+  for table in schema.sorted_tables:
+    existing = {c["name"] for c in inspector.get_columns(table.name)}
+    for column in table.columns:
+      if column.name in existing:
+        continue
+      ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=conn.dialect)}"
+      if column.server_default is not None:
+        ddl += f" DEFAULT {ddl_compiler.get_column_default_string(column)}"
+        if not column.nullable:
+          ddl += " NOT NULL"
+      for fk in column.foreign_keys:
+        target_table, target_column = fk.target_fullname.split(".")
+        ddl += f" REFERENCES {target_table} ({target_column})"
+        if fk.ondelete:
+          ddl += f" ON DELETE {fk.ondelete}"
+      conn.execute(text(ddl))
+
+  for table in schema.sorted_tables:
+    for index in table.indexes:
+      index.create(conn, checkfirst=True)
+
+
+def _postgres_only(index):
+  return index.ddl_if(dialect="postgresql")
+
+
+# The schema migrations started from: what the startup create_all made (recipes and
+# ingredients), plus the indexes, catalog_state and upload_jobs added alongside it
+baseline_schema = MetaData()
+
+Table(
+  "recipes", baseline_schema,
+  Column("id", Integer, primary_key=True, index=True, autoincrement=True),
+  Column("title", String),
+  Column("description", String),
+  Column("instructions", database_models.JSONDocument, nullable=False),
+  Column("prep_time", Integer),
+  Column("cook_time", Integer),
+  Column("servings", Integer),
+  Column("difficulty", String),
+  Column("category", String),
+  Column("image_url", String),
+  Column("image_variants", database_models.JSONDocument, nullable=True),
+  Column("rating", Integer),
+  Column("created_at", Date, server_default=func.current_date()),
+  Column("updated_at", Date, server_default=func.current_date()),
+  Column("version", Integer, nullable=False, server_default="1"),
+  Column("search_vector", Text().with_variant(TSVECTOR(), "postgresql"), nullable=True),
+  Index("ix_recipes_category_difficulty", "category", "difficulty"),
+  Index("ix_recipes_difficulty_category", "difficulty", "category"),
+  Index("ix_recipes_created_at_id", "created_at", "id"),
+  _postgres_only(Index("ix_recipes_title_trgm", "title", postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"})),
+  _postgres_only(Index("ix_recipes_description_trgm", "description", postgresql_using="gin", postgresql_ops={"description": "gin_trgm_ops"})),
+  _postgres_only(Index("ix_recipes_search_vector", "search_vector", postgresql_using="gin")),
+)
+
+Table(
+  "ingredients", baseline_schema,
+  Column("id", Integer, primary_key=True, index=True),
+  Column("recipe_id", Integer, ForeignKey("recipes.id", ondelete="CASCADE"), index=True),
+  Column("name", String, nullable=False),
+  Column("quantity", String, nullable=False),
+  _postgres_only(Index("ix_ingredients_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"})),
+)
+
+catalog_state = Table(
+  "catalog_state", baseline_schema,
+  Column("id", Integer, primary_key=True),
+  Column("version", BigInteger, nullable=False, server_default="1"),
+  Column("updated_at", DateTime(timezone=True), nullable=False, server_default=func.now()),
+)
+
+Table(
+  "upload_jobs", baseline_schema,
+  Column("id", String(32), primary_key=True),
+  Column("recipe_id", Integer, ForeignKey("recipes.id", ondelete="CASCADE"), nullable=False, index=True),
+  Column("status", String, nullable=False, server_default="queued"),
+  Column("attempts", Integer, nullable=False, server_default="0"),
+  Column("spool_path", String, nullable=False),
+  Column("image_url", String),
+  Column("error", String),
+  Column("created_at", DateTime(timezone=True), nullable=False, server_default=func.now()),
+  Column("updated_at", DateTime(timezone=True), nullable=False, server_default=func.now()),
+)
+
+canonical_ingredients_schema = MetaData()
+
+Table(
+  "canonical_ingredients", canonical_ingredients_schema,
+  Column("id", Integer, primary_key=True),
+  Column("name", String, nullable=False, unique=True),
+)
+
+Table(
+  "ingredients", canonical_ingredients_schema,
+  Column("recipe_id", Integer),
+  Column("ingredient_id", Integer, ForeignKey("canonical_ingredients.id"), nullable=True),
+  Index("ix_ingredients_ingredient_id_recipe_id", "ingredient_id", "recipe_id"),
+)
+
+Table(
+  "recipes", canonical_ingredients_schema,
+  Column("ingredient_count", Integer, nullable=False, server_default="0"),
+)
+
+quantities_schema = MetaData()
+
+Table(
+  "ingredients", quantities_schema,
+  Column("amount", Float, nullable=True),
+  Column("unit", String, nullable=True),
+  Column("base_amount", Float, nullable=True),
+  Column("base_unit", String, nullable=True),
+)
+
+facets_schema = MetaData()
+
+Table(
+  "recipe_facets", facets_schema,
+  Column("facet", String, primary_key=True),
+  Column("value", String, primary_key=True),
+  Column("count", Integer, nullable=False, server_default="0"),
+)
+
+positions_schema = MetaData()
+
+Table(
+  "ingredients", positions_schema,
+  Column("recipe_id", Integer),
+  Column("position", Integer, nullable=False, server_default="0"),
+  Index("ix_ingredients_recipe_id_position", "recipe_id", "position"),
+)
+
+
+# ingredients as migration 7 left it, for rebuilding the table on SQLite (migration 8)
+ingredients_schema = MetaData()
+
+Table("recipes", ingredients_schema, Column("id", Integer, primary_key=True))
+Table("canonical_ingredients", ingredients_schema, Column("id", Integer, primary_key=True))
+
+ingredients_table = Table(
+  "ingredients", ingredients_schema,
+  Column("id", Integer, primary_key=True, index=True),
+  Column("recipe_id", Integer, ForeignKey("recipes.id", ondelete="CASCADE"), index=True),
+  Column("name", String, nullable=False),
+  Column("quantity", String, nullable=False),
+  Column("ingredient_id", Integer, ForeignKey("canonical_ingredients.id"), nullable=True),
+  Column("amount", Float, nullable=True),
+  Column("unit", String, nullable=True),
+  Column("base_amount", Float, nullable=True),
+  Column("base_unit", String, nullable=True),
+  Column("position", Integer, nullable=False, server_default="0"),
+  Index("ix_ingredients_ingredient_id_recipe_id", "ingredient_id", "recipe_id"),
+  Index("ix_ingredients_recipe_id_position", "recipe_id", "position"),
+)
+
+upload_leases_schema = MetaData()
+
+Table(
+  "upload_jobs", upload_leases_schema,
+  Column("status", String),
+  Column("owner", String),
+  Column("lease_until", DateTime(timezone=True)),
+  Index("ix_upload_jobs_status_lease_until", "status", "lease_until"),
+)
+
+# ---------------- Migrations ----------------
+
+@migration(1, "baseline schema")
+def _baseline(conn):
+  # Creates the starting schema on a new database; on one made by the old create_all-at-startup
+  # code it adds whatever columns and indexes are missing
+  if conn.dialect.name == "postgresql":
+    conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+  _apply_schema(conn, baseline_schema)
+  if conn.execute(select(catalog_state.c.id).where(catalog_state.c.id == 1)).first() is None:
+    conn.execute(insert(catalog_state).values(id=1))
+
+
+@migration(2, "backfill search vectors")
+def _backfill_search_vectors(conn):
+  # Rows written before full-text search existed (Postgres only; SQLite indexes in memory)
+  with Session(bind=conn) as db:
+    recipe_search.index_recipes(db, only_missing=True)
+    db.flush()
+
+
+@migration(3, "seed demo recipes", seed=True)
+def _seed(conn):
+  # The demo catalog, only into an empty database; same batched path as POST /recipes/import.
+  # Runs after the schema migrations (see migrate()), since the loader writes the latest schema.
+  import bulk_import
+  from seed import SEED_RECIPES
+  with Session(bind=conn) as db: # Joins the migration transaction; its commits don't end it
+    if db.scalar(select(database_models.Recipe.id).limit(1)) is not None:
+      return
+    records = (
+      (row, {key: value for key, value in recipe.items() if key != "id"}, None)
+      for row, recipe in enumerate(SEED_RECIPES, 1)
+    )
+    report = bulk_import.import_recipes(db, records)
+  if report["failed"]:
+    raise RuntimeError(f"Seed recipes failed validation: {report['errors']}")
+
+
+@migration(4, "canonical ingredients")
+def _canonical_ingredients(conn):
+  # canonical_ingredients, ingredients.ingredient_id and its index, recipes.ingredient_count,
+  # then both filled in for existing rows (backfill does the counts too)
+  import ingredient_names
+  _apply_schema(conn, canonical_ingredients_schema)
+  with Session(bind=conn) as db:
+    ingredient_names.backfill(db)
+    db.flush()
+
+
+@migration(5, "parse ingredient quantities")
+def _parse_quantities(conn):
+  # ingredients.amount/unit/base_amount/base_unit, filled in once per distinct quantity string
+  import quantities
+  _apply_schema(conn, quantities_schema)
+  with Session(bind=conn) as db:
+    quantities.backfill(db)
+    db.flush()
+
+
+@migration(6, "recipe facet counts")
+def _facet_counts(conn):
+  # recipe_facets, counted once from the recipes table; writes keep it up to date from here on
+  import facets
+  _apply_schema(conn, facets_schema)
+  with Session(bind=conn) as db:
+    facets.rebuild(db)
+    db.flush()
+
+
+@migration(7, "ingredient positions")
+def _ingredient_positions(conn):
+  # ingredients.position and its index, then each recipe's existing lines numbered in id order
+  # (the order they were read back in until now) with one set-based UPDATE
+  import crud
+  _apply_schema(conn, positions_schema)
+  Ingredient = database_models.Ingredient.__table__
+  ranked = select(
+    Ingredient.c.id,
+    ((func.row_number().over(partition_by=Ingredient.c.recipe_id, order_by=Ingredient.c.id) - 1) * crud.POSITION_GAP).label("position"),
+  ).subquery()
+  conn.execute(update(Ingredient).values(position=ranked.c.position).where(Ingredient.c.id == ranked.c.id))
+
+
+@migration(8, "ingredient_id foreign key")
+def _ingredient_id_foreign_key(conn):
+  # Databases from before migrations got ingredients.ingredient_id from the old baseline, which
+  # added columns without their foreign key, so migration 4 found it there and left it as is.
+  # Ids pointing nowhere are cleared and resolved again first, so the constraint holds.
+  import ingredient_names
+  foreign_keys = inspect(conn).get_foreign_keys("ingredients")
+  if any(fk["constrained_columns"] == ["ingredient_id"] for fk in foreign_keys):
+    return
+
+  conn.execute(text(
+    "UPDATE ingredients SET ingredient_id = NULL WHERE ingredient_id IS NOT NULL "
+    "AND ingredient_id NOT IN (SELECT id FROM canonical_ingredients)"
+  ))
+  with Session(bind=conn) as db:
+    ingredient_names.backfill(db)
+    db.flush()
+
+  if conn.dialect.name == "postgresql":
+    conn.execute(text(
+      "ALTER TABLE ingredients ADD CONSTRAINT ingredients_ingredient_id_fkey "
+      "FOREIGN KEY (ingredient_id) REFERENCES canonical_ingredients (id)"
+    ))
+    return
+
+  # SQLite can't add a constraint to an existing table, so it's rebuilt: the old one is moved
+  # aside (its indexes dropped so the names are free), then copied into a new one
+  conn.execute(text("ALTER TABLE ingredients RENAME TO ingredients_old"))
+  for index in inspect(conn).get_indexes("ingredients_old"):
+    conn.execute(text(f"DROP INDEX {index['name']}"))
+  ingredients_table.create(conn)
+  columns = ", ".join(column.name for column in ingredients_table.columns)
+  conn.execute(text(f"INSERT INTO ingredients ({columns}) SELECT {columns} FROM ingredients_old"))
+  conn.execute(text("DROP TABLE ingredients_old"))
+
+
+
+@migration(9, "upload job leases")
+def _upload_job_leases(conn):
+  # upload_jobs.owner/lease_until and their index. Jobs already queued keep owner NULL, so the
+  # first worker to look claims them.
+  _apply_schema(conn, upload_leases_schema)
+
+
+LATEST = MIGRATIONS[-1][0]
+
+
+# ---------------- Runner ----------------
+
+def current_version(engine):
+  # Highest applied version, 0 for a fresh database. One query, no lock.
+  with engine.connect() as conn:
+    try:
+      return conn.execute(select(func.max(schema_migrations.c.version))).scalar() or 0
+    except exc.DBAPIError: # No schema_migrations table yet
+      return 0
+
+
+def _lock(conn):
+  # Starts the migration transaction holding the database-wide migration lock
+  dialect = conn.dialect.name
+  if dialect == "postgresql":
+    conn.execute(select(func.pg_advisory_xact_lock(LOCK_KEY))) # Released at commit/rollback
+  elif dialect == "sqlite":
+    deadline = time.monotonic() + SQLITE_LOCK_TIMEOUT
+    while True:
+      try:
+        conn.exec_driver_sql("BEGIN IMMEDIATE") # Waits up to the busy timeout for other writers
+        return
+      except exc.OperationalError:
+        conn.rollback()
+        if time.monotonic() > deadline:
+          raise
+        time.sleep(0.5)
+
+
+def migrate(engine, seed=True):
+  # Applies pending migrations; returns [(version, name)] of the ones applied.
+  # seed=False records the demo seed as done without loading it (bulk imports, benchmark catalogs).
+  if current_version(engine) >= LATEST:
+    return []
+
+  applied_now = []
+  with engine.connect() as conn:
+    _lock(conn)
+    metadata.create_all(conn)
+    applied = set(conn.execute(select(schema_migrations.c.version)).scalars())
+    # Seeds go last: they load data through the current code, which needs every schema
+    # migration in place (on a new database the seed's number comes before some of them)
+    for version, name, fn, is_seed in sorted(MIGRATIONS, key=lambda m: m[3]):
+      if version in applied:
+        continue
+      started = time.perf_counter()
+      skipped = is_seed and not seed
+      if not skipped:
+        fn(conn)
+      conn.execute(insert(schema_migrations).values(version=version, name=name))
+      applied_now.append((version, name))
+      print(f"Migration {version} ({name}) {'Skipped' if skipped else 'Applied'} in {time.perf_counter() - started:.2f}s")
+    conn.commit()
+  return applied_now
+
+
+def status(engine):
+  with engine.connect() as conn:
+    try:
+      applied = {row.version: row.applied_at for row in conn.execute(select(schema_migrations))}
+    except exc.DBAPIError:
+      applied = {}
+  return [
+    {"version": version, "name": name, "applied_at": applied.get(version)}
+    for version, name, _, _ in MIGRATIONS
+  ]
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Apply or list database migrations")
+  parser.add_argument("command", nargs="?", choices=["migrate", "status"], default="migrate")
+  parser.add_argument("--no-seed", action="store_true", help="Don't load the demo recipes into an empty database")
+  args = parser.parse_args(argv)
+
+  from database import engine
+  if args.command == "status":
+    for entry in status(engine):
+      print(f"{entry['version']:>4}  {entry['name']:<28} {entry['applied_at'] or 'pending'}")
+    return 0
+  applied = migrate(engine, seed=not args.no_seed)
+  print(f"{len(applied)} migration(s) applied, database at version {LATEST}")
+  return 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
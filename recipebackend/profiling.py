@@ -0,0 +1,339 @@
+import contextvars
+import functools
+import hmac
+import inspect
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# Opt-in request profiling and a slow-query log, for finding out where a latency spike goes
+# (Pydantic, the ORM, the driver, serialization...).
+#
+# - A request is profiled when it carries "X-Profile: <ADMIN_TOKEN>", or at random with
+#   probability PROFILE_SAMPLE_RATE. While it runs, a sampler thread grabs the stack of the
+#   worker thread executing its route every PROFILE_INTERVAL_MS and counts identical stacks;
+#   the result is a collapsed-stack profile (flamegraph.pl / speedscope input) plus a
+#   per-package breakdown.
+# - Header-triggered traces are always kept; sampled ones only when they took longer than
+#   SLOW_REQUEST_MS. The last PROFILE_TRACES are kept in memory, read through /admin/traces.
+# - Any SQL statement slower than SLOW_QUERY_MS is logged with its EXPLAIN plan (fetched
+#   afterwards, on another connection, off the request path) and kept in its own ring buffer.
+#
+# Cost when off: no profiler thread and no extra SQL hooks; each sync route call does one
+# contextvar lookup.
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000
+PROFILE_MAX_CONCURRENT = int(os.getenv("PROFILE_MAX_CONCURRENT", "4")) # Caps the overhead under load
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_MS", "500")) / 1000
+SLOW_QUERY_SECONDS = float(os.getenv("SLOW_QUERY_MS", "0")) / 1000 # 0 = slow-query log off
+PROFILE_TRACES = int(os.getenv("PROFILE_TRACES", "50"))
+
+PROFILE_HEADER = b"x-profile"
+TRACE_HEADER = "X-Profile-Trace"
+
+EXPLAIN_EVERY_SECONDS = 60 # The same statement is EXPLAINed at most this often
+
+traces = deque(maxlen=PROFILE_TRACES)
+slow_queries = deque(maxlen=PROFILE_TRACES)
+
+_current = contextvars.ContextVar("profiling_trace", default=None)
+_active = threading.BoundedSemaphore(PROFILE_MAX_CONCURRENT)
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def enabled():
+  return bool(ADMIN_TOKEN) or PROFILE_SAMPLE_RATE > 0
+
+
+def check_token(value):
+  return bool(ADMIN_TOKEN) and value is not None and hmac.compare_digest(value.encode(), ADMIN_TOKEN.encode())
+
+
+# ---------------- Traces ----------------
+
+class Trace:
+  def __init__(self, method, path, forced):
+    self.id = uuid.uuid4().hex[:16]
+    self.method = method
+    self.path = path
+    self.forced = forced
+    self.started_at = datetime.now(timezone.utc)
+    self.stacks = Counter() # collapsed stack -> samples
+    self.packages = Counter() # package the sampled thread was in -> samples
+    self.samples = 0
+    self.queries = 0
+    self.query_seconds = 0.0
+    self.slow_queries = []
+    self.route = None # Filled in once the request is done
+    self.status = None
+    self.duration = 0.0
+    self._threads = set()
+    self._lock = threading.Lock()
+    self._stop = threading.Event()
+    self._sampler = None
+
+  def enter_thread(self):
+    with self._lock:
+      self._threads.add(threading.get_ident())
+
+  def leave_thread(self):
+    with self._lock:
+      self._threads.discard(threading.get_ident())
+
+  def start(self):
+    self._sampler = threading.Thread(target=self._sample_loop, name=f"profiler-{self.id}", daemon=True)
+    self._sampler.start()
+
+  def stop(self):
+    self._stop.set()
+    self._sampler.join()
+
+  def _sample_loop(self):
+    while not self._stop.wait(PROFILE_INTERVAL):
+      with self._lock:
+        threads = list(self._threads)
+      if not threads:
+        continue
+      frames = sys._current_frames()
+      for ident in threads:
+        frame = frames.get(ident)
+        if frame is not None:
+          self._record(frame)
+
+  def _record(self, frame):
+    stack = []
+    package = None
+    while frame is not None:
+      code = frame.f_code
+      stack.append(f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})")
+      if package is None:
+        package = _package_of(code.co_filename)
+      frame = frame.f_back
+    self.stacks[";".join(reversed(stack))] += 1
+    self.packages[package or "other"] += 1
+    self.samples += 1
+
+  def collapsed(self):
+    return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+  def summary(self):
+    return {
+      "id": self.id,
+      "method": self.method,
+      "path": self.path,
+      "route": self.route,
+      "status": self.status,
+      "started_at": self.started_at.isoformat(),
+      "duration_ms": round(self.duration * 1000, 2),
+      "forced": self.forced,
+      "samples": self.samples,
+      "db_queries": self.queries,
+      "db_ms": round(self.query_seconds * 1000, 2),
+      "slow_queries": len(self.slow_queries),
+    }
+
+  def detail(self):
+    total = self.samples or 1
+    return dict(
+      self.summary(),
+      interval_ms=PROFILE_INTERVAL * 1000,
+      # Where the sampled time went, by the innermost third-party package (or app module) on the stack
+      breakdown={package: round(count / total, 4) for package, count in self.packages.most_common()},
+      top_stacks=[{"stack": stack.split(";"), "samples": count} for stack, count in self.stacks.most_common(10)],
+      slow_queries=self.slow_queries,
+    )
+
+
+def _short_path(filename):
+  for marker in ("site-packages" + os.sep, "dist-packages" + os.sep):
+    if marker in filename:
+      return filename.split(marker, 1)[1]
+  if filename.startswith(APP_DIR):
+    return os.path.relpath(filename, APP_DIR)
+  return os.path.basename(filename)
+
+
+def _package_of(filename):
+  # site-packages/pydantic/main.py -> "pydantic"; main.py in this app -> "app:main"; stdlib -> None
+  for marker in ("site-packages" + os.sep, "dist-packages" + os.sep):
+    if marker in filename:
+      return filename.split(marker, 1)[1].split(os.sep, 1)[0].split(".")[0]
+  if filename.startswith(APP_DIR):
+    return "app:" + os.path.splitext(os.path.relpath(filename, APP_DIR))[0]
+  return None
+
+
+def get_trace(trace_id):
+  for trace in list(traces):
+    if trace.id == trace_id:
+      return trace
+  return None
+
+
+# ---------------- Routes ----------------
+
+class ProfiledRoute(APIRoute):
+  # Sync endpoints run on some threadpool thread; the wrapper tells the sampler which one
+  def __init__(self, path, endpoint, **kwargs):
+    if not inspect.iscoroutinefunction(endpoint):
+      endpoint = _track_thread(endpoint)
+    super().__init__(path, endpoint, **kwargs)
+
+
+def _track_thread(fn):
+  @functools.wraps(fn) # FastAPI reads the parameters through __wrapped__
+  def wrapper(*args, **kwargs):
+    trace = _current.get()
+    if trace is None:
+      return fn(*args, **kwargs)
+    trace.enter_thread()
+    try:
+      return fn(*args, **kwargs)
+    finally:
+      trace.leave_thread()
+  return wrapper
+
+
+# ---------------- Middleware ----------------
+
+class ProfilingMiddleware:
+  # Pure ASGI; passes straight through unless this request gets profiled
+  def __init__(self, app):
+    self.app = app
+
+  def _wants_profile(self, scope):
+    if ADMIN_TOKEN:
+      for name, value in scope["headers"]:
+        if name == PROFILE_HEADER:
+          return "forced" if check_token(value.decode("latin-1")) else None
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+      return "sampled"
+    return None
+
+  async def __call__(self, scope, receive, send):
+    mode = self._wants_profile(scope) if scope["type"] == "http" else None
+    if mode is None or not _active.acquire(blocking=False):
+      await self.app(scope, receive, send)
+      return
+
+    trace = Trace(scope["method"], scope["path"], forced=mode == "forced")
+    token = _current.set(trace)
+
+    async def send_with_trace_id(message):
+      if message["type"] == "http.response.start":
+        trace.status = message["status"]
+        if trace.forced:
+          message = dict(message, headers=list(message.get("headers", [])) + [(TRACE_HEADER.lower().encode(), trace.id.encode())])
+      await send(message)
+
+    started = time.perf_counter()
+    trace.start()
+    try:
+      await self.app(scope, receive, send_with_trace_id)
+    finally:
+      trace.duration = time.perf_counter() - started
+      trace.stop()
+      _current.reset(token)
+      _active.release()
+      trace.route = getattr(scope.get("route"), "path", None)
+      if trace.forced or trace.duration >= SLOW_REQUEST_SECONDS:
+        traces.append(trace)
+
+
+# ---------------- SQL ----------------
+
+_explain_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="explain")
+_explain_pending = threading.BoundedSemaphore(8)
+_explained_at = {} # statement -> time.monotonic() of its last EXPLAIN
+_explain_thread = threading.local() # Set while _explain runs, so its own statements aren't logged
+
+
+def _explain_sql(dialect_name, statement):
+  if dialect_name == "postgresql":
+    return "EXPLAIN " + statement
+  if dialect_name == "sqlite":
+    return "EXPLAIN QUERY PLAN " + statement
+  return None
+
+
+def _explain(engine, statement, parameters, entry):
+  # Plan only (no ANALYZE), so nothing is executed twice. Runs on its own pooled connection.
+  _explain_thread.active = True
+  try:
+    sql = _explain_sql(engine.dialect.name, statement)
+    if sql is None:
+      return
+    with engine.connect() as conn:
+      rows = conn.exec_driver_sql(sql, parameters).all()
+    entry["plan"] = "\n".join(" ".join(str(value) for value in row) for row in rows)
+    print("Slow Query Plan:", entry["ms"], "ms\n" + entry["statement"] + "\n" + entry["plan"])
+  except Exception as e:
+    entry["plan_error"] = repr(e)
+  finally:
+    _explain_thread.active = False
+    _explain_pending.release()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+  conn.info.setdefault("profiling_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+  seconds = time.perf_counter() - conn.info["profiling_started"].pop()
+  trace = _current.get()
+  if trace is not None:
+    trace.queries += 1
+    trace.query_seconds += seconds
+  if not SLOW_QUERY_SECONDS or seconds < SLOW_QUERY_SECONDS or getattr(_explain_thread, "active", False):
+    return
+
+  entry = {
+    "at": datetime.now(timezone.utc).isoformat(),
+    "ms": round(seconds * 1000, 2),
+    "statement": statement, # Parameters are left out: they can be user data
+    "executemany": executemany,
+    "trace": trace.id if trace is not None else None,
+    "plan": None,
+  }
+  slow_queries.append(entry)
+  if trace is not None:
+    trace.slow_queries.append(entry)
+  print("Slow Query:", entry["ms"], "ms", statement[:200].replace("\n", " "))
+
+  # EXPLAIN SELECTs only, once a minute per statement, and never queue up behind a slow database
+  if executemany or not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+    return
+  now = time.monotonic()
+  if now - _explained_at.get(statement, -EXPLAIN_EVERY_SECONDS) < EXPLAIN_EVERY_SECONDS:
+    return
+  if not _explain_pending.acquire(blocking=False):
+    return
+  _explained_at[statement] = now
+  if len(_explained_at) > 1000:
+    _explained_at.clear()
+  _explain_pool.submit(_explain, conn.engine, statement, parameters, entry)
+
+
+def _handle_error(context):
+  started = context.connection.info.get("profiling_started") if context.connection is not None else None
+  if started:
+    started.pop()
+
+
+if enabled() or SLOW_QUERY_SECONDS:
+  event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+  event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+  event.listen(Engine, "handle_error", _handle_error)
@@ -0,0 +1,233 @@
+import re
+
+
+# Ingredient quantities like "1/2 cup", "400g", "1 1/2 tbsp" or "to taste", parsed once when a
+# recipe is written into numeric columns next to the original text:
+#
+#   amount, unit            what the recipe says: 0.5, "cup"
+#   base_amount, base_unit  the same in g or ml (0.5 cup -> 118.3 ml) so amounts in different
+#                           units add up; countable units (cloves, cans) stay as they are and a
+#                           bare number is "each"
+#
+# Anything that doesn't start with a number ("to taste", "some") keeps all four as None and is
+# never scaled. Scaling and shopping-list totals work on these columns, not the text.
+
+# unit -> factor to grams / milliliters. Within each table no two units share a factor, so
+# shopping_item() can map a factor back to its unit (g and ml are both 1.0, but never mixed).
+MASS = {"mg": 0.001, "g": 1.0, "kg": 1000.0, "oz": 28.349523, "lb": 453.59237}
+VOLUME = {
+  "ml": 1.0, "l": 1000.0, "tsp": 4.928922, "tbsp": 14.786765, "fl oz": 29.573530, "cup": 236.588237,
+  "pint": 473.176473, "quart": 946.352946, "gallon": 3785.411784,
+}
+COUNTABLE = [
+  "clove", "can", "tin", "pinch", "dash", "slice", "piece", "bunch", "handful", "stick", "sprig",
+  "head", "package", "packet", "bag", "jar", "bottle", "sheet", "fillet", "cube", "large", "medium", "small",
+]
+
+# Spellings -> unit
+UNIT_NAMES = {
+  "mg": "mg", "milligram": "mg", "milligrams": "mg",
+  "g": "g", "gr": "g", "gram": "g", "grams": "g", "gramme": "g", "grammes": "g",
+  "kg": "kg", "kgs": "kg", "kilo": "kg", "kilos": "kg", "kilogram": "kg", "kilograms": "kg",
+  "oz": "oz", "ounce": "oz", "ounces": "oz",
+  "lb": "lb", "lbs": "lb", "pound": "lb", "pounds": "lb",
+  "ml": "ml", "milliliter": "ml", "milliliters": "ml", "millilitre": "ml", "millilitres": "ml",
+  "l": "l", "liter": "l", "liters": "l", "litre": "l", "litres": "l",
+  "tsp": "tsp", "tsps": "tsp", "teaspoon": "tsp", "teaspoons": "tsp",
+  "tbsp": "tbsp", "tbsps": "tbsp", "tbs": "tbsp", "tablespoon": "tbsp", "tablespoons": "tbsp",
+  "fl oz": "fl oz", "fluid ounce": "fl oz", "fluid ounces": "fl oz",
+  "cup": "cup", "cups": "cup",
+  "pint": "pint", "pints": "pint", "pt": "pint",
+  "quart": "quart", "quarts": "quart", "qt": "quart",
+  "gallon": "gallon", "gallons": "gallon", "gal": "gallon",
+}
+for _unit in COUNTABLE:
+  UNIT_NAMES[_unit] = _unit
+  UNIT_NAMES[_unit + ("es" if _unit.endswith(("ch", "sh")) else "s")] = _unit
+
+NO_PLURAL = {"mg", "g", "kg", "oz", "lb", "ml", "l", "tsp", "tbsp", "fl oz", "large", "medium", "small"}
+
+UNICODE_FRACTIONS = {"½": "1/2", "⅓": "1/3", "⅔": "2/3", "¼": "1/4", "¾": "3/4", "⅛": "1/8", "⅜": "3/8", "⅝": "5/8", "⅞": "7/8"}
+
+_NUMBER = r"\d+\s+\d+/\d+|\d+/\d+|\d*\.\d+|\d+" # Mixed fractions first, or "1 1/2" would stop at "1"
+AMOUNT_RE = re.compile(rf"^(?P<amount>{_NUMBER})(?:\s*(?:-|–|to)\s*(?P<upper>{_NUMBER}))?(?:\s*x\s*(?P<times>{_NUMBER}))?\s*", re.IGNORECASE)
+UNIT_RE = re.compile(r"^(" + "|".join(sorted((re.escape(name) for name in UNIT_NAMES), key=len, reverse=True)) + r")\.?(?![a-z])", re.IGNORECASE)
+
+
+def _number(text):
+  # "1 1/2" -> 1.5, "3/4" -> 0.75, "2.5" -> 2.5
+  total = 0.0
+  for part in text.split():
+    if "/" in part:
+      numerator, denominator = part.split("/")
+      if float(denominator) == 0:
+        raise ValueError(text)
+      total += float(numerator) / float(denominator)
+    else:
+      total += float(part)
+  return total
+
+
+def to_base(amount, unit):
+  # (base_amount, base_unit) for an amount in unit; unit None is a bare count
+  if amount is None:
+    return None, None
+  if unit in MASS:
+    return amount * MASS[unit], "g"
+  if unit in VOLUME:
+    return amount * VOLUME[unit], "ml"
+  return amount, unit or "each"
+
+
+def _split(quantity):
+  # -> (text, amount match, unit match or None, where the unit match starts), or None when
+  # there's no leading number. text keeps the original case, so what follows the unit can be
+  # carried over as written.
+  text = (quantity or "").strip()
+  for symbol, fraction in UNICODE_FRACTIONS.items():
+    text = text.replace(symbol, f" {fraction}") # "1½" -> "1 1/2"
+  text = text.strip()
+  if text.lower().startswith(("a ", "an ")): # "a pinch", "an onion"
+    text = "1 " + text.split(" ", 1)[1]
+  match = AMOUNT_RE.match(text)
+  if match is None:
+    return None
+  return text, match, UNIT_RE.match(text[match.end():]), match.end()
+
+
+def parse(quantity):
+  # -> {"amount", "unit", "base_amount", "base_unit"}, all None when there's no leading number.
+  # Ranges ("2-3 cloves") take the upper bound, so a shopping list never comes up short.
+  parts = _split(quantity)
+  if parts is None:
+    return {"amount": None, "unit": None, "base_amount": None, "base_unit": None}
+  _, match, unit_match, _ = parts
+  try:
+    if match["times"]: # "2 x 400g": two 400 g cans
+      amount = _number(match["amount"]) * _number(match["times"])
+    else:
+      amount = _number(match["upper"] or match["amount"])
+  except ValueError:
+    return {"amount": None, "unit": None, "base_amount": None, "base_unit": None}
+
+  unit = UNIT_NAMES[unit_match[1].lower()] if unit_match else None
+  base_amount, base_unit = to_base(amount, unit)
+  return {"amount": amount, "unit": unit, "base_amount": base_amount, "base_unit": base_unit}
+
+
+# ---------------- Formatting ----------------
+
+def format_amount(amount, unit=None):
+  # 1.5 -> "1 1/2" for kitchen units, 412.5 g -> "413"; fractions are halves, thirds, quarters
+  # and eighths, the ones measuring spoons and cups come in
+  if unit in ("g", "ml", "mg") or amount >= 20:
+    return f"{amount:.1f}".rstrip("0").rstrip(".") if amount < 10 else str(round(amount))
+  if unit in ("kg", "l", "lb", "oz", "fl oz"):
+    return f"{amount:.2f}".rstrip("0").rstrip(".")
+  whole = int(amount)
+  part = amount - whole
+  for denominator in (1, 2, 3, 4, 8):
+    numerator = round(part * denominator)
+    if abs(numerator / denominator - part) <= 0.02:
+      break
+  else:
+    return f"{amount:.2f}".rstrip("0").rstrip(".")
+  if numerator == denominator:
+    whole, numerator = whole + 1, 0
+  if numerator == 0:
+    return str(whole)
+  fraction = f"{numerator}/{denominator}" # Already in lowest terms: smaller denominators are tried first
+  return f"{whole} {fraction}" if whole else fraction
+
+
+def format_quantity(amount, unit, number=None):
+  # (1.5, "cup") -> "1 1/2 cups", (400, "g") -> "400g", (3, None) -> "3". number replaces the
+  # formatted amount, e.g. with a range; amount still decides the plural.
+  number = number or format_amount(amount, unit)
+  if unit is None or unit == "each":
+    return number
+  if unit in ("mg", "g", "kg", "ml"):
+    return f"{number}{unit}"
+  if amount > 1 and unit not in NO_PLURAL:
+    unit += "es" if unit.endswith(("ch", "sh")) else "s"
+  return f"{number} {unit}"
+
+
+def friendly(base_amount, base_unit):
+  # Shopping-list display: 1500 g -> (1.5, "kg"), anything else as it is
+  if base_unit == "g" and base_amount >= 1000:
+    return base_amount / 1000, "kg"
+  if base_unit == "ml" and base_amount >= 1000:
+    return base_amount / 1000, "l"
+  return base_amount, base_unit
+
+
+def scale_quantity(quantity, factor):
+  # "1 cup, chopped" x2 -> "2 cups, chopped": only the number(s) and the unit's plural change,
+  # whatever follows them is kept. Both ends of a range scale ("2-3 cloves" -> "4-6 cloves"),
+  # and "2 x 400g" scales how many, not how big. No leading number: returned as it is.
+  parts = _split(quantity)
+  if parts is None:
+    return quantity
+  text, match, unit_match, unit_start = parts
+  try:
+    lower = _number(match["amount"]) * factor
+    upper = _number(match["upper"]) * factor if match["upper"] else None
+  except ValueError:
+    return quantity
+  unit = UNIT_NAMES[unit_match[1].lower()] if unit_match and not match["times"] else None
+  number = format_amount(lower, unit)
+  if upper is not None:
+    high = format_amount(upper, unit)
+    number += f" to {high}" if " " in number + high else f"-{high}" # "1 to 1 1/2", not "1-1 1/2"
+  if match["times"]:
+    return f"{number} x {text[match.start('times'):]}"
+
+  rest = text[unit_start + unit_match.end():] if unit_match else text[match.end("upper" if upper is not None else "amount"):]
+  return format_quantity(upper if upper is not None else lower, unit, number) + rest
+
+
+def scale_recipe(recipe, servings):
+  # crud.get_recipe() dict -> the same recipe for servings people, in place. Quantities without
+  # a number ("to taste") stay as they are.
+  factor = servings / recipe["servings"]
+  recipe["servings"] = servings
+  if factor == 1:
+    return recipe
+  for ingredient in recipe["ingredients"]:
+    if ingredient["amount"] is not None:
+      ingredient["amount"] = round(ingredient["amount"] * factor, 4)
+      ingredient["quantity"] = scale_quantity(ingredient["quantity"], factor)
+  return recipe
+
+
+def shopping_item(row):
+  # One crud.shopping_list() group -> a schemas.ShoppingListItem dict. Totals stay in the
+  # recipes' own unit when they all used the same one, otherwise they're shown in g/kg or ml/l.
+  if row.base_unit is None:
+    return {"ingredient": row.ingredient, "amount": None, "unit": None, "quantity": row.quantity, "recipes": row.recipes}
+  if row.all_have_unit and row.unit == row.max_unit:
+    amount, unit = row.amount, row.unit
+  elif row.base_unit in ("g", "ml"):
+    # Mixed units: in the largest one any of the recipes used (1 cup + 2 tbsp -> 1 1/8 cups)
+    units = MASS if row.base_unit == "g" else VOLUME
+    unit = next((name for name, factor in units.items() if row.largest_factor and abs(factor - row.largest_factor) < 1e-6), row.base_unit)
+    amount, unit = friendly(row.base_amount / units[unit], unit)
+  else:
+    amount, unit = row.base_amount, row.base_unit
+  unit = None if unit == "each" else unit
+  return {"ingredient": row.ingredient, "amount": round(amount, 3), "unit": unit, "quantity": format_quantity(amount, unit), "recipes": row.recipes}
+
+
+# ---------------- Backfill ----------------
+
+def backfill(db):
+  # Parses every distinct quantity string once and rewrites the ingredients table in one UPDATE
+  import database_models
+  from sqlalchemy import select, distinct
+  table = database_models.Ingredient.__table__
+  quantities = db.scalars(select(distinct(table.c.quantity))).all()
+  if not quantities:
+    return 0
+  lookup = [dict(parse(quantity), quantity=quantity) for quantity in quantities]
+  return database_models.update_from_lookup(db.connection(), table, "quantity", lookup)
@@ -0,0 +1,28 @@
+from sqlalchemy import event
+
+
+class QueryCounter:
+  # Records every SQL statement an engine sends while the block runs:
+  #
+  #   with QueryCounter(engine) as counter:
+  #     client.get("/recipes/1")
+  #   assert counter.count <= 1, counter.statements
+  def __init__(self, engine):
+    self.engine = engine
+    self.statements = []
+
+  def _record(self, conn, cursor, statement, parameters, context, executemany):
+    self.statements.append(statement)
+
+  @property
+  def count(self):
+    return len(self.statements)
+
+  def __enter__(self):
+    self.statements = []
+    event.listen(self.engine, "before_cursor_execute", self._record)
+    return self
+
+  def __exit__(self, *exc):
+    event.remove(self.engine, "before_cursor_execute", self._record)
+    return False
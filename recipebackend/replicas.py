@@ -0,0 +1,151 @@
+import itertools
+import os
+import threading
+import time
+from http.cookies import SimpleCookie
+from sqlalchemy import exc, text
+from database import SessionLocal, engine as primary_engine, make_engine
+import crud
+
+
+# Read-replica routing. GET routes take their session from read_session(): it goes to one of
+# DATABASE_REPLICA_URLS (comma-separated, round robin) and everything else to the primary.
+#
+# - A replica whose connection fails is skipped for REPLICA_RETRY_SECONDS and the read falls
+#   through to the next replica, then the primary.
+# - After a client writes, StickyPrimaryMiddleware sets a short-lived cookie and that client's
+#   reads go to the primary until it expires, so it always sees its own writes despite
+#   replication lag.
+# - Other clients can still read a lagging replica; the routes only cache a replica read once
+#   it has caught up with the primary's catalog version (see is_current).
+#
+# With no replica URLs set, every read uses the primary and none of this costs anything.
+
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", "30"))
+
+# Longer than the worst replication lag you expect
+STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", "10"))
+
+STICKY_COOKIE = "rv_read_primary"
+
+
+class ReplicaSet:
+  def __init__(self, urls):
+    self.engines = [make_engine(url) for url in urls]
+    self._down_until = {} # id(engine) -> monotonic time it may be tried again
+    self._turn = itertools.count()
+    self._lock = threading.Lock()
+
+  def __bool__(self):
+    return bool(self.engines)
+
+  def candidates(self):
+    # Healthy replicas in round-robin order; a failed one is retried once its cool-down is over
+    if not self.engines:
+      return []
+    start = next(self._turn) % len(self.engines)
+    order = self.engines[start:] + self.engines[:start]
+    now = time.monotonic()
+    with self._lock:
+      return [engine for engine in order if self._down_until.get(id(engine), 0) <= now]
+
+  def mark_down(self, engine, error):
+    print("Replica Unavailable:", engine.url.render_as_string(hide_password=True), repr(error))
+    with self._lock:
+      self._down_until[id(engine)] = time.monotonic() + REPLICA_RETRY_SECONDS
+
+  def stats(self):
+    now = time.monotonic()
+    with self._lock:
+      return [
+        {
+          "url": engine.url.render_as_string(hide_password=True),
+          "healthy": self._down_until.get(id(engine), 0) <= now,
+          "pool": engine.pool_metrics.snapshot(engine.pool),
+        }
+        for engine in self.engines
+      ]
+
+
+replica_set = ReplicaSet([url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()])
+
+
+def _open(engine, snapshot):
+  if snapshot and engine.dialect.name == "postgresql":
+    # The isolation level is applied when the connection is checked out. Asking for it on a
+    # session that already has a connection is silently ignored, so it has to be set here.
+    engine = engine.execution_options(isolation_level="REPEATABLE READ")
+  return SessionLocal(bind=engine)
+
+
+def _begin_snapshot(db):
+  # SQLite: pysqlite runs SELECTs outside any transaction, so start one explicitly. The first
+  # read fixes the snapshot until the session is closed.
+  if db.get_bind().dialect.name == "sqlite":
+    db.execute(text("BEGIN"))
+  return db
+
+
+def read_session(prefer_primary=False, snapshot=False):
+  # A session for read-only work. db.info["replica"] says where it ended up.
+  # snapshot=True: every query in the session sees the same committed state (REPEATABLE READ
+  # on Postgres, one read transaction on SQLite), for reads that span several statements.
+  if not prefer_primary:
+    for engine in replica_set.candidates():
+      db = _open(engine, snapshot)
+      db.info["replica"] = True
+      try:
+        db.connection() # Checks out (and pre-pings) now, so a dead replica is caught before the route runs
+        return _begin_snapshot(db) if snapshot else db
+      except exc.DBAPIError as e:
+        db.close()
+        replica_set.mark_down(engine, e)
+  db = _open(primary_engine, snapshot)
+  return _begin_snapshot(db) if snapshot else db
+
+
+def is_current(db, catalog_version):
+  # True unless db is a replica that hasn't replayed the primary's latest write yet
+  if not db.info.get("replica"):
+    return True
+  with SessionLocal() as primary:
+    return crud.get_catalog_state(primary).version <= catalog_version
+
+
+def wants_primary(request):
+  try:
+    return int(request.cookies.get(STICKY_COOKIE, "0")) > time.time()
+  except ValueError:
+    return False
+
+
+class StickyPrimaryMiddleware:
+  # Pure ASGI: tags the response to every successful write with the read-your-writes cookie
+  WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+  def __init__(self, app):
+    self.app = app
+
+  async def __call__(self, scope, receive, send):
+    if scope["type"] != "http" or scope["method"] not in self.WRITE_METHODS or not replica_set:
+      await self.app(scope, receive, send)
+      return
+
+    async def send_with_cookie(message):
+      if message["type"] == "http.response.start" and message["status"] < 400:
+        cookie = SimpleCookie()
+        cookie[STICKY_COOKIE] = str(int(time.time()) + STICKY_SECONDS)
+        cookie[STICKY_COOKIE]["max-age"] = STICKY_SECONDS
+        cookie[STICKY_COOKIE]["path"] = "/"
+        cookie[STICKY_COOKIE]["httponly"] = True
+        if scope.get("scheme") == "https":
+          # The frontend lives on another site, so the cookie has to be sent cross-site
+          cookie[STICKY_COOKIE]["samesite"] = "None"
+          cookie[STICKY_COOKIE]["secure"] = True
+        else:
+          cookie[STICKY_COOKIE]["samesite"] = "Lax"
+        header = cookie.output(header="").strip().encode("latin-1")
+        message = dict(message, headers=list(message.get("headers", [])) + [(b"set-cookie", header)])
+      await send(message)
+
+    await self.app(scope, receive, send_with_cookie)
@@ -1,14 +1,32 @@
-from pydantic import BaseModel, HttpUrl
+from pydantic import BaseModel, HttpUrl, ConfigDict, Field
 from enum import Enum
-from datetime import date
-from typing import Optional
+from datetime import date, datetime
+from typing import Optional, Union, Literal, Annotated
 
 
 class IngredientItem(BaseModel):
+  model_config = ConfigDict(from_attributes=True) # Lets the API build these straight from ORM rows
   name: str
   quantity: str
 
 
+# An ingredient as the API returns it: quantity plus what the server parsed out of it
+# ("1/2 cup" -> 0.5, "cup"). Both None when quantity has no number, like "to taste".
+# Sent back in a PUT body, amount and unit are ignored and parsed again from quantity.
+class IngredientLine(IngredientItem):
+  amount: Optional[float] = None
+  unit: Optional[str] = None
+
+
+# One resized copy of a recipe image, in every format the server could encode
+class ImageVariant(BaseModel):
+  width: int
+  height: int
+  jpeg: str
+  webp: Optional[str] = None
+  avif: Optional[str] = None
+
+
 class Difficulty(str, Enum): # Never use BaseModel with enum but str because that's easier for fastapi to return JSON
   EASY = "easy"
   MEDIUM = "medium"
@@ -27,10 +45,11 @@ class Category(str, Enum):
 
 # This is the recipe schema
 class Recipe(BaseModel):
+  model_config = ConfigDict(from_attributes=True)
   id: int
   title: str
   description: str
-  ingredients: list[IngredientItem] # Nested Model
+  ingredients: list[IngredientLine] # Nested Model
   instructions: list[str]
   prep_time: int
   cook_time: int
@@ -38,6 +57,7 @@ class Recipe(BaseModel):
   difficulty: Difficulty # Since we are picking one item from Difficulty class
   category: Category
   image_url: Optional[HttpUrl] = None
+  image_variants: Optional[dict[str, ImageVariant]] = None # thumb/card/detail, set by the upload pipeline
   rating: int       
   created_at: date
   updated_at: date
@@ -57,6 +77,167 @@ class RecipeCreate(BaseModel):
   rating: int
 
 
+# PATCH /recipes/{id}: only the fields that are sent change. ingredients, when sent, is the
+# whole new list (diffed against the stored one); image_url may be null to remove the image.
+class RecipeUpdate(BaseModel):
+  title: Optional[str] = None
+  description: Optional[str] = None
+  ingredients: Optional[list[IngredientItem]] = None
+  instructions: Optional[list[str]] = None
+  prep_time: Optional[int] = None
+  cook_time: Optional[int] = None
+  servings: Optional[int] = None
+  difficulty: Optional[Difficulty] = None
+  category: Optional[Category] = None
+  image_url: Optional[HttpUrl] = None
+  rating: Optional[int] = None
+
+
+# One record of a bulk import. created_at/updated_at are optional so exported recipes keep
+# their dates when they are loaded back in; the database fills them in otherwise.
+class RecipeImport(RecipeCreate):
+  created_at: Optional[date] = None
+  updated_at: Optional[date] = None
+
+
+
+
+# Lightweight listing view: only the fields RecipeCard.tsx renders, no ingredients or instructions
+class RecipeCard(BaseModel):
+  model_config = ConfigDict(from_attributes=True)
+  id: int
+  title: str
+  description: str
+  prep_time: int
+  cook_time: int
+  servings: int
+  difficulty: Difficulty
+  category: Category
+  image_url: Optional[HttpUrl] = None
+  image_variants: Optional[dict[str, ImageVariant]] = None
+  rating: int
+
+
+# A GET /recipes/search hit, best match first
+class RecipeSearchResult(RecipeCard):
+  rank: float
+
+
+# A GET /recipes/pantry hit: the recipe's own ingredient lines, split by whether the pantry has them
+class PantryMatch(RecipeCard):
+  matched: list[str]
+  missing: list[str]
+
+
+# One line of GET /recipes/shopping-list: an ingredient's scaled total across the recipes.
+# amount/unit are None (and quantity is the recipe's own text) for quantities like "to taste".
+class ShoppingListItem(BaseModel):
+  ingredient: str
+  amount: Optional[float] = None
+  unit: Optional[str] = None
+  quantity: str # amount and unit formatted, e.g. "1 1/2 cups"
+  recipes: int # How many of the recipes use it
+
+
+# GET /recipes/facets: how many recipes have each filter value. Every value is listed, 0 or not;
+# rating is whole stars and total_time is prep_time + cook_time in minutes, bucketed.
+class RecipeFacets(BaseModel):
+  total: int
+  category: dict[str, int]
+  difficulty: dict[str, int]
+  rating: dict[str, int] # "0" to "5"
+  total_time: dict[str, int] # "under-15", "15-30", "30-60", "60-120", "120+"
+
+
+# Response body for POST and PUT /recipes
+class RecipeWriteResponse(BaseModel):
+  message: str
+  recipe: Recipe
+
+
+# POST /recipes/batch operations. version works like If-Match on PUT/DELETE: the operation
+# fails with 412 if the recipe has been written since the client read that version.
+class BatchCreate(BaseModel):
+  op: Literal["create"]
+  recipe: RecipeCreate
+
+
+class BatchUpdate(BaseModel):
+  op: Literal["update"]
+  id: int
+  recipe: RecipeCreate # A full replacement, like PUT
+  version: Optional[int] = None
+
+
+class BatchDelete(BaseModel):
+  op: Literal["delete"]
+  id: int
+  version: Optional[int] = None
+
+
+BatchOperation = Annotated[Union[BatchCreate, BatchUpdate, BatchDelete], Field(discriminator="op")]
+
+
+class BatchRequest(BaseModel):
+  operations: list[BatchOperation] = Field(..., min_length=1, max_length=100)
+  atomic: bool = False # All or nothing: if any operation fails, none of them are committed
+
+
+# The outcome of one operation, in request order. status is what the single-recipe endpoint
+# would have answered (200, 404, 412 or 500), or 424 for one rolled back with an atomic batch.
+# version and recipe are set for successful creates and updates.
+class BatchResult(BaseModel):
+  index: int
+  op: str
+  id: Optional[int] = None
+  status: int
+  version: Optional[int] = None
+  recipe: Optional[Recipe] = None
+  error: Optional[str] = None
+
+
+# Response body for POST /recipes/batch
+class BatchResponse(BaseModel):
+  committed: bool # False when atomic and something failed
+  results: list[BatchResult]
+
+
+# A record that couldn't be imported; row is the NDJSON line / CSV line number
+class ImportRowError(BaseModel):
+  row: int
+  error: str
+
+
+# Response body for POST /recipes/import
+class ImportReport(BaseModel):
+  inserted: int
+  failed: int
+  errors: list[ImportRowError] # Capped at bulk_import.MAX_REPORTED_ERRORS; failed has the full count
+
+
+# POST /recipes/{id}/image response and GET /uploads/{job_id} body
+class UploadJobStatus(BaseModel):
+  id: str
+  recipe_id: int
+  status: Literal["queued", "processing", "uploading", "done", "failed"] # queued -> processing -> uploading -> done | failed
+  attempts: int
+  image_url: Optional[str] = None # Set once status is done
+  error: Optional[str] = None
+  created_at: datetime
+  updated_at: datetime
+
+
+# Response body for DELETE /recipes/{id}
+class MessageResponse(BaseModel):
+  message: str
+
+
+# One page of GET /recipes?limit=...; pass next_cursor back as ?after= to get the next page
+class RecipePage(BaseModel):
+  items: list[Union[Recipe, RecipeCard]]
+  next_cursor: Optional[str] = None
+
+
 
 
 # No longer needed
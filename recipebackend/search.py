@@ -0,0 +1,303 @@
+import bisect
+import re
+import threading
+from sqlalchemy import event, func, select, update
+from sqlalchemy.orm import Session
+import database_models
+import crud
+
+
+# Postgres text search config used for both indexing and querying
+SEARCH_CONFIG = "english"
+
+# Same relative weights Postgres uses for A/B/C labels, so both engines rank alike
+FIELD_WEIGHTS = {"title": 1.0, "description": 0.4, "ingredients": 0.2}
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Search hits come back as cards, ranked
+RESULT_COLUMNS = [column for column in crud.CARD_COLUMNS if column.key != "created_at"]
+
+
+def tokenize(text):
+  return TOKEN_RE.findall((text or "").lower())
+
+
+def uses_postgres(db: Session):
+  return db.get_bind().dialect.name == "postgresql"
+
+
+# ---------------- Postgres: tsvector column + GIN index ----------------
+
+def search_vector_expression():
+  # title (A) + description (B) + aggregated ingredient names (C). A generated column can't
+  # read the ingredients table, so the vector is written by the app whenever a recipe changes.
+  Recipe = database_models.Recipe
+  Ingredient = database_models.Ingredient
+  ingredient_names = (
+    select(func.string_agg(Ingredient.name, " "))
+    .where(Ingredient.recipe_id == Recipe.id)
+    .scalar_subquery()
+  )
+
+  def weighted(value, label):
+    return func.setweight(func.to_tsvector(SEARCH_CONFIG, func.coalesce(value, "")), label)
+
+  return (
+    weighted(Recipe.title, "A")
+    .op("||")(weighted(Recipe.description, "B"))
+    .op("||")(weighted(ingredient_names, "C"))
+  )
+
+
+def build_tsquery(q):
+  # Every word must match; the last-typed word is usually partial, so all of them are prefixes
+  tokens = tokenize(q)
+  if not tokens:
+    return None
+  return " & ".join(f"{token}:*" for token in tokens)
+
+
+def _search_postgres(db: Session, q, limit):
+  Recipe = database_models.Recipe
+  tsquery = build_tsquery(q)
+  if tsquery is None:
+    return []
+  query = func.to_tsquery(SEARCH_CONFIG, tsquery)
+  rank = func.ts_rank_cd(Recipe.search_vector, query).label("rank")
+
+  rows = db.execute(
+    select(*RESULT_COLUMNS, rank)
+    .where(Recipe.search_vector.op("@@")(query))
+    .order_by(rank.desc(), Recipe.id)
+    .limit(limit)
+  )
+  return [row._asdict() for row in rows]
+
+
+# ---------------- Fallback: in-process inverted index (SQLite etc.) ----------------
+
+class InvertedIndex:
+  # token -> {recipe_id: weight}, with a sorted term list so prefixes resolve with bisect
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._postings = {}
+    self._terms = []
+    self._doc_terms = {}
+    self.versions = {} # recipe_id -> recipes.version it was loaded at
+    self.catalog_version = None # catalog_state.version the index is in step with
+
+  def add(self, recipe_id, title, description, ingredient_names):
+    fields = {
+      "title": tokenize(title),
+      "description": tokenize(description),
+      "ingredients": tokenize(" ".join(ingredient_names)),
+    }
+    weights = {}
+    for field, tokens in fields.items():
+      for token in tokens:
+        weights[token] = weights.get(token, 0.0) + FIELD_WEIGHTS[field]
+
+    with self._lock:
+      self._remove(recipe_id)
+      for token, weight in weights.items():
+        postings = self._postings.get(token)
+        if postings is None:
+          postings = self._postings[token] = {}
+          bisect.insort(self._terms, token)
+        postings[recipe_id] = weight
+      self._doc_terms[recipe_id] = list(weights)
+
+  def remove(self, recipe_id):
+    with self._lock:
+      self._remove(recipe_id)
+
+  def _remove(self, recipe_id):
+    for token in self._doc_terms.pop(recipe_id, []):
+      postings = self._postings.get(token)
+      if postings is None:
+        continue
+      postings.pop(recipe_id, None)
+      if not postings:
+        del self._postings[token]
+        self._terms.pop(bisect.bisect_left(self._terms, token))
+
+  def _prefix_matches(self, prefix):
+    # Best weight per recipe across every term starting with prefix
+    matches = {}
+    start = bisect.bisect_left(self._terms, prefix)
+    for term in self._terms[start:]:
+      if not term.startswith(prefix):
+        break
+      for recipe_id, weight in self._postings[term].items():
+        if weight > matches.get(recipe_id, 0.0):
+          matches[recipe_id] = weight
+    return matches
+
+  def search(self, q, limit):
+    tokens = tokenize(q)
+    if not tokens:
+      return []
+    with self._lock:
+      scores = None
+      for token in tokens:
+        matches = self._prefix_matches(token)
+        if scores is None:
+          scores = matches
+        else:
+          scores = {rid: scores[rid] + w for rid, w in matches.items() if rid in scores}
+        if not scores:
+          return []
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    return ranked[:limit]
+
+  def __len__(self):
+    return len(self._doc_terms)
+
+
+# The fallback index lives in each process, but other workers, CLI imports and upload_images.py
+# write to the same database. Every write bumps catalog_state.version (crud.touch_catalog), so
+# the index remembers which version it reflects. A search that finds the catalog has moved on
+# re-reads every recipe's (id, version) and reloads only the recipes that changed. This
+# process's own writes are loaded right after their commit (never before, so a rolled-back
+# write can't leave hits behind), and if nobody else wrote in between, that's all it takes.
+
+_fallback_index = None
+_fallback_lock = threading.Lock() # Held while building, syncing or applying a commit
+
+# Recipes loaded per statement while syncing
+SYNC_CHUNK = 500
+
+PENDING_KEY = "search_pending" # session.info key: {recipe_id: removed?} to apply after commit
+
+
+def _load_fallback(db, recipe_ids=None):
+  Recipe = database_models.Recipe
+  Ingredient = database_models.Ingredient
+
+  recipes = select(Recipe.id, Recipe.title, Recipe.description, Recipe.version)
+  ingredients = select(Ingredient.recipe_id, Ingredient.name)
+  if recipe_ids is not None:
+    recipes = recipes.where(Recipe.id.in_(recipe_ids))
+    ingredients = ingredients.where(Ingredient.recipe_id.in_(recipe_ids))
+
+  names = {}
+  for recipe_id, name in db.execute(ingredients):
+    names.setdefault(recipe_id, []).append(name)
+  found = set()
+  for recipe_id, title, description, version in db.execute(recipes):
+    _fallback_index.add(recipe_id, title, description, names.get(recipe_id, []))
+    _fallback_index.versions[recipe_id] = version
+    found.add(recipe_id)
+  for recipe_id in set(recipe_ids or ()) - found: # Deleted since
+    _fallback_index.remove(recipe_id)
+    _fallback_index.versions.pop(recipe_id, None)
+
+
+def _catalog_version(db):
+  CatalogState = database_models.CatalogState
+  return db.execute(select(CatalogState.version).where(CatalogState.id == 1)).scalar_one()
+
+
+def _sync_fallback(db, catalog_version):
+  # Caller holds _fallback_lock. Reloads what changed since the index was last in step with
+  # the database. catalog_version is read before the scan, so a write that lands during it
+  # is picked up by the next search.
+  Recipe = database_models.Recipe
+  current = dict(db.execute(select(Recipe.id, Recipe.version)).all())
+  known = _fallback_index.versions
+  for recipe_id in set(known) - set(current):
+    _fallback_index.remove(recipe_id)
+    del known[recipe_id]
+  changed = sorted(recipe_id for recipe_id, version in current.items() if known.get(recipe_id) != version)
+  for i in range(0, len(changed), SYNC_CHUNK):
+    _load_fallback(db, changed[i:i + SYNC_CHUNK])
+  _fallback_index.catalog_version = catalog_version
+
+
+def _get_fallback(db: Session):
+  global _fallback_index
+  catalog_version = _catalog_version(db)
+  if _fallback_index is not None and _fallback_index.catalog_version == catalog_version:
+    return _fallback_index
+  conn = db.connection() # Plain Core rows: half the cost of ORM ones for the full scans below
+  with _fallback_lock:
+    if _fallback_index is None:
+      _fallback_index = InvertedIndex()
+      _load_fallback(conn)
+      _fallback_index.catalog_version = catalog_version
+    elif _fallback_index.catalog_version != catalog_version:
+      _sync_fallback(conn, catalog_version)
+  return _fallback_index
+
+
+def _search_fallback(db: Session, q, limit):
+  ranked = _get_fallback(db).search(q, limit)
+  if not ranked:
+    return []
+  Recipe = database_models.Recipe
+  rows = db.execute(select(*RESULT_COLUMNS).where(Recipe.id.in_([rid for rid, _ in ranked])))
+  by_id = {row.id: row._asdict() for row in rows}
+  return [dict(by_id[rid], rank=score) for rid, score in ranked if rid in by_id]
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_committed(session):
+  pending = session.info.pop(PENDING_KEY, None)
+  committed_version = session.info.pop("catalog_version", None) # Set by crud.touch_catalog
+  if not pending or _fallback_index is None:
+    return
+  reload = sorted(recipe_id for recipe_id, removed in pending.items() if not removed)
+  with _fallback_lock:
+    for recipe_id, removed in pending.items():
+      if removed:
+        _fallback_index.remove(recipe_id)
+        _fallback_index.versions.pop(recipe_id, None)
+    if reload:
+      # The session can't run SQL any more at this point, so the rows are read on a
+      # connection of their own
+      with session.get_bind().connect() as conn:
+        _load_fallback(conn, reload)
+    if committed_version is not None and _fallback_index.catalog_version == committed_version - 1:
+      _fallback_index.catalog_version = committed_version # Nobody else wrote in between, so no sync needed
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending(session):
+  # A dropped write never advances the index's catalog version, so if anything did reach the
+  # database the next search syncs it
+  session.info.pop(PENDING_KEY, None)
+  session.info.pop("catalog_version", None)
+
+
+# ---------------- Public API ----------------
+
+def index_recipes(db: Session, recipe_ids=None, only_missing=False):
+  # Call after a recipe or its ingredients change (inside the same transaction)
+  if recipe_ids is not None and not recipe_ids:
+    return
+  Recipe = database_models.Recipe
+  if uses_postgres(db):
+    # updated_at is pinned so that re-indexing doesn't fire its onupdate
+    stmt = update(Recipe).values(search_vector=search_vector_expression(), updated_at=Recipe.updated_at)
+    if recipe_ids is not None:
+      stmt = stmt.where(Recipe.id.in_(recipe_ids))
+    if only_missing:
+      stmt = stmt.where(Recipe.search_vector.is_(None))
+    db.execute(stmt.execution_options(synchronize_session=False))
+  elif _fallback_index is not None and recipe_ids is not None:
+    # Not built yet means the first search will load everything anyway. Without ids, the
+    # catalog version check at the next search finds whatever changed.
+    db.info.setdefault(PENDING_KEY, {}).update(dict.fromkeys(recipe_ids, False))
+
+
+def unindex_recipes(db: Session, recipe_ids):
+  # Postgres drops the vector with the row; only the fallback needs telling (after commit)
+  if not uses_postgres(db) and _fallback_index is not None:
+    db.info.setdefault(PENDING_KEY, {}).update(dict.fromkeys(recipe_ids, True))
+
+
+def search_recipes(db: Session, q, limit=20):
+  if uses_postgres(db):
+    return _search_postgres(db, q, limit)
+  return _search_fallback(db, q, limit)
@@ -0,0 +1,350 @@
+from datetime import date
+
+
+# Demo catalog loaded into an empty database by the "seed" migration (migrations.py). Plain dicts:
+# they're validated (as schemas.RecipeImport) only when the seed actually runs, not on every import.
+# The ids are only for reference; the database assigns its own.
+
+SEED_RECIPES = [
+  dict(
+    id=1,
+    title="Jollof Rice",
+    description="Nigerian Jollof, the Best in Africa",
+    ingredients=[
+      dict(name="Rice", quantity="2 cups"),
+      dict(name="Tomatoes", quantity="4"),
+      dict(name="Onions", quantity="2"),
+      dict(name="Red Bell Pepper", quantity="2"),
+      dict(name="Tomato Paste", quantity="3 tbsp"),
+      dict(name="Chicken Broth", quantity="4 cups"),
+      dict(name="Butter", quantity="4 tbsp"),
+    ],
+    instructions=[
+      "Heat butter and sauté onions.",
+      "Add tomato paste and cook for 2 mins.",
+      "Add blended tomatoes and peppers, simmer for 10 mins.",
+      "Add rice and broth, bring to boil.",
+      "Reduce heat and cook covered for 20 mins until rice is tender and liquid is absorbed."
+    ],
+    prep_time=15,
+    cook_time=30,
+    servings=4,
+    difficulty="medium",
+    category="lunch",
+    image_url="https://res.cloudinary.com/dfzpvawqz/image/upload/v1769474548/recipe_vault/jzbji0eyw0gribm0mcpk.jpg",
+    rating=5,
+    created_at=date(2024, 1, 15),
+    updated_at=date(2024, 1, 20),
+  ),
+  dict(
+    id=2,
+    title="Pancakes",
+    description="Fluffy breakfast pancakes",
+    ingredients=[
+      dict(name="All-Purpose Flour", quantity="2 cups"),
+      dict(name="Eggs", quantity="2"),
+      dict(name="Milk", quantity="1.5 cups"),
+      dict(name="Baking Powder", quantity="2 tsp"),
+      dict(name="Salt", quantity="1/2 tsp"),
+      dict(name="Sugar", quantity="2 tbsp"),
+      dict(name="Butter", quantity="3 tbsp"),
+    ],
+    instructions=[
+      "Mix flour, baking powder, salt, and sugar.",
+      "Beat eggs and mix with milk and melted butter.",
+      "Combine wet and dry ingredients until just blended.",
+      "Pour 1/4 cup batter per pancake onto greased griddle.",
+      "Cook 2-3 mins per side until golden."
+    ],
+    prep_time=10,
+    cook_time=15,
+    servings=3,
+    difficulty="easy",
+    category="breakfast",
+    image_url="https://res.cloudinary.com/dfzpvawqz/image/upload/v1769474549/recipe_vault/mfijkaw2afjloqkro93i.jpg",
+    rating=4,
+    created_at=date(2024, 1, 10),
+    updated_at=date(2024, 1, 18),
+  ),
+  dict(
+    id=3,
+    title="Grilled Chicken",
+    description="Seasoned grilled chicken breast",
+    ingredients=[
+      dict(name="Chicken Breast", quantity="500g"),
+      dict(name="Garlic", quantity="4 cloves"),
+      dict(name="Olive Oil", quantity="3 tbsp"),
+      dict(name="Lemon Juice", quantity="2 tbsp"),
+      dict(name="Salt", quantity="to taste"),
+      dict(name="Black Pepper", quantity="to taste"),
+      dict(name="Thyme", quantity="1 tsp"),
+    ],
+    instructions=[
+      "Mix olive oil, minced garlic, lemon juice, and herbs.",
+      "Coat chicken breasts with marinade and let sit 30 mins.",
+      "Preheat grill to medium-high.",
+      "Grill for 6-7 mins per side until internal temperature reaches 165°F."
+    ],
+    prep_time=35,
+    cook_time=15,
+    servings=2,
+    difficulty="easy",
+    category="dinner",
+    image_url="https://res.cloudinary.com/dfzpvawqz/image/upload/v1769474547/recipe_vault/jh2x413fo4rcjfebwg75.jpg",
+    rating=4,
+    created_at=date(2024, 1, 12),
+    updated_at=date(2024, 1, 19),
+  ),
+  dict(
+    id=4,
+    title="Chocolate Cake",
+    description="Rich chocolate dessert",
+    ingredients=[
+      dict(name="All-Purpose Flour", quantity="2 cups"),
+      dict(name="Cocoa Powder", quantity="3/4 cup"),
+      dict(name="Sugar", quantity="2 cups"),
+      dict(name="Eggs", quantity="2"),
+      dict(name="Butter", quantity="1/2 cup"),
+      dict(name="Milk", quantity="1 cup"),
+      dict(name="Baking Powder", quantity="1.5 tsp"),
+      dict(name="Vanilla Extract", quantity="1 tsp"),
+    ],
+    instructions=[
+      "Cream butter and sugar.",
+      "Add eggs one at a time.",
+      "Mix flour, cocoa, and baking powder.",
+      "Alternate adding dry ingredients and milk.",
+      "Stir in vanilla.",
+      "Pour into greased 9-inch pan.",
+      "Bake at 350°F for 35-40 minutes until toothpick comes out clean."
+    ],
+    prep_time=20,
+    cook_time=40,
+    servings=8,
+    difficulty="medium",
+    category="desert",
+    image_url="https://res.cloudinary.com/dfzpvawqz/image/upload/v1769474546/recipe_vault/tyddy7bpmaoy7grzezss.jpg",
+    rating=5,
+    created_at=date(2024, 1, 5),
+    updated_at=date(2024, 1, 17),
+  ),
+  dict(
+    id=5,
+    title="Vegetable Stir Fry",
+    description="Quick Asian-inspired vegetables",
+    ingredients=[
+      dict(name="Broccoli", quantity="2 cups"),
+      dict(name="Bell Peppers", quantity="2"),
+      dict(name="Carrots", quantity="2"),
+      dict(name="Soy Sauce", quantity="3 tbsp"),
+      dict(name="Garlic", quantity="3 cloves"),
+      dict(name="Ginger", quantity="1 tbsp"),
+      dict(name="Vegetable Oil", quantity="2 tbsp"),
+      dict(name="Sesame Oil", quantity="1 tsp"),
+    ],
+    instructions=[
+      "Heat oil in wok over high heat.",
+      "Add garlic and ginger, cook 30 seconds.",
+      "Add broccoli and carrots, stir fry 4-5 mins.",
+      "Add peppers and soy sauce, cook 3 more minutes until vegetables are tender-crisp.",
+      "Drizzle with sesame oil and serve."
+    ],
+    prep_time=15,
+    cook_time=10,
+    servings=3,
+    difficulty="easy",
+    category="lunch",
+    image_url="https://res.cloudinary.com/dfzpvawqz/image/upload/v1769474552/recipe_vault/aq9nfrgmjev3mt2ecmgp.jpg",
+    rating=4,
+    created_at=date(2024, 1, 14),
+    updated_at=date(2024, 1, 19),
+  ),
+  dict(
+    id=6,
+    title="Smoothie Bowl",
+    description="Nutritious breakfast bowl",
+    ingredients=[
+      dict(name="Greek Yogurt", quantity="1 cup"),
+      dict(name="Frozen Berries", quantity="1.5 cups"),
+      dict(name="Banana", quantity="1"),
+      dict(name="Honey", quantity="1 tbsp"),
+      dict(name="Granola", quantity="1/2 cup"),
+      dict(name="Coconut Flakes", quantity="2 tbsp"),
+      dict(name="Almond Butter", quantity="1 tbsp"),
+    ],
+    instructions=[
+      "Blend yogurt, frozen berries, banana, and honey until smooth.",
+      "Pour into bowl.",
+      "Top with granola, coconut flakes, and almond butter.",
+      "Serve immediately."
+    ],
+    prep_time=5,
+    cook_time=0,
+    servings=1,
+    difficulty="easy",
+    category="breakfast",
+    image_url="https://res.cloudinary.com/dfzpvawqz/image/upload/v1769474551/recipe_vault/jthfpd1zieyvanlqpzbv.jpg",
+    rating=4,
+    created_at=date(2024, 1, 8),
+    updated_at=date(2024, 1, 18),
+  ),
+  dict(
+    id=7,
+    title="Pasta Carbonara",
+    description="Classic Italian pasta",
+    ingredients=[
+      dict(name="Spaghetti", quantity="400g"),
+      dict(name="Bacon", quantity="200g"),
+      dict(name="Eggs", quantity="3"),
+      dict(name="Parmesan Cheese", quantity="1 cup"),
+      dict(name="Black Pepper", quantity="1 tsp"),
+      dict(name="Salt", quantity="to taste"),
+    ],
+    instructions=[
+      "Cook pasta in salted boiling water.",
+      "Fry bacon until crispy, set aside.",
+      "Whisk eggs with grated Parmesan and black pepper.",
+      "Drain pasta, reserving 1 cup pasta water.",
+      "Toss hot pasta with bacon.",
+      "Remove from heat and add egg mixture, stirring quickly.",
+      "Add pasta water as needed for creamy sauce.",
+      "Serve immediately."
+    ],
+    prep_time=10,
+    cook_time=12,
+    servings=4,
+    difficulty="medium",
+    category="dinner",
+    image_url="https://res.cloudinary.com/dfzpvawqz/image/upload/v1769474545/recipe_vault/kinjrjgo6n87mnrhzr1b.jpg",
+    rating=5,
+    created_at=date(2024, 1, 11),
+    updated_at=date(2024, 1, 19),
+  ),
+  dict(
+    id=8,
+    title="Lemonade",
+    description="Refreshing homemade lemonade",
+    ingredients=[
+      dict(name="Fresh Lemons", quantity="5"),
+      dict(name="Sugar", quantity="1 cup"),
+      dict(name="Water", quantity="6 cups"),
+      dict(name="Ice", quantity="as needed"),
+      dict(name="Salt", quantity="pinch"),
+    ],
+    instructions=[
+      "Squeeze lemons to get 1 cup juice.",
+      "In a pitcher, combine sugar and 1 cup hot water, stir until dissolved.",
+      "Add lemon juice, remaining cold water, and a pinch of salt.",
+      "Stir well.",
+      "Serve over ice with lemon slices."
+    ],
+    prep_time=10,
+    cook_time=0,
+    servings=4,
+    difficulty="easy",
+    category="beverage",
+    image_url="https://res.cloudinary.com/dfzpvawqz/image/upload/v1769474548/recipe_vault/rtw1nrymucu739c1xvma.jpg",
+    rating=4,
+    created_at=date(2024, 1, 13),
+    updated_at=date(2024, 1, 19),
+  ),
+  dict(
+    id=9,
+    title="Brownies",
+    description="Fudgy chocolate brownies",
+    ingredients=[
+      dict(name="All-Purpose Flour", quantity="1 cup"),
+      dict(name="Cocoa Powder", quantity="3/4 cup"),
+      dict(name="Dark Chocolate", quantity="150g"),
+      dict(name="Butter", quantity="100g"),
+      dict(name="Sugar", quantity="1.5 cups"),
+      dict(name="Eggs", quantity="2"),
+      dict(name="Vanilla Extract", quantity="1 tsp"),
+      dict(name="Baking Powder", quantity="1/2 tsp"),
+    ],
+    instructions=[
+      "Melt chocolate and butter together.",
+      "Beat eggs with sugar until creamy.",
+      "Stir in melted chocolate and vanilla.",
+      "Mix flour, cocoa, and baking powder.",
+      "Fold into egg mixture.",
+      "Pour into greased 8x8 pan.",
+      "Bake at 350°F for 25 minutes.",
+      "Cool before cutting into squares."
+    ],
+    prep_time=15,
+    cook_time=25,
+    servings=12,
+    difficulty="easy",
+    category="desert",
+    image_url="https://res.cloudinary.com/dfzpvawqz/image/upload/v1769474544/recipe_vault/i2rfjfx2gsaixpupjgpq.jpg",
+    rating=5,
+    created_at=date(2024, 1, 9),
+    updated_at=date(2024, 1, 19),
+  ),
+  dict(
+    id=10,
+    title="Caesar Salad",
+    description="Crispy lettuce with Caesar dressing",
+    ingredients=[
+      dict(name="Romaine Lettuce", quantity="1 head"),
+      dict(name="Parmesan Cheese", quantity="1/2 cup"),
+      dict(name="Croutons", quantity="1 cup"),
+      dict(name="Anchovies", quantity="3 fillets"),
+      dict(name="Garlic", quantity="2 cloves"),
+      dict(name="Lemon Juice", quantity="3 tbsp"),
+      dict(name="Olive Oil", quantity="1/2 cup"),
+      dict(name="Worcestershire Sauce", quantity="1 tsp"),
+    ],
+    instructions=[
+      "Whisk minced garlic, anchovies, lemon juice, and Worcestershire sauce.",
+      "Slowly whisk in olive oil.",
+      "Tear lettuce into bite-sized pieces.",
+      "Toss with dressing, croutons, and shaved Parmesan.",
+      "Serve immediately."
+    ],
+    prep_time=15,
+    cook_time=0,
+    servings=2,
+    difficulty="easy",
+    category="lunch",
+    image_url="https://res.cloudinary.com/dfzpvawqz/image/upload/v1769474545/recipe_vault/tta9d4c6ixagz7tpsnx2.jpg",
+    rating=4,
+    created_at=date(2024, 1, 16),
+    updated_at=date(2024, 1, 19),
+  ),
+  dict(
+    id=11,
+    title="Puff Puff",
+    description="Soft Puffy Delicious Puffs",
+    ingredients=[
+      dict(name="All-Purpose Flour", quantity="2 cups"),
+      dict(name="Warm Milk", quantity="3/4 cup"),
+      dict(name="Sugar", quantity="1/4 cup"),
+      dict(name="Instant Yeast", quantity="1.5 tsp"),
+      dict(name="Eggs", quantity="1"),
+      dict(name="Salt", quantity="1/2 tsp"),
+      dict(name="Vanilla Extract", quantity="1/2 tsp"),
+      dict(name="Vegetable Oil", quantity="for frying"),
+    ],
+    instructions=[
+      "Mix yeast with warm milk and 1 tbsp sugar, let sit 5 mins.",
+      "Add flour, egg, salt, and vanilla.",
+      "Beat until smooth, about 5 mins.",
+      "Cover and let rise 30 mins.",
+      "Heat oil to 350°F.",
+      "Drop spoonfuls of batter into hot oil, fry until golden (2-3 mins per side).",
+      "Drain on paper towels.",
+      "Dust with sugar and serve warm."
+    ],
+    prep_time=40,
+    cook_time=15,
+    servings=8,
+    difficulty="easy",
+    category="snack",
+    image_url="https://res.cloudinary.com/dfzpvawqz/image/upload/v1769474550/recipe_vault/z7bvbfdekfb7ac21ooit.jpg",
+    rating=5,
+    created_at=date(2024, 1, 23),
+    updated_at=date(2024, 1, 24),
+  )
+]
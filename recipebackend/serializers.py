@@ -0,0 +1,19 @@
+from fastapi.responses import JSONResponse
+from pydantic_core import to_json
+
+
+def dump_json(content):
+  # pydantic-core's Rust encoder: dicts/lists/dates/enums straight to compact JSON bytes,
+  # no jsonable_encoder walk and no json.dumps
+  return to_json(content)
+
+
+class FastJSONResponse(JSONResponse):
+  # ORJSONResponse-style response class without the extra dependency
+  def render(self, content):
+    return dump_json(content)
+
+
+def dump_recipe(recipe):
+  # crud.get_recipe() dict -> JSON body; version feeds the ETag, it isn't part of schemas.Recipe
+  return dump_json({key: value for key, value in recipe.items() if key != "version"})
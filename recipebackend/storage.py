@@ -0,0 +1,61 @@
+import os
+import shutil
+import tempfile
+
+
+# ---------------- Image storage backends ----------------
+# A backend takes a file on local disk and returns the public URL it can be fetched from.
+# CloudinaryStorage is what production uses; LocalStorage copies into a directory the API
+# serves itself, so uploads work offline and in tests. Pick one with STORAGE_BACKEND.
+# target names where the files end up, so upload_images.py can tell one destination's URLs
+# from another's.
+
+class CloudinaryStorage:
+  name = "cloudinary"
+
+  def __init__(self, folder="recipe_vault"):
+    import cloudinary.uploader
+    import cloudinary_config # Configures the SDK from the CLOUDINARY_* variables
+    self._uploader = cloudinary.uploader
+    self.folder = folder
+    self.target = f"cloudinary:{cloudinary.config().cloud_name}/{folder}"
+
+  def save(self, path, key):
+    # public_id from the key (format included, the variants share a stem), so a retried
+    # upload overwrites instead of leaving a duplicate
+    public_id = key.replace(".", "-")
+    result = self._uploader.upload(path, folder=self.folder, public_id=public_id, overwrite=True, timeout=60)
+    return result["secure_url"]
+
+
+class LocalStorage:
+  name = "local"
+
+  def __init__(self, root, base_url):
+    self.root = root
+    self.base_url = base_url.rstrip("/")
+    self.target = f"local:{os.path.abspath(root)} at {self.base_url}"
+    os.makedirs(root, exist_ok=True)
+
+  def save(self, path, key):
+    target = os.path.join(self.root, key)
+    shutil.copyfile(path, target + ".part")
+    os.replace(target + ".part", target) # Never serve a half-written file
+    return f"{self.base_url}/{key}"
+
+
+# Where LocalStorage files are served from by the API (see main.py)
+LOCAL_MEDIA_PATH = "/media"
+
+
+def make_storage():
+  # Cloudinary when it's configured; otherwise local disk, so the app starts with no external services
+  kind = os.getenv("STORAGE_BACKEND", "cloudinary" if os.getenv("CLOUDINARY_CLOUD_NAME") else "local").lower()
+  if kind == "cloudinary":
+    return CloudinaryStorage()
+  if kind == "local":
+    return LocalStorage(
+      os.getenv("LOCAL_STORAGE_DIR", os.path.join(tempfile.gettempdir(), "recipevault-media")),
+      os.getenv("LOCAL_STORAGE_URL", "http://localhost:8000" + LOCAL_MEDIA_PATH),
+    )
+  raise RuntimeError(f"Unknown STORAGE_BACKEND {kind!r} (expected cloudinary or local)")
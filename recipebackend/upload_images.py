@@ -1,28 +1,280 @@
+import argparse
+import hashlib
+import json
 import os
-import cloudinary
-import cloudinary.uploader
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 
 
 load_dotenv()
 
-cloudinary.config(
-    cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
-    api_key=os.getenv("CLOUDINARY_API_KEY"),
-    api_secret=os.getenv("CLOUDINARY_API_SECRET"),
-    secure=True
-)
 
+# Sync recipe photos from assets/ to image storage and onto their recipes:
+#
+#   python upload_images.py                      # upload new/changed files, set image_url + image_variants
+#   python upload_images.py --storage local      # same against the local-disk stand-in (no Cloudinary)
+#   python upload_images.py --no-db              # just upload and print the URLs
+#
+# Every file is hashed (sha256). A manifest next to the assets remembers what each hash was
+# uploaded as, per storage target, so unchanged files are skipped, identical files are uploaded once, and a run
+# that died halfway picks up where it stopped. Each new image goes through the same resize
+# pipeline as API uploads (images.py, in a process pool), its variants are pushed by a
+# bounded pool of upload threads, and the URLs are written to the matching recipes: the one
+# whose title matches the file name ("caesarsalad.jpg" -> "Caesar Salad", "jollof.jpg" ->
+# "Jollof Rice") or whose id is the file name ("12.jpg").
 
 ASSETS_DIR = "assets"
 
-# Create script to get the urls
+MANIFEST_NAME = ".upload-manifest.json"
 
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".avif", ".gif", ".bmp", ".tif", ".tiff"}
 
-for filename in os.listdir(ASSETS_DIR):
-  path = os.path.join(ASSETS_DIR, filename)
-  if not os.path.isfile(path):
-    continue
-  
-  result = cloudinary.uploader.upload(path, folder="recipe_vault") # upload to Cloudinary
-  print(filename, "=>", result["secure_url"]) # This is used to print the url of the cloudinary file upload.
\ No newline at end of file
+MAX_ATTEMPTS = 3
+
+
+def sha256_of(path):
+  digest = hashlib.sha256()
+  with open(path, "rb") as f:
+    for block in iter(lambda: f.read(1024 * 1024), b""):
+      digest.update(block)
+  return digest.hexdigest()
+
+
+def find_images(root):
+  for directory, dirs, files in os.walk(root):
+    dirs[:] = [d for d in dirs if not d.startswith(".")]
+    for filename in sorted(files):
+      if not filename.startswith(".") and os.path.splitext(filename)[1].lower() in IMAGE_EXTENSIONS:
+        path = os.path.join(directory, filename)
+        yield os.path.relpath(path, root).replace(os.sep, "/"), path
+
+
+# ---------------- Manifest ----------------
+
+class Manifest:
+  # {"files": {relative path: sha256}, "storage": {target: {sha256: {"image_url", "image_variants"}}}}
+  # uploads only holds the entries for this run's storage target (storage.py), so a file already
+  # sent to one destination is uploaded again for another instead of reusing the first one's URLs.
+  # Manifests from before targets were recorded ("uploads" at the top level) are ignored.
+  # Saved atomically every few uploads, so a crash loses at most the last few.
+  def __init__(self, path, target):
+    self.path = path
+    self.target = target
+    self._lock = threading.Lock()
+    self._dirty = 0
+    try:
+      with open(path) as f:
+        data = json.load(f)
+    except FileNotFoundError:
+      data = {}
+    self.files = data.get("files", {})
+    self._storage = data.get("storage", {})
+    self.uploads = self._storage.setdefault(target, {})
+
+  def record(self, sha, result):
+    with self._lock:
+      self.uploads[sha] = result
+      self._dirty += 1
+      if self._dirty >= 20:
+        self._save()
+
+  def save(self):
+    with self._lock:
+      self._save()
+
+  def _save(self):
+    tmp = self.path + ".tmp"
+    with open(tmp, "w") as f:
+      json.dump({"files": self.files, "storage": self._storage}, f, indent=2, sort_keys=True)
+    os.replace(tmp, self.path)
+    self._dirty = 0
+
+
+# ---------------- Upload ----------------
+
+def upload_one(storage, images, path, sha, work_root):
+  # Resize in the process pool, then push every variant; returns {"image_url", "image_variants"}
+  key = sha[:20] # Content-addressed, so a retried or repeated upload lands on the same name
+  work_dir = os.path.join(work_root, key)
+  os.makedirs(work_dir, exist_ok=True)
+  try:
+    processed = images.process_in_pool(path, work_dir, key)
+    uploaded = {}
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+      try:
+        for variant in processed.values():
+          for fmt in images.EXTENSIONS:
+            filename = variant.get(fmt)
+            if filename and filename not in uploaded:
+              uploaded[filename] = storage.save(os.path.join(work_dir, filename), filename)
+        break
+      except Exception:
+        if attempt == MAX_ATTEMPTS:
+          raise
+        time.sleep(2 ** (attempt - 1))
+    image_variants = {
+      name: {field: uploaded.get(value, value) for field, value in variant.items()}
+      for name, variant in processed.items()
+    }
+    return {"image_url": image_variants["detail"]["jpeg"], "image_variants": image_variants}
+  finally:
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def sync_files(files, manifest, storage, images, workers):
+  # files: [(relative path, path)].
+  # Returns ({relative path: upload result}, number uploaded now, [(relative path, error)]).
+  hashes = {}
+  with ThreadPoolExecutor(max_workers=workers) as pool:
+    for rel, sha in zip([rel for rel, _ in files], pool.map(sha256_of, [path for _, path in files])):
+      hashes[rel] = sha
+  manifest.files = hashes
+
+  todo = {} # One upload per distinct content, however many files share it
+  for rel, path in files:
+    sha = hashes[rel]
+    if sha not in manifest.uploads and sha not in todo:
+      todo[sha] = (rel, path)
+  print(f"{len(files)} images, {len(files) - len(todo)} unchanged or duplicate, {len(todo)} to upload", file=sys.stderr)
+
+  errors = []
+  work_root = tempfile.mkdtemp(prefix="upload-images-")
+  try:
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+      futures = {pool.submit(upload_one, storage, images, path, sha, work_root): (sha, rel) for sha, (rel, path) in todo.items()}
+      for future in as_completed(futures):
+        sha, rel = futures[future]
+        try:
+          result = future.result()
+        except Exception as e:
+          errors.append((rel, repr(e)))
+          print(rel, "=> FAILED", repr(e), file=sys.stderr)
+          continue
+        manifest.record(sha, result)
+        print(rel, "=>", result["image_url"]) # This is used to print the url of the upload.
+  finally:
+    manifest.save()
+    shutil.rmtree(work_root, ignore_errors=True)
+
+  results = {rel: manifest.uploads[sha] for rel, sha in hashes.items() if sha in manifest.uploads}
+  return results, len(todo) - len(errors), errors
+
+
+# ---------------- Database ----------------
+
+def _normalize(text):
+  return re.sub(r"[^a-z0-9]", "", text.lower())
+
+
+def match_recipes(rel_paths, recipes):
+  # recipes: [(id, title)]. Returns ({relative path: recipe id}, [unmatched relative paths]).
+  by_title = {}
+  for recipe_id, title in recipes:
+    by_title.setdefault(_normalize(title or ""), []).append(recipe_id)
+  ids = {recipe_id for recipe_id, _ in recipes}
+
+  matches, unmatched = {}, []
+  for rel in rel_paths:
+    stem = os.path.splitext(os.path.basename(rel))[0]
+    key = _normalize(stem)
+    candidates = by_title.get(key, [])
+    if not candidates and key:
+      # "jollof" -> "Jollof Rice": accept a partial match only when it's unambiguous
+      candidates = [rid for title, rids in by_title.items() if key in title for rid in rids]
+    if not candidates and stem.isdigit() and int(stem) in ids:
+      candidates = [int(stem)]
+    if len(candidates) == 1:
+      matches[rel] = candidates[0]
+    else:
+      unmatched.append(rel)
+  return matches, unmatched
+
+
+def write_to_database(results):
+  # Sets image_url/image_variants on every matched recipe whose image changed, in one transaction
+  from sqlalchemy import select, update, bindparam
+  import database_models
+  import crud
+  from cache import recipe_cache
+  from database import SessionLocal
+
+  Recipe = database_models.Recipe
+  db = SessionLocal()
+  try:
+    recipes = db.execute(select(Recipe.id, Recipe.title, Recipe.image_url)).all()
+    matches, unmatched = match_recipes(list(results), [(r.id, r.title) for r in recipes])
+    current = {r.id: r.image_url for r in recipes}
+
+    rows = [
+      {"rid": recipe_id, "new_url": results[rel]["image_url"], "new_variants": results[rel]["image_variants"]}
+      for rel, recipe_id in sorted(matches.items())
+      if current[recipe_id] != results[rel]["image_url"]
+    ]
+    if rows:
+      db.execute(
+        update(Recipe.__table__)
+        .where(Recipe.id == bindparam("rid"))
+        .values(
+          image_url=bindparam("new_url"),
+          image_variants=bindparam("new_variants", type_=Recipe.image_variants.type),
+          version=Recipe.version + 1,
+        ),
+        rows,
+      )
+      crud.touch_catalog(db)
+    db.commit()
+  finally:
+    db.close()
+  if rows:
+    recipe_cache.invalidate_all() # Reaches a shared (Redis) cache; local ones see the catalog version change
+  return len(rows), unmatched
+
+
+# ---------------- CLI ----------------
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Upload new and changed recipe images and attach them to their recipes")
+  parser.add_argument("--assets", default=ASSETS_DIR, help="Directory to sync (default: assets)")
+  parser.add_argument("--manifest", help=f"Manifest file (default: <assets>/{MANIFEST_NAME})")
+  parser.add_argument("--workers", type=int, default=8, help="Concurrent uploads")
+  parser.add_argument("--storage", choices=["cloudinary", "local"], help="Overrides STORAGE_BACKEND")
+  parser.add_argument("--no-db", action="store_true", help="Only upload; don't touch the database")
+  args = parser.parse_args(argv)
+
+  if args.storage:
+    os.environ["STORAGE_BACKEND"] = args.storage
+  from storage import make_storage
+  import images
+
+  files = list(find_images(args.assets))
+  storage = make_storage()
+  manifest = Manifest(args.manifest or os.path.join(args.assets, MANIFEST_NAME), storage.target)
+  started = time.perf_counter()
+  try:
+    results, uploaded, errors = sync_files(files, manifest, storage, images, args.workers)
+  finally:
+    images.shutdown_pool()
+
+  updated, unmatched = (0, []) if args.no_db else write_to_database(results)
+  for rel in unmatched:
+    print(f"{rel}: no single recipe matches this file name, image not attached", file=sys.stderr)
+  print(json.dumps({
+    "images": len(files),
+    "uploaded": uploaded,
+    "skipped": len(files) - uploaded - len(errors),
+    "failed": len(errors),
+    "recipes_updated": updated,
+    "unmatched": len(unmatched),
+    "seconds": round(time.perf_counter() - started, 2),
+  }))
+  return 1 if errors else 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,363 @@
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, update, or_, and_
+import database_models
+import crud
+import images
+from cache import recipe_cache
+from storage import make_storage
+
+
+# Background image upload pipeline behind POST /recipes/{id}/image.
+#
+# The request only copies the file into a local spool directory, records an UploadJob row and
+# returns its id; it never waits on the storage backend or holds a pooled connection while
+# bytes go over the network. A bounded pool of worker threads has each spooled file turned
+# into resized variants (images.py, in a process pool), pushes those to storage with retries
+# and exponential backoff, then sets the recipe's image_url and image_variants in a short
+# transaction of its own.
+#
+# Several workers (processes, or hosts sharing the spool directory) can run against the same
+# database. A job belongs to whoever holds its lease: owner is set, and lease_until renewed,
+# with an UPDATE that only matches when the job is unowned, already ours, or its lease ran out,
+# so exactly one worker claims it. Jobs left by a worker that stopped renewing (crashed,
+# killed, restarted) are claimed by another one once the lease expires.
+
+ACTIVE = ("queued", "processing", "uploading")
+
+
+class UploadQueueFull(Exception):
+  pass
+
+
+class LeaseLost(Exception):
+  # Another worker took the job over after our lease ran out; leave its files alone
+  pass
+
+
+class Uploader:
+  def __init__(self, storage, spool_dir, workers=4, queue_size=100, max_attempts=3, retry_delay=1.0, lease_seconds=60):
+    self.storage = storage
+    self.spool_dir = spool_dir
+    self.workers = workers
+    self.queue_size = queue_size
+    self.max_attempts = max_attempts
+    self.retry_delay = retry_delay
+    self.lease_seconds = lease_seconds
+    self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}" # New on every start of the process
+    self.session_factory = None # Set by start()
+    self._executor = None
+    self._renewer = None
+    self._stopping = threading.Event()
+    self._slots = threading.BoundedSemaphore(queue_size) # Queued + running jobs; beyond that uploads get a 503
+    self._lock = threading.Lock()
+    self.pending = 0
+    self.succeeded = 0
+    self.failed = 0
+    self.retries = 0
+
+  # ---------------- Lifecycle ----------------
+
+  def start(self, session_factory):
+    self.session_factory = session_factory
+    os.makedirs(self.spool_dir, exist_ok=True)
+    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="upload")
+    self._stopping.clear()
+    self._resume()
+    self._renewer = threading.Thread(target=self._renew_leases, name="upload-leases", daemon=True)
+    self._renewer.start()
+
+  def shutdown(self):
+    # Jobs still waiting are handed back (owner cleared), so the next worker to look takes them
+    # without waiting for the lease to run out
+    self._stopping.set()
+    if self._renewer is not None:
+      self._renewer.join()
+      self._renewer = None
+    if self._executor is not None:
+      self._executor.shutdown(wait=True, cancel_futures=True)
+      self._executor = None
+      self._release_queued()
+    images.shutdown_pool()
+
+  def _lease(self):
+    return datetime.now(timezone.utc) + timedelta(seconds=self.lease_seconds)
+
+  def _claimable(self):
+    # Jobs this worker may take: its own, ones nobody owns (queued before leases existed, or
+    # handed back at shutdown) and ones whose owner stopped renewing
+    UploadJob = database_models.UploadJob
+    return and_(
+      UploadJob.status.in_(ACTIVE),
+      or_(UploadJob.owner == self.owner, UploadJob.owner.is_(None), UploadJob.lease_until < datetime.now(timezone.utc)),
+    )
+
+  def _claim(self, job_id, **values):
+    # One UPDATE ... RETURNING: True when the job is now ours, False when another worker holds it
+    # or it already finished
+    UploadJob = database_models.UploadJob
+    db = self.session_factory()
+    try:
+      claimed = db.execute(
+        update(UploadJob).where(UploadJob.id == job_id, self._claimable())
+        .values(owner=self.owner, lease_until=self._lease(), **values)
+        .returning(UploadJob.id)
+      ).first()
+      db.commit()
+    finally:
+      db.close()
+    return claimed is not None
+
+  def _resume(self):
+    # Takes over jobs nobody is working on. Runs at start and after every lease renewal, so a
+    # crashed worker's jobs move on within about one lease.
+    UploadJob = database_models.UploadJob
+    db = self.session_factory()
+    try:
+      jobs = db.execute(
+        select(UploadJob.id, UploadJob.recipe_id, UploadJob.spool_path)
+        .where(self._claimable(), or_(UploadJob.owner.is_(None), UploadJob.owner != self.owner))
+        .order_by(UploadJob.created_at)
+      ).all()
+    finally:
+      db.close()
+    for job in jobs:
+      if not self._slots.acquire(blocking=False):
+        return # Full; the rest stay queued for the next round or another worker
+      if not self._claim(job.id, status="queued"): # Another worker got there first
+        self._slots.release()
+      elif not os.path.exists(job.spool_path):
+        self._slots.release()
+        self._set_status(job.id, status="failed", error="Spooled file was lost before the upload finished")
+      else:
+        self._submit(job.id, job.recipe_id, job.spool_path)
+
+  def _renew_leases(self):
+    # Every third of a lease: extend the leases on everything this worker holds, then look for
+    # abandoned jobs
+    UploadJob = database_models.UploadJob
+    while not self._stopping.wait(self.lease_seconds / 3):
+      try:
+        db = self.session_factory()
+        try:
+          db.execute(
+            update(UploadJob).where(UploadJob.owner == self.owner, UploadJob.status.in_(ACTIVE))
+            .values(lease_until=self._lease())
+          )
+          db.commit()
+        finally:
+          db.close()
+        self._resume()
+      except Exception as e: # Database unavailable; try again next round
+        print("Upload Lease Error:", repr(e))
+
+  def _release_queued(self):
+    UploadJob = database_models.UploadJob
+    db = self.session_factory()
+    try:
+      db.execute(
+        update(UploadJob).where(UploadJob.owner == self.owner, UploadJob.status == "queued")
+        .values(owner=None, lease_until=None)
+      )
+      db.commit()
+    finally:
+      db.close()
+
+  # ---------------- Request side ----------------
+
+  def enqueue(self, db, recipe_id, fileobj, filename=None):
+    # Spools the upload and records the job. Commits db; raises UploadQueueFull when the workers are saturated.
+    if not self._slots.acquire(blocking=False):
+      raise UploadQueueFull()
+    job_id = uuid.uuid4().hex
+    extension = os.path.splitext(filename or "")[1].lower()[:10]
+    spool_path = os.path.join(self.spool_dir, job_id + extension)
+    try:
+      with open(spool_path, "wb") as spooled:
+        shutil.copyfileobj(fileobj, spooled, 1024 * 1024)
+      db.add(database_models.UploadJob(
+        id=job_id, recipe_id=recipe_id, spool_path=spool_path, owner=self.owner, lease_until=self._lease(),
+      ))
+      db.commit()
+    except BaseException:
+      self._slots.release()
+      self._remove(spool_path)
+      raise
+    self._submit(job_id, recipe_id, spool_path)
+    return job_id
+
+  def _submit(self, job_id, recipe_id, spool_path):
+    with self._lock:
+      self.pending += 1
+    self._executor.submit(self._run, job_id, recipe_id, spool_path)
+
+  # ---------------- Worker side ----------------
+
+  def _run(self, job_id, recipe_id, spool_path):
+    work_dir = os.path.join(self.spool_dir, job_id)
+    owned = False
+    try:
+      owned = self._claim(job_id, status="processing")
+      if not owned: # Taken over by another worker while it waited here, or deleted with its recipe
+        owned = not self._held_elsewhere(job_id)
+        return
+
+      # Decode and encode every variant once, in the image process pool
+      os.makedirs(work_dir, exist_ok=True)
+      try:
+        processed = images.process_in_pool(spool_path, work_dir, job_id)
+      except images.UnsupportedImage as e: # Retrying won't help
+        self._set_status(job_id, status="failed", error=str(e))
+        with self._lock:
+          self.failed += 1
+        return
+
+      uploaded = {} # filename -> url; a retry only re-sends the files that didn't make it
+      last_error = None
+      for attempt in range(1, self.max_attempts + 1):
+        self._set_status(job_id, status="uploading", attempts=attempt)
+        try:
+          for variant in processed.values():
+            for fmt in images.EXTENSIONS:
+              filename = variant.get(fmt)
+              if filename and filename not in uploaded:
+                uploaded[filename] = self.storage.save(os.path.join(work_dir, filename), filename)
+        except Exception as e:
+          last_error = e
+          if attempt < self.max_attempts:
+            with self._lock:
+              self.retries += 1
+            time.sleep(self.retry_delay * 2 ** (attempt - 1))
+          continue
+        image_variants = {
+          name: {field: uploaded.get(value, value) for field, value in variant.items()}
+          for name, variant in processed.items()
+        }
+        self._finish(job_id, recipe_id, image_variants["detail"]["jpeg"], image_variants)
+        return
+      print("Image Upload Error:", job_id, repr(last_error))
+      self._set_status(job_id, status="failed", error=f"Upload failed after {self.max_attempts} attempts: {last_error}")
+      with self._lock:
+        self.failed += 1
+    except LeaseLost:
+      owned = not self._held_elsewhere(job_id)
+      if not owned:
+        print("Image Upload Error:", job_id, "lease expired and another worker took the job over")
+    except Exception as e: # Database trouble while recording the result
+      print("Image Upload Error:", job_id, repr(e))
+      with self._lock:
+        self.failed += 1
+      try:
+        self._set_status(job_id, status="failed", error=str(e))
+      except LeaseLost:
+        owned = not self._held_elsewhere(job_id)
+      except Exception:
+        pass
+    finally:
+      if owned:
+        self._remove(spool_path)
+        shutil.rmtree(work_dir, ignore_errors=True)
+      with self._lock:
+        self.pending -= 1
+      self._slots.release()
+
+  def _finish(self, job_id, recipe_id, image_url, image_variants):
+    Recipe = database_models.Recipe
+    UploadJob = database_models.UploadJob
+    db = self.session_factory()
+    try:
+      recipe = db.execute(
+        update(Recipe).where(Recipe.id == recipe_id)
+        .values(image_url=image_url, image_variants=image_variants, version=Recipe.version + 1)
+        .returning(Recipe.category, Recipe.difficulty)
+      ).one_or_none()
+      if recipe is None: # Deleted while uploading; its job row went with it
+        db.rollback()
+        return
+      done = db.execute(
+        update(UploadJob).where(UploadJob.id == job_id, UploadJob.owner == self.owner)
+        .values(status="done", image_url=image_url, error=None)
+      ).rowcount
+      if not done: # Taken over by another worker, which will set the image itself
+        db.rollback()
+        raise LeaseLost()
+      crud.touch_catalog(db)
+      db.commit()
+    finally:
+      db.close()
+    recipe_cache.invalidate_recipe(recipe_id, (recipe.category, recipe.difficulty))
+    with self._lock:
+      self.succeeded += 1
+
+  def _set_status(self, job_id, **values):
+    # Only while the job is ours (renewing the lease); raises LeaseLost otherwise
+    UploadJob = database_models.UploadJob
+    db = self.session_factory()
+    try:
+      updated = db.execute(
+        update(UploadJob).where(UploadJob.id == job_id, UploadJob.owner == self.owner)
+        .values(lease_until=self._lease(), **values)
+      ).rowcount
+      db.commit()
+    finally:
+      db.close()
+    if not updated:
+      raise LeaseLost()
+
+  def _held_elsewhere(self, job_id):
+    # After a failed claim or status update: is another worker on this job now? If not (it was
+    # deleted with its recipe, or finished), its spooled files are ours to clean up.
+    UploadJob = database_models.UploadJob
+    db = self.session_factory()
+    try:
+      return db.scalar(
+        select(UploadJob.id).where(UploadJob.id == job_id, UploadJob.status.in_(ACTIVE), UploadJob.owner != self.owner)
+      ) is not None
+    finally:
+      db.close()
+
+  @staticmethod
+  def _remove(path):
+    try:
+      os.remove(path)
+    except FileNotFoundError:
+      pass
+
+  def stats(self):
+    with self._lock:
+      return {
+        "backend": self.storage.name,
+        "workers": self.workers,
+        "pending": self.pending,
+        "succeeded": self.succeeded,
+        "failed": self.failed,
+        "retries": self.retries,
+      }
+
+
+def get_job(db, job_id):
+  UploadJob = database_models.UploadJob
+  return db.execute(
+    select(
+      UploadJob.id, UploadJob.recipe_id, UploadJob.status, UploadJob.attempts,
+      UploadJob.image_url, UploadJob.error, UploadJob.created_at, UploadJob.updated_at,
+    ).where(UploadJob.id == job_id)
+  ).one_or_none()
+
+
+uploader = Uploader(
+  make_storage(),
+  os.getenv("UPLOAD_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "recipevault-spool")),
+  workers=int(os.getenv("UPLOAD_WORKERS", "4")),
+  queue_size=int(os.getenv("UPLOAD_QUEUE_SIZE", "100")),
+  max_attempts=int(os.getenv("UPLOAD_MAX_ATTEMPTS", "3")),
+  retry_delay=float(os.getenv("UPLOAD_RETRY_DELAY_SECONDS", "1")),
+  lease_seconds=float(os.getenv("UPLOAD_LEASE_SECONDS", "60")),
+)
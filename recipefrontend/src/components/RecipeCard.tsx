@@ -3,6 +3,7 @@ import { Card, CardContent, CardFooter } from "@/components/ui/card";
 import { StarRating } from "@/components/ui/star-rating";
 import { DifficultyBadge } from "@/components/ui/difficulty-badge";
 import { CategoryBadge } from "@/components/ui/category-badge";
+import { RecipeImage } from "@/components/RecipeImage";
 import { Recipe } from "@/types/recipe";
 
 interface RecipeCardProps {
@@ -20,9 +21,10 @@ export function RecipeCard({ recipe, onClick }: RecipeCardProps) {
     >
       <div className="aspect-[4/3] overflow-hidden bg-muted relative">
         {recipe.image_url ? (
-          <img
-            src={recipe.image_url}
-            alt={recipe.title}
+          <RecipeImage
+            recipe={recipe}
+            variants={["thumb", "card"]}
+            sizes="(min-width: 1024px) 33vw, (min-width: 640px) 50vw, 100vw"
             className="w-full h-full object-cover transition-transform duration-300 group-hover:scale-105"
           />
         ) : (
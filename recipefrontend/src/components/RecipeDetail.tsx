@@ -4,6 +4,7 @@ import { StarRating } from "@/components/ui/star-rating";
 import { DifficultyBadge } from "@/components/ui/difficulty-badge";
 import { CategoryBadge } from "@/components/ui/category-badge";
 import { Separator } from "@/components/ui/separator";
+import { RecipeImage } from "@/components/RecipeImage";
 import {
   Dialog,
   DialogContent,
@@ -50,9 +51,10 @@ export function RecipeDetail({
         {/* Hero Image */}
         <div className="aspect-[16/9] bg-muted relative">
           {recipe.image_url ? (
-            <img
-              src={recipe.image_url}
-              alt={recipe.title}
+            <RecipeImage
+              recipe={recipe}
+              variants={["card", "detail"]}
+              sizes="(min-width: 768px) 768px, 100vw"
               className="w-full h-full object-cover"
             />
           ) : (
@@ -0,0 +1,46 @@
+import { ImageVariant, Recipe } from "@/types/recipe";
+
+interface RecipeImageProps {
+  recipe: Recipe;
+  // Which resized copies the browser may pick from, smallest first
+  variants: string[];
+  // The rendered width, so the browser can choose the right variant
+  sizes: string;
+  className?: string;
+}
+
+// Serves the backend's resized AVIF/WebP/JPEG variants when the recipe has them,
+// and falls back to the original image_url otherwise
+export function RecipeImage({ recipe, variants, sizes, className }: RecipeImageProps) {
+  const available = variants
+    .map((name) => recipe.image_variants?.[name])
+    .filter((variant): variant is ImageVariant => Boolean(variant));
+
+  if (available.length === 0) {
+    return <img src={recipe.image_url} alt={recipe.title} className={className} loading="lazy" />;
+  }
+
+  const srcSet = (format: "avif" | "webp" | "jpeg") =>
+    available
+      .filter((variant) => variant[format])
+      .map((variant) => `${variant[format]} ${variant.width}w`)
+      .join(", ");
+  const fallback = available[available.length - 1];
+
+  return (
+    <picture>
+      {available.some((variant) => variant.avif) && <source type="image/avif" srcSet={srcSet("avif")} sizes={sizes} />}
+      {available.some((variant) => variant.webp) && <source type="image/webp" srcSet={srcSet("webp")} sizes={sizes} />}
+      <img
+        src={fallback.jpeg}
+        srcSet={srcSet("jpeg")}
+        sizes={sizes}
+        width={fallback.width}
+        height={fallback.height}
+        alt={recipe.title}
+        className={className}
+        loading="lazy"
+      />
+    </picture>
+  );
+}
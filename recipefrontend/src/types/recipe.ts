@@ -3,6 +3,15 @@ export interface IngredientItem {
   quantity: string;
 }
 
+// One resized copy of a recipe image (the backend makes "thumb", "card" and "detail")
+export interface ImageVariant {
+  width: number;
+  height: number;
+  jpeg: string;
+  webp?: string;
+  avif?: string;
+}
+
 export type Difficulty = "easy" | "medium" | "hard";
 
 export type Category = "breakfast" | "lunch" | "dinner" | "dessert" | "snack" | "beverage";
@@ -19,6 +28,7 @@ export interface Recipe {
   difficulty: Difficulty;
   category: Category;
   image_url?: string;
+  image_variants?: Record<string, ImageVariant> | null;
   rating: number;
   created_at: string;
   updated_at: string;